@@ -1,52 +1,97 @@
 from flask import Flask, render_template, redirect, url_for
 from flask_login import LoginManager, current_user
 from config import Config
-from models.database import db
+from models.database import db, configure_read_replica, apply_engine_profile, attach_engine_profile
 from models.user import User
 import os
-from flask import Blueprint, jsonify
+import click
+from flask import jsonify
 from models.transaction import Announcement
 from utils.email import mail
-
-app = Flask(__name__)
-app.config.from_object(Config)
-
-IS_VERCEL = "VERCEL" in os.environ
-
-if IS_VERCEL:
-    # Use Vercel's temporary writable directory
-    app.config['UPLOAD_FOLDER'] = '/tmp'
-else:
-    # Local development: ensure the static folder exists
-    upload_path = app.config.get('UPLOAD_FOLDER', 'static/uploads')
-    os.makedirs(upload_path, exist_ok=True)
-
-# Initialize database
-db.init_app(app)
-mail.init_app(app)
+from commands import register_commands, init_database, check_schema
+from models.sharding import init_sharding
+from utils.metrics import init_metrics
+from utils.slow_queries import init_slow_query_log
+from utils.nplusone import init_nplusone_detector
+from utils.assets import init_assets
+from utils.templates import init_template_cache
+from utils.export_cache import init_export_cache
+from utils.export_jobs import init_export_jobs
 
 # Initialize login manager
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = 'auth.login'
 
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
-    
-# Register blueprints
-from routes.auth import auth_bp
-from routes.admin import admin_bp
-from routes.agent import agent_bp
-from routes.student import student_bp
-
-app.register_blueprint(auth_bp)
-app.register_blueprint(admin_bp, url_prefix='/admin')
-app.register_blueprint(agent_bp, url_prefix='/agent')
-app.register_blueprint(student_bp, url_prefix='/student')
+
+
+def create_app(config_class=Config):
+    """
+    Application factory. Creating the app only reads the schema catalog to
+    refuse to start on a database that is behind the models; run
+    `flask init-db` after deploying to create the schema, new columns and
+    indexes and the default admin (or set AUTO_INIT_DB where that isn't
+    possible, e.g. serverless).
+    """
+    app = Flask(__name__)
+    app.config.from_object(config_class)
+
+    if "VERCEL" in os.environ:
+        # Use Vercel's temporary writable directory
+        app.config['UPLOAD_FOLDER'] = '/tmp'
+    else:
+        # Local development: ensure the static folder exists
+        upload_path = app.config.get('UPLOAD_FOLDER', 'static/uploads')
+        os.makedirs(upload_path, exist_ok=True)
+
+    # Initialize database
+    apply_engine_profile(app)
+    configure_read_replica(app)
+    db.init_app(app)
+    attach_engine_profile(app)
+    init_sharding(app)
+    init_metrics(app)
+    init_slow_query_log(app)
+    init_nplusone_detector(app)
+    init_assets(app)
+    init_template_cache(app)
+    init_export_cache(app)
+    init_export_jobs(app)
+    mail.init_app(app)
+    login_manager.init_app(app)
+
+    # Register blueprints
+    from routes.auth import auth_bp
+    from routes.admin import admin_bp
+    from routes.agent import agent_bp
+    from routes.student import student_bp
+    from routes.api import api_bp
+
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(admin_bp, url_prefix='/admin')
+    app.register_blueprint(agent_bp, url_prefix='/agent')
+    app.register_blueprint(student_bp, url_prefix='/student')
+    app.register_blueprint(api_bp, url_prefix='/api/v1')
+
+    register_commands(app)
+
+    app.add_url_rule('/', 'home', home)
+    app.add_url_rule('/api/active-announcements', 'get_active_announcements', get_active_announcements)
+
+    if app.config.get('AUTO_INIT_DB'):
+        with app.app_context():
+            init_database()
+    elif click.get_current_context(silent=True) is None:
+        # Skipped for flask CLI commands, `flask init-db` among them
+        with app.app_context():
+            check_schema()
+
+    return app
+
 
 # Home route
-@app.route('/')
 def home():
     if current_user.is_authenticated:
         if current_user.role == 'admin':
@@ -57,24 +102,6 @@ def home():
             return redirect(url_for('student.dashboard'))
     return render_template('home.html')
 
-# Create tables and default admin
-with app.app_context():
-    db.create_all()
-    
-    # Create default admin if not exists
-    from werkzeug.security import generate_password_hash
-    admin = User.query.filter_by(username='admin').first()
-    if not admin:
-        admin = User(
-            username='admin',
-            password=generate_password_hash('admin123'),
-            role='admin',
-            email='admin@hostel.com'
-        )
-        db.session.add(admin)
-        db.session.commit()
-
-@app.route('/api/active-announcements')
 def get_active_announcements():
     try:
         announcements = Announcement.query.filter_by(is_active=True).order_by(Announcement.created_at.desc()).all()
@@ -96,5 +123,9 @@ def get_active_announcements():
             'announcements': []
         }), 500
 
+
+# Module-level app for `gunicorn app:app` and `flask --app app`
+app = create_app()
+
 if __name__ == '__main__':
     app.run(debug=True)
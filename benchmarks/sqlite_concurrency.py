@@ -0,0 +1,129 @@
+"""
+SQLite concurrency benchmark: default engine settings vs the production profile.
+
+Simulates several gunicorn workers (one process each) recording payments
+(insert a transaction + update the student's fees_paid) while reading the
+dashboard aggregates, and reports throughput and "database is locked" errors.
+
+    python -m benchmarks.sqlite_concurrency --workers 4 --seconds 10
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, func, insert, select, update
+from sqlalchemy.exc import OperationalError
+
+from config import Config
+from models.database import db, set_sqlite_pragmas, sqlite_pragmas
+from models.consultancy import Consultancy
+from models.student import Student
+from models.transaction import Transaction
+import models.user  # noqa: F401  (registers the users table)
+
+
+def make_engine(path, profile):
+    engine = create_engine(f'sqlite:///{path}', pool_pre_ping=(profile == 'production'))
+    if profile == 'production':
+        pragmas = sqlite_pragmas(vars(Config))
+        event.listen(engine, 'connect', lambda conn, record: set_sqlite_pragmas(conn, pragmas))
+    return engine
+
+
+def build_database(path, students):
+    engine = create_engine(f'sqlite:///{path}')
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Consultancy), [{
+            'id': 1, 'name': 'Bench Hostel', 'hostel_code': 'B5', 'contact_person': 'Bench',
+            'email': 'bench@example.com', 'phone': '0000000000'
+        }])
+        conn.execute(insert(Student), [{
+            'id': i, 'user_id': i, 'consultancy_id': 1, 'prn': f'PRN{i:07d}',
+            'full_name': f'Student {i}', 'branch': 'CSE', 'email': f's{i}@example.com',
+            'phone': '9999999999', 'total_fees': 100000.0, 'fees_paid': 0.0
+        } for i in range(1, students + 1)])
+    engine.dispose()
+
+
+def worker(path, profile, seconds, students, read_ratio, results):
+    engine = make_engine(path, profile)
+    writes = reads = locked = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        try:
+            if random.random() < read_ratio:
+                with engine.connect() as conn:
+                    conn.execute(select(func.count(Student.id), func.sum(Student.fees_paid))).one()
+                reads += 1
+            else:
+                student_id = random.randint(1, students)
+                with engine.begin() as conn:
+                    conn.execute(insert(Transaction).values(
+                        transaction_id=uuid.uuid4().hex, student_id=student_id, consultancy_id=1,
+                        amount=100.0, payment_method='razorpay', status='completed'
+                    ))
+                    conn.execute(update(Student).where(Student.id == student_id)
+                                 .values(fees_paid=Student.fees_paid + 100.0))
+                writes += 1
+        except OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            locked += 1
+    engine.dispose()
+    results.put((writes, reads, locked))
+
+
+def run(profile, workers, seconds, students, read_ratio):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        build_database(path, students)
+        if profile == 'production':
+            # WAL is persistent; switch once before the workers start
+            make_engine(path, profile).connect().close()
+
+        results = multiprocessing.Queue()
+        procs = [
+            multiprocessing.Process(target=worker, args=(path, profile, seconds, students, read_ratio, results))
+            for _ in range(workers)
+        ]
+        for p in procs:
+            p.start()
+        totals = [results.get() for _ in procs]
+        for p in procs:
+            p.join()
+
+    writes = sum(t[0] for t in totals)
+    reads = sum(t[1] for t in totals)
+    locked = sum(t[2] for t in totals)
+    return {
+        'profile': profile,
+        'writes_per_sec': writes / seconds,
+        'reads_per_sec': reads / seconds,
+        'locked_errors': locked,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--students', type=int, default=5000)
+    parser.add_argument('--read-ratio', type=float, default=0.5)
+    args = parser.parse_args()
+
+    print(f'{"profile":<12}{"writes/s":>12}{"reads/s":>12}{"locked":>10}')
+    for profile in ('default', 'production'):
+        r = run(profile, args.workers, args.seconds, args.students, args.read_ratio)
+        print(f'{r["profile"]:<12}{r["writes_per_sec"]:>12.1f}{r["reads_per_sec"]:>12.1f}{r["locked_errors"]:>10}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Worker startup benchmark: how long `import app` takes and what it pulls in.
+
+Runs `python -X importtime -c "import app"` in fresh interpreters and
+reports the median import time of the app module, the slowest imports,
+and fails if modules that should only load on demand (pandas, openpyxl,
+razorpay) are imported at startup or the import exceeds --max-ms.
+
+    python -m benchmarks.startup --runs 5 --max-ms 1500
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only needed by the import/export and payment code paths
+LAZY_MODULES = ('pandas', 'openpyxl', 'razorpay')
+
+
+def parse_importtime(stderr):
+    """{module: (self_us, cumulative_us)} from -X importtime output"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def measure(env):
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(f'import app failed:\n{result.stderr[-2000:]}')
+    return parse_importtime(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help='Number of slowest imports to list.')
+    parser.add_argument('--max-ms', type=float, default=None, help='Fail if the median import takes longer.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URI=f'sqlite:///{os.path.join(tmp, "startup.db")}',
+                   METRICS_FOLDER=os.path.join(tmp, 'metrics'))
+        runs = [measure(env) for _ in range(args.runs)]
+
+    totals = [modules['app'][1] / 1000 for modules in runs]
+    median = statistics.median(totals)
+    print(f'import app: median {median:.1f} ms (min {min(totals):.1f}, max {max(totals):.1f}) over {args.runs} runs')
+
+    last = runs[-1]
+    print(f'\n{"self ms":>9}{"cumul ms":>10}  module')
+    for name, (self_us, cumulative_us) in sorted(last.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f'{self_us / 1000:>9.1f}{cumulative_us / 1000:>10.1f}  {name}')
+
+    failures = []
+    eager = [name for name in LAZY_MODULES if name in last]
+    if eager:
+        failures.append(f'imported at startup: {", ".join(eager)}')
+    if args.max_ms is not None and median > args.max_ms:
+        failures.append(f'median import {median:.1f} ms exceeds {args.max_ms:.1f} ms')
+    if failures:
+        raise SystemExit('FAIL: ' + '; '.join(failures))
+    print('\nOK: no on-demand modules imported at startup')
+
+
+if __name__ == '__main__':
+    main()
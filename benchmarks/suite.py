@@ -0,0 +1,235 @@
+"""
+Benchmark suite for the main read and write paths.
+
+Seeds a synthetic database per size with utils.seed, then times the Excel
+import, the student, payment-history and per-hostel workbook exports, the
+filtered data search, the admin and agent dashboards and verify_payment
+(with a stubbed gateway) through the Flask test client. Reports the median time and the SQL query count of
+each operation, and compares them with a stored baseline.
+
+    python -m benchmarks.suite --sizes 1000 10000
+    python -m benchmarks.suite --sizes 1000 --save-baseline
+    python -m benchmarks.suite --sizes 1000 --baseline benchmarks/baseline.json
+
+Each size runs in a fresh process because the app binds its database at
+import time.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+ADMIN_PASSWORD = 'admin123'
+
+
+def write_import_file(path, rows, offset):
+    import pandas as pd
+
+    pd.DataFrame([{
+        'PRN': f'IMP{offset + i:07d}', 'Name': f'Imported {offset + i}', 'Branch': 'CSE',
+        'Email': f'imp{offset + i}@example.com', 'Phone': '8888888888', 'Hostel_Code': 'B5',
+        'Total_Fees': 100000, 'Fees_Paid': 0
+    } for i in range(rows)]).to_excel(path, index=False)
+
+
+class StubGateway:
+    """Stands in for utils.payment_gateway.PaymentGateway: every signature is valid"""
+
+    def __init__(self, key_id, key_secret, base_url=None):
+        pass
+
+    def verify_payment(self, order_id, payment_id, signature):
+        return True
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def _login(client, username, password):
+    response = client.post('/login', data={'username': username, 'password': password})
+    if response.status_code != 302:
+        raise RuntimeError(f'Login failed for {username}')
+    return client
+
+
+def run_size(students, repeat, import_rows, workdir, results):
+    """Child process: build the database, point the app at it and time every operation"""
+    os.environ['DATABASE_URI'] = f'sqlite:///{os.path.join(workdir, f"bench_{students}.db")}'
+    # Time the builds and renders, not the export and page caches
+    os.environ['EXPORT_CACHE_ENABLED'] = 'false'
+    os.environ['PAGE_CACHE_ENABLED'] = 'false'
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from app import app
+    from commands import init_database
+    from models.database import db
+    from models.student import Student
+    import routes.student
+    from utils import analytics
+    from utils.excel_handler import import_students_from_excel
+    from utils.seed import seed_database, DEFAULT_STUDENT_PASSWORD, DEFAULT_AGENT_PASSWORD
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    routes.student.PaymentGateway = StubGateway
+
+    started = time.perf_counter()
+    with app.app_context():
+        init_database()
+        seed_database(hostels=4, students=students, payments=2, announcements=5)
+        prn = db.session.scalar(db.select(Student.prn).order_by(Student.id).limit(1))
+        db.session.remove()
+    build_seconds = time.perf_counter() - started
+
+    admin = _login(app.test_client(), 'admin', ADMIN_PASSWORD)
+    agent = _login(app.test_client(), 'agent_b5', DEFAULT_AGENT_PASSWORD)
+    student = _login(app.test_client(), prn, DEFAULT_STUDENT_PASSWORD)
+    imported = [0]
+
+    def do_import():
+        path = os.path.join(workdir, 'import.xlsx')
+        write_import_file(path, import_rows, imported[0])
+        imported[0] += import_rows
+        with app.app_context():
+            ok, result = import_students_from_excel(path)
+            db.session.remove()
+        if not ok or result['failed']:
+            raise RuntimeError(f'Import failed: {result}')
+
+    def get(client, url):
+        def op():
+            response = client.get(url)
+            if response.status_code != 200:
+                raise RuntimeError(f'GET {url} returned {response.status_code}')
+        return op
+
+    def cold(op):
+        # Measure the queries themselves, not the analytics cache
+        def wrapped():
+            analytics._cache.clear()
+            op()
+        return wrapped
+
+    def verify_payment():
+        response = student.post('/student/verify-payment', json={
+            'order_id': 'order_bench', 'payment_id': 'pay_bench', 'signature': 'sig', 'amount': 100
+        })
+        if response.status_code != 200:
+            raise RuntimeError(f'verify-payment returned {response.status_code}')
+
+    operations = [
+        ('import_students', do_import),
+        ('export_students', get(admin, '/admin/students/export')),
+        ('export_payment_history', get(admin, '/admin/payment-history/export')),
+        ('export_hostel_workbook', get(admin, '/admin/students/export/workbook')),
+        ('filtered_data_search', get(admin, '/admin/students/filtered?hostel_code=B5&search=Patil')),
+        ('filtered_data_pending', get(admin, '/admin/students/filtered?pending_filter=has_pending&min_pending=90000&sort=pending_desc')),
+        ('admin_dashboard', cold(get(admin, '/admin/dashboard'))),
+        ('agent_dashboard', cold(get(agent, '/agent/dashboard'))),
+        ('verify_payment', verify_payment),
+    ]
+
+    counter = QueryCounter()
+    event.listen(Engine, 'before_cursor_execute', counter)
+    measured = {}
+    for name, op in operations:
+        timings = []
+        queries = 0
+        for _ in range(repeat):
+            counter.count = 0
+            started = time.perf_counter()
+            op()
+            timings.append(time.perf_counter() - started)
+            queries = counter.count
+        measured[name] = {'seconds': statistics.median(timings), 'queries': queries}
+    event.remove(Engine, 'before_cursor_execute', counter)
+
+    results.put({'students': students, 'build_seconds': build_seconds, 'operations': measured})
+
+
+def run(sizes, repeat=3, import_rows=100):
+    ctx = multiprocessing.get_context('spawn')
+    report = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for students in sizes:
+            results = ctx.Queue()
+            proc = ctx.Process(target=run_size, args=(students, repeat, import_rows, workdir, results))
+            proc.start()
+            proc.join()
+            if proc.exitcode != 0:
+                raise SystemExit(f'Benchmark for {students} students failed')
+            result = results.get()
+            report[str(students)] = result
+    return report
+
+
+def compare(report, baseline, tolerance):
+    """Rows of (size, operation, seconds, baseline seconds, queries, baseline queries, regressed)"""
+    rows = []
+    for size, result in report.items():
+        base = baseline.get(size, {}).get('operations', {})
+        for name, current in result['operations'].items():
+            previous = base.get(name)
+            regressed = bool(previous) and (
+                current['seconds'] > previous['seconds'] * (1 + tolerance)
+                or current['queries'] > previous['queries']
+            )
+            rows.append((
+                size, name, current['seconds'], previous and previous['seconds'],
+                current['queries'], previous and previous['queries'], regressed
+            ))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--import-rows', type=int, default=100)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Store these results as the new baseline instead of comparing.')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed slowdown before an operation counts as a regression (0.2 = 20%%).')
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.repeat, args.import_rows)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f'Baseline saved to {args.baseline}')
+
+    baseline = {}
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    print(f'{"students":>9}  {"operation":<24}{"ms":>10}{"base ms":>10}{"queries":>9}{"base q":>8}')
+    regressions = 0
+    for size, name, seconds, base_seconds, queries, base_queries, regressed in compare(report, baseline, args.tolerance):
+        base_ms = f'{base_seconds * 1000:.1f}' if base_seconds is not None else '-'
+        base_q = str(base_queries) if base_queries is not None else '-'
+        flag = '  REGRESSION' if regressed else ''
+        print(f'{size:>9}  {name:<24}{seconds * 1000:>10.1f}{base_ms:>10}{queries:>9}{base_q:>8}{flag}')
+        regressions += regressed
+
+    if regressions:
+        raise SystemExit(f'{regressions} operation(s) slower than the baseline')
+
+
+if __name__ == '__main__':
+    main()
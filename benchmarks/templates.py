@@ -0,0 +1,142 @@
+"""
+Template compilation benchmark: worker startup and first-request latency
+with and without the Jinja bytecode cache.
+
+Each run is a fresh interpreter, like a new or recycled worker. Three modes:
+
+    off   TEMPLATE_CACHE_ENABLED=false, every template compiled from source
+    cold  bytecode cache enabled but empty (first worker after a deploy
+          without `flask precompile-templates`)
+    warm  cache filled by `flask precompile-templates`
+
+and for each run it reports the import time, the time to load every
+template, and the first request to the login page and the admin pages.
+
+    python -m benchmarks.templates --runs 5 --students 500
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ('off', 'cold', 'warm')
+FIRST_REQUESTS = (
+    ('login_page', '/login'),
+    ('admin_dashboard', '/admin/dashboard'),
+    ('filtered_data', '/admin/students/filtered'),
+    ('payment_history', '/admin/payment-history'),
+)
+
+
+def child_prepare(students):
+    from app import app
+    from commands import init_database
+    from utils.seed import seed_database
+
+    with app.app_context():
+        init_database()
+        seed_database(hostels=4, students=students, payments=2, announcements=5)
+
+
+def child_precompile():
+    from app import app
+    from utils.templates import precompile_templates
+
+    precompile_templates(app)
+
+
+def child_measure(kind):
+    """Print one JSON line of timings in milliseconds"""
+    started = time.perf_counter()
+    from app import app
+    timings = {'import': (time.perf_counter() - started) * 1000}
+
+    if kind == 'templates':
+        from utils.templates import precompile_templates
+        started = time.perf_counter()
+        precompile_templates(app)
+        timings['load_all_templates'] = (time.perf_counter() - started) * 1000
+    else:
+        client = app.test_client()
+        for name, url in FIRST_REQUESTS:
+            started = time.perf_counter()
+            response = client.get(url)
+            timings[name] = (time.perf_counter() - started) * 1000
+            if response.status_code != 200:
+                raise SystemExit(f'GET {url} returned {response.status_code}')
+            if name == 'login_page':
+                response = client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+                if response.status_code != 302:
+                    raise SystemExit('Admin login failed')
+    print(json.dumps(timings))
+
+
+def run_child(env, *args):
+    result = subprocess.run([sys.executable, '-m', 'benchmarks.templates', '--child', *args],
+                            cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(f'benchmark child {args} failed:\n{result.stderr[-2000:]}')
+    lines = result.stdout.strip().splitlines()
+    return json.loads(lines[-1]) if lines else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--students', type=int, default=500)
+    parser.add_argument('--child', nargs='+', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        command, *rest = args.child
+        if command == 'prepare':
+            child_prepare(int(rest[0]))
+        elif command == 'precompile':
+            child_precompile()
+        else:
+            child_measure(rest[0])
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_folder = os.path.join(tmp, 'jinja_cache')
+        base_env = dict(
+            os.environ,
+            DATABASE_URI=f'sqlite:///{os.path.join(tmp, "templates.db")}',
+            METRICS_FOLDER=os.path.join(tmp, 'metrics'),
+            SLOW_QUERY_FOLDER=os.path.join(tmp, 'slow_queries'),
+            TEMPLATE_CACHE_FOLDER=cache_folder,
+            # Time the rendering, not the page cache
+            PAGE_CACHE_ENABLED='false',
+        )
+        run_child(dict(base_env, TEMPLATE_CACHE_ENABLED='false'), 'prepare', str(args.students))
+
+        results = {}
+        for mode in MODES:
+            env = dict(base_env, TEMPLATE_CACHE_ENABLED='false' if mode == 'off' else 'true')
+            samples = {}
+            for _ in range(args.runs):
+                for kind in ('templates', 'requests'):
+                    shutil.rmtree(cache_folder, ignore_errors=True)
+                    if mode == 'warm':
+                        run_child(env, 'precompile')
+                    for name, value in run_child(env, 'measure', kind).items():
+                        samples.setdefault(name, []).append(value)
+            results[mode] = {name: statistics.median(values) for name, values in samples.items()}
+
+    names = list(results['off'])
+    print(f'median of {args.runs} fresh processes, ms ({args.students} students)\n')
+    print(f'{"":<22}' + ''.join(f'{mode:>10}' for mode in MODES) + f'{"warm/off":>10}')
+    for name in names:
+        row = [results[mode][name] for mode in MODES]
+        ratio = row[2] / row[0] if row[0] else 0
+        print(f'{name:<22}' + ''.join(f'{value:>10.1f}' for value in row) + f'{ratio:>9.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Per-hostel workbook benchmark: build time by WORKBOOK_PROCESSES.
+
+Seeds a synthetic database and times build_hostel_workbook() with each
+process count, reporting the median time and the speed-up over 1
+(sheets built in-process, one after another).
+
+    python -m benchmarks.workbook --students 100000 --hostels 8 --processes 1 2 4 8
+
+The speed-up is bounded by the cores actually available (printed with the
+results) and by the number of hostels: one sheet per process at most.
+On a single-core machine extra processes only add spawn overhead.
+Measured on a 1-core container (20000 students, 4 hostels, 3 runs):
+1 process 0.51 s, 2 processes 2.58 s, 4 processes 4.24 s. Those show
+the cost of spawning, not the parallel speed-up, which has not been
+measured on a multi-core machine yet; run this on the production
+hardware before relying on WORKBOOK_PROCESSES > 1.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def measure(students, hostels, process_counts, runs, workdir):
+    """{processes: [seconds per run]}"""
+    os.environ['DATABASE_URI'] = f'sqlite:///{os.path.join(workdir, "workbook.db")}'
+    os.environ['EXPORT_CACHE_ENABLED'] = 'false'
+    from app import app
+    from commands import init_database
+    from models.database import db
+    from utils.seed import seed_database
+    from utils.workbook import build_hostel_workbook
+
+    with app.app_context():
+        init_database()
+        seed_database(hostels=hostels, students=students, payments=0, announcements=0)
+        db.session.remove()
+
+    timings = {}
+    for processes in process_counts:
+        app.config['WORKBOOK_PROCESSES'] = processes
+        timings[processes] = []
+        for _ in range(runs):
+            with app.app_context():
+                started = time.perf_counter()
+                build_hostel_workbook()
+                timings[processes].append(time.perf_counter() - started)
+                db.session.remove()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--students', type=int, default=20000)
+    parser.add_argument('--hostels', type=int, default=4)
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        timings = measure(args.students, args.hostels, args.processes, args.runs, workdir)
+
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    print(f'{args.students} students, {args.hostels} hostels, {cores} core(s) available')
+    print(f'{"processes":>9}{"median s":>10}{"speed-up":>10}')
+    base = statistics.median(timings[args.processes[0]])
+    for processes, runs in timings.items():
+        median = statistics.median(runs)
+        print(f'{processes:>9}{median:>10.2f}{base / median:>9.2f}x')
+    if cores == 1:
+        print('Only one core: the timings show spawn overhead, not parallel speed-up.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+import click
+from flask import current_app
+
+
+def init_database():
+    """
+    Create missing tables, columns and indexes and the default admin.
+    Safe to run repeatedly. Returns True if the admin was created.
+    """
+    from werkzeug.security import generate_password_hash
+    from models.database import db, ensure_columns, ensure_indexes
+    from models.user import User
+
+    db.create_all()
+    ensure_columns()
+    ensure_indexes()
+
+    # Create default admin if not exists
+    admin = User.query.filter_by(username='admin').first()
+    if admin:
+        return False
+    db.session.add(User(
+        username='admin',
+        password=generate_password_hash('admin123'),
+        role='admin',
+        email='admin@hostel.com'
+    ))
+    db.session.commit()
+    return True
+
+
+def check_schema():
+    """
+    Fail fast when an existing database is behind the models, instead of
+    erroring on the first query that touches a new table or column.
+    An empty database is left alone: it is about to be initialized.
+    """
+    from models.database import db, missing_schema
+
+    missing = missing_schema()
+    if missing and len(missing) < len(db.metadata.tables):
+        raise RuntimeError(
+            f'Database schema is out of date (missing {", ".join(missing[:10])}'
+            f'{", ..." if len(missing) > 10 else ""}). Run `flask init-db` or set AUTO_INIT_DB.'
+        )
+
+
+def register_commands(app):
+    """Register maintenance commands on the Flask CLI"""
+
+    @app.cli.command('init-db')
+    @click.option('--repair-shards', is_flag=True,
+                  help='Delete student users and students left without their counterpart by a failed write.')
+    def init_db_command(repair_shards):
+        """Create the database schema and the default admin user."""
+        created = init_database()
+        click.echo('Database initialized' + (' (default admin created)' if created else ''))
+
+        # Catalog and shard writes are not atomic together (see models.sharding)
+        shards = current_app.extensions.get('shards')
+        if shards is None:
+            return
+        users, students = shards.orphans()
+        if not users and not students:
+            return
+        if users:
+            click.echo(f'{len(users)} student users have no student in any shard: {users[:20]}', err=True)
+        for code, ids in students.items():
+            click.echo(f'{len(ids)} students in shard {code} have no user: {ids[:20]}', err=True)
+        if repair_shards:
+            shards.repair_orphans(users, students)
+            click.echo('Removed the orphaned rows')
+        else:
+            click.echo('Run flask init-db --repair-shards to remove them', err=True)
+
+    @app.cli.command('precompile-templates')
+    def precompile_templates_command():
+        """Compile all templates into the shared bytecode cache."""
+        from jinja2 import TemplateError
+        from utils.templates import precompile_templates
+
+        if not current_app.config.get('TEMPLATE_CACHE_ENABLED'):
+            raise click.ClickException('TEMPLATE_CACHE_ENABLED is off; nothing to precompile')
+        try:
+            names = precompile_templates(current_app)
+        except TemplateError as e:
+            raise click.ClickException(f'Template compilation failed: {e}')
+        click.echo(f'Precompiled {len(names)} templates into {current_app.config["TEMPLATE_CACHE_FOLDER"]}')
+
+    @app.cli.command('archive-audit-logs')
+    @click.option('--days', type=int, default=None,
+                  help='Archive entries older than this many days (default: AUDIT_RETENTION_DAYS).')
+    @click.option('--folder', default=None,
+                  help='Archive folder (default: AUDIT_ARCHIVE_FOLDER).')
+    def archive_audit_logs(days, folder):
+        """Move old ChangeLog entries into a compressed archive."""
+        from utils.audit import archive_change_logs
+
+        days = days if days is not None else current_app.config['AUDIT_RETENTION_DAYS']
+        folder = folder or current_app.config['AUDIT_ARCHIVE_FOLDER']
+
+        count, path = archive_change_logs(folder, older_than_days=days)
+        if count:
+            click.echo(f'Archived {count} audit entries to {path}')
+        else:
+            click.echo('No audit entries to archive')
+
+    @app.cli.command('collection-report')
+    @click.option('--period', type=click.Choice(['day', 'week', 'month']), default='month',
+                  help='Bucket size.')
+    @click.option('--start', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+                  help='First day to include (default: depends on the period).')
+    @click.option('--end', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+                  help='Last day to include (default: today).')
+    @click.option('--hostel', 'hostel_code', default=None, help='Only this hostel code.')
+    @click.option('--format', 'output_format', type=click.Choice(['csv', 'json']), default='csv')
+    @click.option('--output', type=click.File('w'), default='-', help='Output file (default: stdout).')
+    def collection_report_command(period, start, end, hostel_code, output_format, output):
+        """Print collected amounts per hostel by day, week or month."""
+        import json
+        from models.consultancy import Consultancy
+        from models.sharding import use_shard
+        from utils.analytics import collection_report, report_to_csv
+
+        consultancy_id = None
+        if hostel_code:
+            consultancy = Consultancy.query.filter_by(hostel_code=hostel_code).first()
+            if not consultancy:
+                raise click.ClickException(f'Hostel {hostel_code} not found')
+            consultancy_id = consultancy.id
+            use_shard(hostel_code)
+
+        try:
+            report = collection_report(period, start, end, consultancy_id)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+
+        if output_format == 'json':
+            output.write(json.dumps(report, indent=2) + '\n')
+        else:
+            output.write(report_to_csv(report))
+
+    @app.cli.command('seed')
+    @click.option('--hostels', type=int, default=4, help='Number of hostels (HOSTELS first, then synthetic codes).')
+    @click.option('--students', type=int, default=1000)
+    @click.option('--payments', type=int, default=2, help='Maximum payments per student.')
+    @click.option('--announcements', type=int, default=5)
+    @click.option('--seed', type=int, default=42, help='Random seed; the same seed gives the same data.')
+    @click.option('--chunk-size', type=int, default=10000, help='Students inserted per commit.')
+    @click.option('--until', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+                  help='Payments are dated in the year before this day (default 2025-01-01).')
+    def seed_command(hostels, students, payments, announcements, seed, chunk_size, until):
+        """Fill the database with synthetic hostels, students and payments."""
+        import time
+        from utils.seed import seed_database, DEFAULT_STUDENT_PASSWORD, DEFAULT_AGENT_PASSWORD
+
+        init_database()
+        started = time.perf_counter()
+        created = seed_database(
+            hostels=hostels, students=students, payments=payments, announcements=announcements,
+            seed=seed, chunk_size=chunk_size, until=until,
+            progress=lambda done: click.echo(f'  {done}/{students} students', err=True)
+        )
+        click.echo(
+            f"Seeded {created['hostels']} hostels, {created['students']} students, "
+            f"{created['payments']} payments and {created['announcements']} announcements "
+            f'in {time.perf_counter() - started:.1f}s'
+        )
+        click.echo(f'Students log in with their PRN and password {DEFAULT_STUDENT_PASSWORD}; '
+                   f'agents as agent_<hostel code> with password {DEFAULT_AGENT_PASSWORD}')
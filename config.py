@@ -7,13 +7,100 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URI') or 'sqlite:///consultancy.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Run `flask init-db` automatically on startup (for hosts without a CLI step)
+    AUTO_INIT_DB = (os.environ.get('AUTO_INIT_DB') or '').lower() in ('1', 'true', 'yes')
+
+    # Read replica for dashboards and exports (views marked @read_replica).
+    # Either a second database URI, or "readonly" to read the primary
+    # SQLite file through a separate read-only connection.
+    DATABASE_READ_URI = os.environ.get('DATABASE_READ_URI')
+
+    # Engine profile: "production" tunes SQLite connections (WAL,
+    # busy_timeout, cache, mmap) and the pool for server databases;
+    # "default" leaves SQLAlchemy's defaults untouched.
+    DB_ENGINE_PROFILE = os.environ.get('DB_ENGINE_PROFILE') or 'default'
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE') or 'WAL'
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS') or 'NORMAL'
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS') or 5000)
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB') or 65536)
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE') or 256 * 1024 * 1024)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE') or 10)
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW') or 20)
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE') or 1800)
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT') or 30)
+
+    # Per-hostel sharding: students, transactions and change logs of each
+    # hostel in SHARD_FOLDER/<hostel_code>.db (see models/sharding.py)
+    SHARDING_ENABLED = (os.environ.get('SHARDING_ENABLED') or '').lower() in ('1', 'true', 'yes')
+    SHARD_FOLDER = os.environ.get('SHARD_FOLDER') or 'instance/shards'
+    SHARD_FAN_OUT_WORKERS = int(os.environ.get('SHARD_FAN_OUT_WORKERS') or 8)
     UPLOAD_FOLDER = 'static/uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
+
+    # Request metrics (latency, SQL count/time, response size per endpoint),
+    # shared between workers through METRICS_FOLDER; see utils/metrics.py
+    METRICS_ENABLED = (os.environ.get('METRICS_ENABLED') or 'true').lower() in ('1', 'true', 'yes')
+    METRICS_FOLDER = os.environ.get('METRICS_FOLDER') or 'instance/metrics'
+    METRICS_FLUSH_SECONDS = int(os.environ.get('METRICS_FLUSH_SECONDS') or 10)
+
+    # Static assets: content-hash URLs, immutable caching, gzip/brotli
+    # (brotli if installed); dynamic text responses compressed above
+    # COMPRESS_MIN_SIZE bytes. See utils/assets.py
+    ASSET_PIPELINE_ENABLED = (os.environ.get('ASSET_PIPELINE_ENABLED') or 'true').lower() in ('1', 'true', 'yes')
+    ASSET_MAX_BYTES = int(os.environ.get('ASSET_MAX_BYTES') or 2 * 1024 * 1024)
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE') or 1024)
+    COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL') or 6)
+    COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY') or 4)
+
+    # Compiled Jinja templates shared by all workers (flask precompile-templates)
+    TEMPLATE_CACHE_ENABLED = (os.environ.get('TEMPLATE_CACHE_ENABLED') or 'true').lower() in ('1', 'true', 'yes')
+    TEMPLATE_CACHE_FOLDER = os.environ.get('TEMPLATE_CACHE_FOLDER') or 'instance/jinja_cache'
+
+    # Generated export workbooks, reused until the data version changes
+    EXPORT_CACHE_ENABLED = (os.environ.get('EXPORT_CACHE_ENABLED') or 'true').lower() in ('1', 'true', 'yes')
+    EXPORT_CACHE_FOLDER = os.environ.get('EXPORT_CACHE_FOLDER') or 'instance/export_cache'
+    EXPORT_CACHE_MAX_BYTES = int(os.environ.get('EXPORT_CACHE_MAX_BYTES') or 200 * 1024 * 1024)
+
+    # Background export jobs (?job=1 on the admin exports)
+    EXPORT_JOB_FOLDER = os.environ.get('EXPORT_JOB_FOLDER') or 'instance/export_jobs'
+    EXPORT_JOB_WORKERS = int(os.environ.get('EXPORT_JOB_WORKERS') or 1)
+    EXPORT_JOB_MAX_ACTIVE = int(os.environ.get('EXPORT_JOB_MAX_ACTIVE') or 2)
+    EXPORT_JOB_TTL_SECONDS = int(os.environ.get('EXPORT_JOB_TTL_SECONDS') or 6 * 3600)
+
+    # Processes used to build the per-hostel workbook (1 = in-process, 0 = one per core).
+    # Stays 1 until benchmarks/workbook.py shows a gain on the production hardware.
+    # Children are spawned, so the entry point must be import-safe (an
+    # `if __name__ == '__main__':` guard); without one the sheets are built in-process.
+    WORKBOOK_PROCESSES = int(os.environ.get('WORKBOOK_PROCESSES') or 1)
+
+    # Cache rendered dashboard/listing pages until their data version changes
+    PAGE_CACHE_ENABLED = (os.environ.get('PAGE_CACHE_ENABLED') or 'true').lower() in ('1', 'true', 'yes')
+    PAGE_CACHE_SIZE = int(os.environ.get('PAGE_CACHE_SIZE') or 512)
+    # Per worker process; least recently used pages are dropped beyond it
+    PAGE_CACHE_MAX_BYTES = int(os.environ.get('PAGE_CACHE_MAX_BYTES') or 32 * 1024 * 1024)
+
+    # Slow-query log with query plans, browsable at /admin/slow-queries
+    SLOW_QUERY_LOG_ENABLED = (os.environ.get('SLOW_QUERY_LOG_ENABLED') or 'true').lower() in ('1', 'true', 'yes')
+    SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS') or 200)
+    SLOW_QUERY_BUFFER_SIZE = int(os.environ.get('SLOW_QUERY_BUFFER_SIZE') or 200)
+    SLOW_QUERY_FOLDER = os.environ.get('SLOW_QUERY_FOLDER') or 'instance/slow_queries'
+    SLOW_QUERY_FLUSH_SECONDS = int(os.environ.get('SLOW_QUERY_FLUSH_SECONDS') or 30)
+
+    # N+1 lazy-load detector: "off", "warn" or "raise" (default: raise when
+    # TESTING, warn in debug mode, otherwise off); see utils/nplusone.py
+    NPLUSONE_MODE = os.environ.get('NPLUSONE_MODE')
+    NPLUSONE_THRESHOLD = int(os.environ.get('NPLUSONE_THRESHOLD') or 5)
+
+    # Audit log retention (older ChangeLog rows are moved to gzipped archives)
+    AUDIT_RETENTION_DAYS = int(os.environ.get('AUDIT_RETENTION_DAYS') or 180)
+    AUDIT_ARCHIVE_FOLDER = os.environ.get('AUDIT_ARCHIVE_FOLDER') or 'instance/audit_archive'
     
     # Payment Gateway Configuration (Razorpay example)
     RAZORPAY_KEY_ID = os.environ.get('RAZORPAY_KEY_ID') or 'test_key'
     RAZORPAY_KEY_SECRET = os.environ.get('RAZORPAY_KEY_SECRET') or 'test_secret'
+    # Override the Razorpay API host, e.g. the fake gateway used for load tests
+    RAZORPAY_BASE_URL = os.environ.get('RAZORPAY_BASE_URL')
 
      # Email (OTP reset)
     MAIL_SERVER = os.environ.get('MAIL_SERVER') or 'smtp.gmail.com'
@@ -0,0 +1,303 @@
+"""
+Load-test driver: concurrent students, agents and admins against a running app.
+
+Students log in, poll announcements, open their dashboard and pay through
+create-payment-order -> fake gateway checkout -> verify-payment. Agents and
+admins run searches, dashboards and exports. Reports request counts, error
+rates and latency percentiles per route.
+
+Seed data first (flask seed), then either point the driver at a server you
+started yourself with RAZORPAY_BASE_URL set to a fake gateway:
+
+    python -m loadtest.driver --url http://127.0.0.1:8000 --gateway-url http://127.0.0.1:9010
+
+or let it start the fake gateway and a local gunicorn:
+
+    python -m loadtest.driver --spawn --gunicorn-workers 4 --users 50 --duration 60
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loadtest import fake_gateway
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Measure each response on its own instead of following redirects"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def add(self, label, seconds, ok):
+        with self.lock:
+            self.samples.setdefault(label, []).append((seconds, ok))
+
+
+class VirtualUser:
+    def __init__(self, base_url, gateway_url, recorder, think_time, rng):
+        self.base_url = base_url.rstrip('/')
+        self.gateway_url = gateway_url.rstrip('/') if gateway_url else None
+        self.recorder = recorder
+        self.think_time = think_time
+        self.rng = rng
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(CookieJar()), NoRedirect
+        )
+
+    def request(self, label, path, form=None, payload=None, url=None):
+        data, headers = None, {}
+        if form is not None:
+            data = urllib.parse.urlencode(form).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif payload is not None:
+            data = json.dumps(payload).encode()
+            headers['Content-Type'] = 'application/json'
+        req = urllib.request.Request(url or self.base_url + path, data=data, headers=headers)
+
+        started = time.perf_counter()
+        try:
+            with self.opener.open(req, timeout=60) as response:
+                body = response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            body = e.read()
+            status = e.code
+        except (urllib.error.URLError, OSError):
+            body, status = b'', 0
+        self.recorder.add(label, time.perf_counter() - started, 0 < status < 400)
+
+        if self.think_time:
+            time.sleep(self.rng.uniform(0, 2 * self.think_time))
+        return status, body
+
+    def request_json(self, label, path, payload, url=None):
+        status, body = self.request(label, path, payload=payload, url=url)
+        try:
+            return status, json.loads(body)
+        except ValueError:
+            return status, None
+
+    def login(self, username, password):
+        status, _ = self.request('POST /login', '/login', form={'username': username, 'password': password})
+        return status == 302
+
+    def logout(self):
+        self.request('GET /logout', '/logout')
+
+
+def student_session(user, username, password, pay_ratio):
+    if not user.login(username, password):
+        return
+    user.request('GET /api/active-announcements', '/api/active-announcements')
+    user.request('GET /student/dashboard', '/student/dashboard')
+
+    if user.gateway_url and user.rng.random() < pay_ratio:
+        amount = user.rng.choice((500, 1000, 2500))
+        status, order = user.request_json('POST /student/create-payment-order', '/student/create-payment-order',
+                                          {'amount': amount})
+        if status == 200 and order and order.get('success'):
+            status, checkout = user.request_json('gateway checkout', None, {'order_id': order['order_id']},
+                                                 url=f'{user.gateway_url}/v1/test/checkout')
+            if status == 200 and checkout:
+                user.request('POST /student/verify-payment', '/student/verify-payment', payload={
+                    'order_id': checkout['razorpay_order_id'],
+                    'payment_id': checkout['razorpay_payment_id'],
+                    'signature': checkout['razorpay_signature'],
+                    'amount': order['amount']
+                })
+        user.request('GET /student/transaction-history', '/student/transaction-history')
+    user.logout()
+
+
+def agent_session(user, username, password, export_ratio):
+    if not user.login(username, password):
+        return
+    user.request('GET /agent/dashboard', '/agent/dashboard')
+    term = user.rng.choice(('Patil', 'Shah', 'CSE', 'SD0000'))
+    user.request('GET /agent/students', f'/agent/students?search={term}')
+    user.request('GET /agent/payment-history', '/agent/payment-history')
+    if user.rng.random() < export_ratio:
+        user.request('GET /agent/students/export', '/agent/students/export')
+    user.logout()
+
+
+def admin_session(user, username, password, export_ratio, hostel_codes):
+    if not user.login(username, password):
+        return
+    user.request('GET /admin/dashboard', '/admin/dashboard')
+    code = user.rng.choice(hostel_codes) if hostel_codes else ''
+    term = user.rng.choice(('Patil', 'Shah', 'CSE'))
+    user.request('GET /admin/students/filtered',
+                 f'/admin/students/filtered?hostel_code={code}&search={term}&pending_filter=has_pending')
+    if user.rng.random() < export_ratio:
+        user.request('GET /admin/students/export', f'/admin/students/export?hostel_code={code}')
+        user.request('GET /admin/payment-history/export', '/admin/payment-history/export')
+    user.logout()
+
+
+def load_accounts(database_uri, limit):
+    """Student and agent usernames and hostel codes from the (catalog) database"""
+    from sqlalchemy import create_engine, text
+
+    engine = create_engine(database_uri)
+    with engine.connect() as conn:
+        students = conn.execute(text(
+            "SELECT username FROM users WHERE role = 'student' ORDER BY id LIMIT :n"), {'n': limit}).scalars().all()
+        agents = conn.execute(text(
+            "SELECT username FROM users WHERE role = 'agent' ORDER BY id")).scalars().all()
+        codes = conn.execute(text('SELECT hostel_code FROM consultancies ORDER BY hostel_code')).scalars().all()
+    engine.dispose()
+    return students, agents, codes
+
+
+def percentile(values, q):
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def summarize(recorder, elapsed):
+    rows = []
+    for label, samples in sorted(recorder.samples.items()):
+        latencies = sorted(s for s, _ in samples)
+        errors = sum(1 for _, ok in samples if not ok)
+        rows.append({
+            'route': label,
+            'requests': len(samples),
+            'errors': errors,
+            'error_rate': errors / len(samples),
+            'rps': len(samples) / elapsed,
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p90_ms': percentile(latencies, 0.90) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'max_ms': latencies[-1] * 1000
+        })
+    return rows
+
+
+def spawn_gunicorn(args, gateway_url):
+    env = dict(os.environ, RAZORPAY_BASE_URL=gateway_url, RAZORPAY_KEY_SECRET=args.secret)
+    if args.database_uri:
+        env['DATABASE_URI'] = args.database_uri
+    # Several workers share the SQLite file; measure with the tuned profile unless told otherwise
+    env.setdefault('DB_ENGINE_PROFILE', 'production')
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-w', str(args.gunicorn_workers), '--threads', str(args.gunicorn_threads),
+         '-b', f'127.0.0.1:{args.port}', 'app:app'],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), env=env
+    )
+    url = f'http://127.0.0.1:{args.port}'
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url + '/login', timeout=2).close()
+            return proc, url
+        except OSError:
+            if proc.poll() is not None:
+                raise SystemExit('gunicorn exited during startup')
+            time.sleep(0.5)
+    proc.terminate()
+    raise SystemExit('gunicorn did not start within 60s')
+
+
+def main():
+    from config import Config
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help='App URL (ignored with --spawn).')
+    parser.add_argument('--gateway-url', default=None, help='Fake gateway URL (started automatically with --spawn).')
+    parser.add_argument('--spawn', action='store_true', help='Start the fake gateway and a local gunicorn.')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--gunicorn-workers', type=int, default=4)
+    parser.add_argument('--gunicorn-threads', type=int, default=1)
+    parser.add_argument('--secret', default=Config.RAZORPAY_KEY_SECRET, help='Key secret the fake gateway signs with.')
+    parser.add_argument('--database-uri', default=os.environ.get('DATABASE_URI'),
+                        help='Database to read test accounts from (default: DATABASE_URI / app config).')
+    parser.add_argument('--users', type=int, default=20, help='Concurrent virtual users.')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to run.')
+    parser.add_argument('--mix', default='90,8,2', help='Percent of students,agents,admins.')
+    parser.add_argument('--pay-ratio', type=float, default=0.3)
+    parser.add_argument('--export-ratio', type=float, default=0.1)
+    parser.add_argument('--think-time', type=float, default=0.2, help='Mean pause between requests (seconds).')
+    parser.add_argument('--student-password', default='9999999999')
+    parser.add_argument('--agent-password', default='agent123')
+    parser.add_argument('--admin-user', default='admin')
+    parser.add_argument('--admin-password', default='admin123')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', dest='json_path', help='Also write the report to this file.')
+    args = parser.parse_args()
+
+    database_uri = args.database_uri or Config.SQLALCHEMY_DATABASE_URI
+    students, agents, codes = load_accounts(database_uri, max(args.users * 10, 100))
+    if not students:
+        raise SystemExit('No student accounts found; run "flask seed" first')
+
+    gateway = proc = None
+    url, gateway_url = args.url, args.gateway_url
+    if args.spawn:
+        gateway = fake_gateway.start(secret=args.secret)
+        gateway_url = gateway.url
+        proc, url = spawn_gunicorn(args, gateway_url)
+
+    weights = [float(w) for w in args.mix.split(',')]
+    recorder = Recorder()
+    deadline = time.perf_counter() + args.duration
+
+    def virtual_user(index):
+        rng = random.Random(args.seed * 100003 + index)
+        while time.perf_counter() < deadline:
+            user = VirtualUser(url, gateway_url, recorder, args.think_time, rng)
+            role = rng.choices(('student', 'agent', 'admin'), weights=weights)[0]
+            if role == 'agent' and agents:
+                agent_session(user, rng.choice(agents), args.agent_password, args.export_ratio)
+            elif role == 'admin':
+                admin_session(user, args.admin_user, args.admin_password, args.export_ratio, codes)
+            else:
+                student_session(user, rng.choice(students), args.student_password, args.pay_ratio)
+
+    started = time.perf_counter()
+    try:
+        threads = [threading.Thread(target=virtual_user, args=(i,)) for i in range(args.users)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+        if gateway is not None:
+            gateway.shutdown()
+    elapsed = time.perf_counter() - started
+
+    rows = summarize(recorder, elapsed)
+    print(f'{"route":<36}{"reqs":>7}{"err%":>7}{"rps":>8}{"p50":>9}{"p90":>9}{"p99":>9}{"max":>9}')
+    for r in rows:
+        print(f'{r["route"]:<36}{r["requests"]:>7}{r["error_rate"] * 100:>7.1f}{r["rps"]:>8.1f}'
+              f'{r["p50_ms"]:>9.1f}{r["p90_ms"]:>9.1f}{r["p99_ms"]:>9.1f}{r["max_ms"]:>9.1f}')
+    total = sum(r['requests'] for r in rows)
+    errors = sum(r['errors'] for r in rows)
+    print(f'{total} requests in {elapsed:.1f}s ({total / elapsed:.1f}/s), {errors} errors')
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({'elapsed': elapsed, 'routes': rows}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Local stand-in for the Razorpay API, for load tests.
+
+Implements the calls the app makes (create order, fetch payment) plus a
+test-only checkout endpoint that "pays" an order and returns a payment id
+and signature made with the test key secret, exactly as checkout.js would
+hand them to verify_payment.
+
+    python -m loadtest.fake_gateway --port 9010 --secret test_secret
+    RAZORPAY_BASE_URL=http://127.0.0.1:9010 gunicorn -w 4 app:app
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def sign(secret, order_id, payment_id):
+    """Razorpay payment signature: HMAC-SHA256 of 'order_id|payment_id'"""
+    message = f'{order_id}|{payment_id}'.encode()
+    return hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+class FakeGateway(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, secret, latency=0.0):
+        super().__init__(address, GatewayHandler)
+        self.secret = secret
+        self.latency = latency
+        self.orders = {}
+        self.payments = {}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+
+class GatewayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def do_POST(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+
+        if self.path == '/v1/orders':
+            data = self._body()
+            order = {
+                'id': f'order_{uuid.uuid4().hex[:14]}',
+                'entity': 'order',
+                'amount': data.get('amount'),
+                'amount_paid': 0,
+                'currency': data.get('currency', 'INR'),
+                'receipt': data.get('receipt'),
+                'status': 'created',
+                'created_at': int(time.time())
+            }
+            with server.lock:
+                server.orders[order['id']] = order
+            return self._send(200, order)
+
+        if self.path == '/v1/test/checkout':
+            # What checkout.js returns to the browser after a successful payment
+            order_id = self._body().get('order_id')
+            with server.lock:
+                order = server.orders.get(order_id)
+                if order is None:
+                    return self._send(400, {'error': {'code': 'BAD_REQUEST_ERROR', 'description': 'Unknown order'}})
+                payment_id = f'pay_{uuid.uuid4().hex[:14]}'
+                order['status'] = 'paid'
+                order['amount_paid'] = order['amount']
+                server.payments[payment_id] = {
+                    'id': payment_id, 'entity': 'payment', 'order_id': order_id,
+                    'amount': order['amount'], 'currency': order['currency'], 'status': 'captured'
+                }
+            return self._send(200, {
+                'razorpay_order_id': order_id,
+                'razorpay_payment_id': payment_id,
+                'razorpay_signature': sign(server.secret, order_id, payment_id)
+            })
+
+        self._send(404, {'error': {'code': 'BAD_REQUEST_ERROR', 'description': 'Not found'}})
+
+    def do_GET(self):
+        if self.path.startswith('/v1/payments/'):
+            payment = self.server.payments.get(self.path.rsplit('/', 1)[-1])
+            if payment:
+                return self._send(200, payment)
+        self._send(404, {'error': {'code': 'BAD_REQUEST_ERROR', 'description': 'Not found'}})
+
+
+def start(host='127.0.0.1', port=0, secret='test_secret', latency=0.0):
+    """Run a fake gateway in a background thread; port 0 picks a free port"""
+    server = FakeGateway((host, port), secret, latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9010)
+    parser.add_argument('--secret', default='test_secret',
+                        help='Must match RAZORPAY_KEY_SECRET (or the hostel\'s gateway key) of the app.')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to each API call.')
+    args = parser.parse_args()
+
+    server = FakeGateway((args.host, args.port), args.secret, args.latency)
+    print(f'Fake Razorpay API on {server.url}')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
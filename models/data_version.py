@@ -0,0 +1,12 @@
+from models.database import db
+
+
+class DataVersion(db.Model):
+    """Monotonic change counters used to invalidate caches (see utils/data_version.py)"""
+    __tablename__ = 'data_versions'
+
+    scope = db.Column(db.String(50), primary_key=True)  # e.g. consultancy:3, catalog
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DataVersion {self.scope}={self.version}>'
@@ -1,3 +1,245 @@
+import sqlite3
+from flask import g, has_app_context, current_app
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy.sql.util import find_tables
 
-db = SQLAlchemy()
\ No newline at end of file
+READ_REPLICA_BIND = 'replica'
+
+# Tables stored per hostel when sharding is enabled (see models.sharding)
+SHARDED_TABLES = frozenset({'students', 'transactions', 'change_logs'})
+
+
+def _shard_registry():
+    if has_app_context():
+        return current_app.extensions.get('shards')
+    return None
+
+
+def _is_sharded(mapper, clause):
+    """True if the mapper or statement touches a per-hostel table"""
+    if mapper is not None and inspect(mapper).local_table.name in SHARDED_TABLES:
+        return True
+    if clause is not None:
+        return any(
+            getattr(table, 'name', None) in SHARDED_TABLES
+            for table in find_tables(clause, check_columns=True, include_joins=True, include_crud=True)
+        )
+    return False
+
+
+class RoutingSession(Session):
+    """
+    Session that sends reads to the read replica bind while the current
+    request is marked read-only (see utils.decorators.read_replica).
+    Flushes and INSERT/UPDATE/DELETE statements always use the primary.
+
+    In sharding mode, statements touching students, transactions or
+    change_logs go to the hostel shard chosen by (in order) an explicit
+    `shard` bind argument, the instance being flushed, or g.shard.
+    """
+
+    def __init__(self, db, **kwargs):
+        super().__init__(db, **kwargs)
+        if _shard_registry() is not None:
+            self.connection_callable = self._connection_for_instance
+
+    def _connection_for_instance(self, mapper=None, instance=None, **kwargs):
+        trans = self.get_transaction() or self.begin()
+        return trans.connection(mapper, instance=instance)
+
+    def get_bind(self, mapper=None, clause=None, bind=None, shard=None, instance=None, **kwargs):
+        registry = _shard_registry()
+        if bind is None and registry is not None and _is_sharded(mapper, clause):
+            if shard is None and instance is not None:
+                shard = registry.shard_for(instance)
+            shard = shard or g.get('shard')
+            if shard:
+                return registry.engine(shard)
+            # Nothing selected: fall back to the (empty) catalog tables
+            return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+        if (
+            bind is None
+            and not self._flushing
+            and not isinstance(clause, UpdateBase)
+            and has_app_context()
+            and g.get('db_read_only')
+        ):
+            engine = self._db.engines.get(READ_REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _route_relationship_loads(orm_execute_state):
+    """Lazy loads follow the shard of the parent object (e.g. consultancy.students)"""
+    registry = _shard_registry()
+    if (
+        registry is None
+        or not orm_execute_state.is_select
+        or orm_execute_state.lazy_loaded_from is None
+    ):
+        return None
+    shard = registry.shard_for(orm_execute_state.lazy_loaded_from.obj())
+    if shard:
+        return orm_execute_state.invoke_statement(bind_arguments={'shard': shard})
+    return None
+
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+def configure_read_replica(app):
+    """
+    Register the read replica bind from DATABASE_READ_URI.
+    "readonly" opens the primary SQLite file through a separate read-only
+    connection; any other value is used as the replica URI.
+    Must run before db.init_app().
+    """
+    read_uri = app.config.get('DATABASE_READ_URI')
+    if not read_uri:
+        return
+
+    if read_uri == 'readonly':
+        url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+        if not url.drivername.startswith('sqlite') or not url.database:
+            raise ValueError('DATABASE_READ_URI=readonly requires a file-based SQLite database')
+        read_uri = f'sqlite:///file:{url.database}?mode=ro&uri=true'
+
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    binds[READ_REPLICA_BIND] = read_uri
+    app.config['SQLALCHEMY_BINDS'] = binds
+
+
+def sqlite_pragmas(config):
+    """PRAGMA settings for the production SQLite profile"""
+    return {
+        'journal_mode': config.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': config.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': config.get('SQLITE_BUSY_TIMEOUT_MS', 5000),
+        # Negative cache_size is in KiB
+        'cache_size': -abs(config.get('SQLITE_CACHE_SIZE_KB', 65536)),
+        'mmap_size': config.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024),
+        'temp_store': 'MEMORY',
+    }
+
+
+def set_sqlite_pragmas(dbapi_connection, pragmas):
+    """Apply PRAGMAs to a raw sqlite3 connection"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            try:
+                cursor.execute(f'PRAGMA {name}={value}')
+            except sqlite3.OperationalError:
+                # journal_mode is persistent in the file and cannot be switched
+                # from read-only (replica) connections; keep the current mode
+                if name != 'journal_mode':
+                    raise
+    finally:
+        cursor.close()
+
+
+def attach_sqlite_pragmas(engine, pragmas):
+    """Apply `pragmas` to every new connection of `engine` (SQLite engines only)"""
+    if not pragmas or engine.dialect.name != 'sqlite':
+        return
+
+    def on_connect(dbapi_connection, connection_record):
+        set_sqlite_pragmas(dbapi_connection, pragmas)
+
+    event.listen(engine, 'connect', on_connect)
+
+
+def apply_engine_profile(app):
+    """
+    Apply the DB_ENGINE_PROFILE from config. "production" enables WAL,
+    synchronous=NORMAL, busy_timeout, a larger page cache and mmap on the
+    app's SQLite connections, and sizes the pool (with pre-ping) for server
+    databases. "default" leaves SQLAlchemy's settings untouched.
+    Must run before db.init_app(); attach_engine_profile() then installs
+    the PRAGMAs on the engines it created.
+    """
+    app.extensions['sqlite_pragmas'] = None
+    if app.config.get('DB_ENGINE_PROFILE') != 'production':
+        return
+
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+
+    # Also used for SQLite replicas and shards (see models.sharding)
+    app.extensions['sqlite_pragmas'] = sqlite_pragmas(app.config)
+    if not url.drivername.startswith('sqlite'):
+        options.setdefault('pool_size', app.config.get('DB_POOL_SIZE', 10))
+        options.setdefault('max_overflow', app.config.get('DB_MAX_OVERFLOW', 20))
+        options.setdefault('pool_recycle', app.config.get('DB_POOL_RECYCLE', 1800))
+        options.setdefault('pool_timeout', app.config.get('DB_POOL_TIMEOUT', 30))
+    options.setdefault('pool_pre_ping', True)
+
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def attach_engine_profile(app):
+    """Install the profile's PRAGMAs on the primary and replica engines; run after db.init_app()"""
+    pragmas = app.extensions.get('sqlite_pragmas')
+    if not pragmas:
+        return
+    with app.app_context():
+        for engine in db.engines.values():
+            attach_sqlite_pragmas(engine, pragmas)
+
+
+def ensure_columns(bind=None):
+    """
+    Add columns declared on models that are missing from existing tables
+    (e.g. the generated students.fees_pending column on older databases).
+    """
+    engine = bind or db.engine
+    existing_tables = set(inspect(engine).get_table_names())
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {column['name'] for column in inspect(conn).get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {ddl}'))
+
+
+def missing_schema(bind=None):
+    """
+    Tables, columns and indexes declared on models but missing from the
+    database, as ['table x', 'column x.y', 'index ix_...']. Only reads the
+    catalog (a few PRAGMA/information_schema queries).
+    """
+    engine = bind or db.engine
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            missing.append(f'table {table.name}')
+            continue
+        columns = {column['name'] for column in inspector.get_columns(table.name)}
+        missing.extend(f'column {table.name}.{column.name}' for column in table.columns if column.name not in columns)
+        indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        missing.extend(f'index {index.name}' for index in table.indexes if index.name not in indexes)
+    return missing
+
+
+def ensure_indexes(bind=None):
+    """Create indexes declared on models that are missing from existing tables"""
+    engine = bind or db.engine
+    existing_tables = set(inspect(engine).get_table_names())
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
@@ -0,0 +1,227 @@
+"""
+Optional per-hostel sharding.
+
+With SHARDING_ENABLED, students, transactions and change logs of each
+hostel live in their own SQLite file (SHARD_FOLDER/<hostel_code>.db).
+The primary database stays the global catalog for users, consultancies
+and announcements. Each shard also keeps a copy of its own consultancy
+row so hostel joins work locally.
+
+Routing happens in models.database.RoutingSession. Agents and students
+are bound to their hostel's shard automatically. Admins work on the
+hostel given by ?hostel_code= (remembered in the session). Admin
+aggregates, listings, API lists, exports and bulk operations run
+without a hostel use ShardRegistry.fan_out() to visit every shard in
+parallel, and edits of given students first look up the shard holding
+each student.
+
+Limitation: the catalog and the shards are separate databases, so a
+write touching both (adding or deleting a student and their login user)
+commits once per database, not atomically. If it fails between the two
+commits, a student user without a student row, or a student without a
+user, is left behind. `flask init-db` reports such rows (see
+ShardRegistry.orphans) and `flask init-db --repair-shards` removes them.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, g, request, session
+from flask_login import current_user
+from sqlalchemy import create_engine, delete, event, insert, select
+from sqlalchemy.orm import Session
+from werkzeug.utils import secure_filename
+from models.database import db, attach_sqlite_pragmas, ensure_columns, ensure_indexes, SHARDED_TABLES
+from models.consultancy import Consultancy
+from models.student import Student
+from models.transaction import Transaction
+from models.user import User
+
+
+class ShardRegistry:
+    """Engines for the per-hostel shard databases"""
+
+    def __init__(self, app):
+        self.folder = os.path.abspath(app.config['SHARD_FOLDER'])
+        self.max_workers = app.config.get('SHARD_FAN_OUT_WORKERS', 8)
+        self.engine_options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+        self.pragmas = app.extensions.get('sqlite_pragmas')
+        self._engines = {}
+        self._synced = {}
+        self._lock = threading.Lock()
+
+    def engine(self, hostel_code):
+        engine = self._engines.get(hostel_code)
+        if engine is None:
+            with self._lock:
+                engine = self._engines.get(hostel_code)
+                if engine is None:
+                    os.makedirs(self.folder, exist_ok=True)
+                    path = os.path.join(self.folder, f'{secure_filename(hostel_code)}.db')
+                    engine = create_engine(f'sqlite:///{path}', **self.engine_options)
+                    attach_sqlite_pragmas(engine, self.pragmas)
+                    # Plus the hostel's own consultancy row and data version counters
+                    tables = [
+                        table for table in db.metadata.sorted_tables
+                        if table.name in SHARDED_TABLES or table.name in ('consultancies', 'data_versions')
+                    ]
+                    db.metadata.create_all(engine, tables=tables)
+                    ensure_columns(engine)
+                    ensure_indexes(engine)
+                    self._engines[hostel_code] = engine
+        return engine
+
+    def resolve(self, consultancy_id=None, hostel_code=None):
+        """
+        Catalog row of a consultancy by id or hostel code, cached per request.
+        Reads through the session's catalog connection so consultancies
+        created earlier in the same transaction are visible.
+        """
+        key = ('id', consultancy_id) if consultancy_id is not None else ('code', hostel_code)
+        cache = g.setdefault('_shard_catalog', {})
+        if key not in cache:
+            table = Consultancy.__table__
+            condition = table.c.id == consultancy_id if consultancy_id is not None else table.c.hostel_code == hostel_code
+            conn = db.session.connection(bind_arguments={'bind': db.engines[None]})
+            row = conn.execute(select(table).where(condition)).mappings().first()
+            if row is None:
+                return None
+            self._sync(dict(row))
+            cache[key] = row
+        return cache[key]
+
+    def _sync(self, row):
+        """Keep the shard's copy of its consultancy row in step with the catalog"""
+        code = row['hostel_code']
+        if self._synced.get(code) == row['id']:
+            return
+        table = Consultancy.__table__
+        with self.engine(code).begin() as conn:
+            conn.execute(delete(table).where((table.c.hostel_code == code) | (table.c.id == row['id'])))
+            conn.execute(insert(table), [row])
+        self._synced[code] = row['id']
+
+    def shard_for(self, instance):
+        """Hostel code of the shard an object belongs to, if it has one"""
+        if isinstance(instance, Consultancy):
+            return instance.hostel_code
+        consultancy_id = getattr(instance, 'consultancy_id', None)
+        if consultancy_id is None:
+            return None
+        row = self.resolve(consultancy_id=consultancy_id)
+        return row['hostel_code'] if row else None
+
+    def hostel_codes(self):
+        return list(db.session.scalars(select(Consultancy.hostel_code).order_by(Consultancy.hostel_code)))
+
+    def fan_out(self, fn, codes=None):
+        """Run fn(engine) against every shard in parallel; returns {hostel_code: result}"""
+        codes = self.hostel_codes() if codes is None else list(codes)
+        if not codes:
+            return {}
+        for code in codes:
+            self.resolve(hostel_code=code)
+        workers = max(1, min(len(codes), self.max_workers))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(lambda code: fn(self.engine(code)), codes)
+            return dict(zip(codes, results))
+
+    def shard_codes(self):
+        """Every shard on disk, including those of hostels deleted from the catalog"""
+        codes = set(self.hostel_codes())
+        if os.path.isdir(self.folder):
+            codes.update(name[:-3] for name in os.listdir(self.folder) if name.endswith('.db'))
+        return sorted(codes)
+
+    def orphans(self):
+        """
+        Rows left by a catalog/shard write that failed between its commits.
+        Returns (ids of student users with no student in any shard,
+        {hostel_code: ids of students whose user is gone}).
+        """
+        students = Student.__table__.c
+
+        def shard_students(engine):
+            with engine.connect() as conn:
+                return conn.execute(select(students.id, students.user_id)).all()
+
+        shard_rows = self.fan_out(shard_students, self.shard_codes())
+        user_ids = set(db.session.scalars(select(User.id)))
+        student_user_ids = set(db.session.scalars(select(User.id).where(User.role == 'student')))
+        seen = {user_id for rows in shard_rows.values() for _, user_id in rows}
+
+        users_without_student = sorted(student_user_ids - seen)
+        students_without_user = {}
+        for code, rows in shard_rows.items():
+            missing = [student_id for student_id, user_id in rows if user_id not in user_ids]
+            if missing:
+                students_without_user[code] = missing
+        return users_without_student, students_without_user
+
+    def repair_orphans(self, users_without_student, students_without_user):
+        """Delete the rows found by orphans(): the unfinished half of each failed write"""
+        transactions, students = Transaction.__table__, Student.__table__
+        for code, student_ids in students_without_user.items():
+            with self.engine(code).begin() as conn:
+                conn.execute(delete(transactions).where(transactions.c.student_id.in_(student_ids)))
+                conn.execute(delete(students).where(students.c.id.in_(student_ids)))
+        if users_without_student:
+            with db.engine.begin() as conn:
+                conn.execute(delete(User.__table__).where(User.__table__.c.id.in_(users_without_student)))
+
+    def fan_out_scalars(self, stmt, codes=None):
+        """
+        ORM objects matching `stmt` from every shard, each loaded on its own
+        session in parallel. The objects come back detached, so eager-load
+        any relationship the caller reads.
+        """
+        def load(engine):
+            with Session(engine) as session:
+                return session.scalars(stmt).unique().all()
+
+        return [obj for objs in self.fan_out(load, codes).values() for obj in objs]
+
+
+def sharding_enabled():
+    return current_app.extensions.get('shards') is not None
+
+
+def use_shard(hostel_code):
+    """Route per-hostel tables to `hostel_code` for the rest of the request"""
+    if sharding_enabled():
+        g.shard = hostel_code
+
+
+def select_shard():
+    """before_request hook: pick the shard for the logged-in user"""
+    registry = current_app.extensions['shards']
+    if not current_user.is_authenticated:
+        return
+
+    if current_user.role == 'admin':
+        code = request.args.get('hostel_code')
+        if not code and request.is_json:
+            code = (request.get_json(silent=True) or {}).get('hostel_code')
+        if code and registry.resolve(hostel_code=code):
+            session['shard'] = code
+        code = session.get('shard')
+        if not code or not registry.resolve(hostel_code=code):
+            codes = registry.hostel_codes()
+            code = codes[0] if codes else None
+        g.shard = code
+    elif current_user.consultancy_id:
+        row = registry.resolve(consultancy_id=current_user.consultancy_id)
+        g.shard = row['hostel_code'] if row else None
+
+
+@event.listens_for(Student, 'before_insert')
+def _global_student_id(mapper, connection, target):
+    """Shards allocate ids independently; reuse the (catalog) user id instead"""
+    if target.id is None and sharding_enabled():
+        target.id = target.user_id
+
+
+def init_sharding(app):
+    if not app.config.get('SHARDING_ENABLED'):
+        return
+    app.extensions['shards'] = ShardRegistry(app)
+    app.before_request(select_shard)
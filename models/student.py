@@ -18,6 +18,8 @@ class Student(db.Model):
     
     total_fees = db.Column(db.Float, default=0.0)
     fees_paid = db.Column(db.Float, default=0.0)
+    # Maintained by the database so it can be indexed, filtered and sorted in SQL
+    fees_pending = db.Column(db.Float, db.Computed('total_fees - fees_paid'), index=True)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -33,9 +35,5 @@ class Student(db.Model):
     def hostel_name(self):
         return self.consultancy.name
     
-    @property
-    def fees_pending(self):
-        return self.total_fees - self.fees_paid
-    
     def __repr__(self):
         return f'<Student {self.prn} - {self.full_name}>'
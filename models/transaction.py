@@ -36,6 +36,11 @@ class Announcement(db.Model):
 
 class ChangeLog(db.Model):
     __tablename__ = 'change_logs'
+    __table_args__ = (
+        db.Index('ix_change_logs_timestamp', 'timestamp'),
+        db.Index('ix_change_logs_user_timestamp', 'user_id', 'timestamp'),
+        db.Index('ix_change_logs_record', 'table_name', 'record_id', 'timestamp'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -1,56 +1,51 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_file
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_file, current_app, Response, g
 from flask_login import login_required, current_user
 from werkzeug.security import generate_password_hash
 from werkzeug.utils import secure_filename
-from utils.decorators import admin_required
+from utils.decorators import admin_required, read_replica, cached_page
 from utils.excel_handler import import_students_from_excel, export_students_to_excel, export_transactions_to_excel
 from models.database import db
 from models.user import User
 from models.consultancy import Consultancy
 from models.student import Student
-from models.transaction import Transaction, Announcement
-from sqlalchemy import func
+from models.transaction import Transaction, Announcement, ChangeLog
+from sqlalchemy import func, select
+from sqlalchemy.orm import contains_eager, joinedload, selectinload
 import os
 from io import BytesIO
-import pandas as pd
-import json
 from datetime import datetime
-from models.transaction import ChangeLog
 from utils.hostels import HOSTELS
+from models.sharding import sharding_enabled, use_shard
+from utils.analytics import collection_breakdown, collection_report, report_to_csv
+from utils.data_version import data_version, scope_versions, CATALOG_SCOPE, ROSTER_SCOPE
+from utils.export_cache import export_response
+from utils.export_jobs import start_export_job, serialize_job
+from utils.workbook import build_hostel_workbook
+from utils.metrics import render_prometheus
+from utils.audit import log_change, snapshot, diff, serialize_change_log, AuditBuffer, STUDENT_AUDIT_FIELDS
+from utils.bulk_ops import (
+    delete_students, delete_consultancy_cascade, batch_update_students,
+    delete_consultancy_keeping_students,
+    student_filter, preview_students, adjust_fees, transfer_students
+)
 
 
 admin_bp = Blueprint('admin', __name__)
 
-def log_change(user_id, user_role, action, table, record_id, changes):
-    """Log changes to database"""
-    try:
-        log_entry = ChangeLog(
-            user_id=user_id,
-            user_role=user_role,
-            action=action,
-            table_name=table,
-            record_id=record_id,
-            changes=json.dumps(changes),
-            timestamp=datetime.utcnow()
-        )
-        db.session.add(log_entry)
-        db.session.commit()
-    except Exception as e:
-        print(f"Logging error: {str(e)}")
-        pass  # Don't fail if logging fails
-
 @admin_bp.route('/dashboard')
 @login_required
 @admin_required
+@read_replica
 def dashboard():
     # Get statistics
     total_consultancies = Consultancy.query.filter_by(is_active=True).count()
-    total_students = Student.query.count()
     
-    # Calculate fees
-    total_fees = db.session.query(func.sum(Student.total_fees)).scalar() or 0
-    fees_paid = db.session.query(func.sum(Student.fees_paid)).scalar() or 0
-    fees_pending = total_fees - fees_paid
+    # Cached aggregates (fan out across shards in sharding mode)
+    totals = collection_breakdown()['totals']
+    total_students = totals['students']
+    total_fees = totals['total_fees']
+    fees_paid = totals['fees_paid']
+    fees_pending = totals['fees_pending']
     
     # Get active announcements
     announcements = Announcement.query.filter_by(is_active=True).order_by(Announcement.created_at.desc()).all()
@@ -66,10 +61,21 @@ def dashboard():
     return render_template('admin/dashboard.html', stats=stats, announcements=announcements)
 
 
+@admin_bp.route('/analytics')
+@login_required
+@admin_required
+@read_replica
+def analytics():
+    """Collection totals and rates overall, per hostel and per branch"""
+    return jsonify({'success': True, **collection_breakdown()})
+
+
 @admin_bp.route('/students/sample-template')
 @login_required
 @admin_required
 def download_sample_template():
+    import pandas as pd
+    
     df = pd.DataFrame(columns=[
         'PRN',
         'Name',
@@ -98,8 +104,11 @@ def download_sample_template():
 @admin_bp.route('/consultancies')
 @login_required
 @admin_required
+# Hostel details, agents and student counts: all catalog-level counters
+@cached_page(lambda: scope_versions(CATALOG_SCOPE, ROSTER_SCOPE))
 def manage_consultancies():
-    consultancies = Consultancy.query.all()
+    consultancies = Consultancy.query.options(selectinload(Consultancy.agents)).all()
+    student_counts = _student_counts()
 
     # ✅ ONLY active hostels are considered "used"
     used_codes = {
@@ -117,10 +126,28 @@ def manage_consultancies():
     return render_template(
         'admin/manage_consultancies.html',
         consultancies=consultancies,
+        student_counts=student_counts,
         available_hostels=available_hostels
     )
 
 
+def _student_counts():
+    """{consultancy_id: number of students}, one grouped query (per shard with sharding)"""
+    stmt = select(Student.consultancy_id, func.count(Student.id)).group_by(Student.consultancy_id)
+    shards = current_app.extensions.get('shards')
+    if shards is None:
+        return dict(db.session.execute(stmt).all())
+
+    def shard_counts(engine):
+        with engine.connect() as conn:
+            return conn.execute(stmt).all()
+
+    return {
+        consultancy_id: count
+        for rows in shards.fan_out(shard_counts).values() for consultancy_id, count in rows
+    }
+
+
 @admin_bp.route('/consultancies/add', methods=['POST'])
 @login_required
 @admin_required
@@ -207,28 +234,12 @@ def add_consultancy():
 def delete_consultancy(id):
     consultancy = Consultancy.query.get_or_404(id)
     
+    use_shard(consultancy.hostel_code)
+    
     try:
-        # Get all students associated with this consultancy
-        students = Student.query.filter_by(consultancy_id=consultancy.id).all()
-        
-        # Delete all student users first
-        for student in students:
-            user = student.user
-            # Delete transactions
-            Transaction.query.filter_by(student_id=student.id).delete()
-            # Delete student
-            db.session.delete(student)
-            # Delete user
-            if user:
-                db.session.delete(user)
-        
-        # Delete agent users associated with this consultancy
-        agents = User.query.filter_by(consultancy_id=consultancy.id, role='agent').all()
-        for agent in agents:
-            db.session.delete(agent)
-        
-        # Delete the consultancy itself
-        db.session.delete(consultancy)
+        # Set-based cascade: transactions, students, student users, agents, hostel
+        with AuditBuffer(current_user.id, 'admin') as audit:
+            delete_consultancy_cascade(consultancy, audit=audit)
         db.session.commit()
         
         flash('Hostel and all associated data deleted successfully!', 'success')
@@ -285,29 +296,39 @@ def upload_students():
 @admin_bp.route('/students/filtered')
 @login_required
 @admin_required
+@read_replica
 def filtered_data():
     hostel_code = request.args.get('hostel_code', '')
     pending_filter = request.args.get('pending_filter', '')
     search = request.args.get('search', '')
+    min_pending = request.args.get('min_pending', type=float)
+    max_pending = request.args.get('max_pending', type=float)
+    sort = request.args.get('sort', '')
     
     consultancies = Consultancy.query.all()
 
-    query = Student.query.join(Consultancy)
+    query = select(Student).join(Consultancy).options(contains_eager(Student.consultancy))
 
     # 🔥 Filter by hostel code
     if hostel_code:
-        query = query.filter(Consultancy.hostel_code == hostel_code)
+        query = query.where(Consultancy.hostel_code == hostel_code)
 
     # Pending fee filter
     if pending_filter == 'has_pending':
-        query = query.filter(Student.total_fees > Student.fees_paid)
+        query = query.where(Student.fees_pending > 0)
     elif pending_filter == 'no_pending':
-        query = query.filter(Student.total_fees <= Student.fees_paid)
+        query = query.where(Student.fees_pending <= 0)
+
+    # Pending amount range (served by the fees_pending index)
+    if min_pending is not None:
+        query = query.where(Student.fees_pending >= min_pending)
+    if max_pending is not None:
+        query = query.where(Student.fees_pending <= max_pending)
 
     # Search filter
     if search:
         search_term = f"%{search}%"
-        query = query.filter(
+        query = query.where(
             db.or_(
                 Student.prn.ilike(search_term),
                 Student.full_name.ilike(search_term),
@@ -316,7 +337,25 @@ def filtered_data():
             )
         )
 
-    students = query.all()
+    # Sorting
+    if sort == 'pending_desc':
+        query = query.order_by(Student.fees_pending.desc(), Student.id)
+        sort_key = lambda s: (-s.fees_pending, s.id)
+    elif sort == 'pending_asc':
+        query = query.order_by(Student.fees_pending.asc(), Student.id)
+        sort_key = lambda s: (s.fees_pending, s.id)
+    elif sort == 'name':
+        query = query.order_by(Student.full_name, Student.id)
+        sort_key = lambda s: (s.full_name, s.id)
+    else:
+        sort_key = lambda s: s.id
+
+    shards = current_app.extensions.get('shards')
+    if shards is not None and not hostel_code:
+        # All hostels: every shard, merged in the requested order
+        students = sorted(shards.fan_out_scalars(query), key=sort_key)
+    else:
+        students = db.session.scalars(query).all()
 
     return render_template(
         'admin/filtered_data.html',
@@ -325,32 +364,133 @@ def filtered_data():
         selected_hostel_code=hostel_code
     )
 
+def _export_version(hostel_code):
+    """
+    (data version, per_shard) for an admin export filtered by hostel_code:
+    the hostel's own version, or the global one for all hostels (read from
+    every shard with sharding, so the current shard is not part of the key).
+    """
+    if hostel_code:
+        consultancy = Consultancy.query.filter_by(hostel_code=hostel_code).first()
+        if consultancy:
+            return data_version(consultancy.id), True
+    return data_version(), not sharding_enabled()
+
 @admin_bp.route('/students/export')
 @login_required
 @admin_required
+@read_replica
 def export_students():
     hostel_code = request.args.get('hostel_code', '')
 
-    query = Student.query.join(Consultancy)
+    def build():
+        import pandas as pd
 
-    if hostel_code:
-        query = query.filter(Consultancy.hostel_code == hostel_code)
+        shards = current_app.extensions.get('shards')
+        if shards is not None and not hostel_code:
+            # No hostel selected: export every shard, not just the remembered one
+            students = shards.fan_out_scalars(select(Student).options(joinedload(Student.consultancy)))
+        else:
+            query = Student.query.join(Consultancy).options(contains_eager(Student.consultancy))
 
-    students = query.all()
+            if hostel_code:
+                query = query.filter(Consultancy.hostel_code == hostel_code)
 
-    df = export_students_to_excel(students)
+            students = query.all()
 
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Students')
-    output.seek(0)
+        df = export_students_to_excel(students)
 
-    return send_file(
-        output,
-        download_name='students_data.xlsx',
-        as_attachment=True,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
+        output = BytesIO()
+        with pd.ExcelWriter(output, engine='openpyxl') as writer:
+            df.to_excel(writer, index=False, sheet_name='Students')
+        output.seek(0)
+        return output
+
+    # One hostel's export stays cached while other hostels change
+    version, per_shard = _export_version(hostel_code)
+    # ?job=1 builds in the background for exports that outlive the worker timeout
+    if request.args.get('job'):
+        return start_export_job('students', {'hostel_code': hostel_code}, version, build, 'students_data.xlsx',
+                                per_shard=per_shard)
+    return export_response('students', {'hostel_code': hostel_code}, version, build, 'students_data.xlsx',
+                           per_shard=per_shard)
+
+@admin_bp.route('/students/export/workbook')
+@login_required
+@admin_required
+@read_replica
+def export_hostel_workbook():
+    """One workbook: a summary sheet plus one sheet per hostel, built in parallel processes"""
+    if request.args.get('job'):
+        return start_export_job('hostel_workbook', {}, data_version(), build_hostel_workbook, 'hostel_workbook.xlsx',
+                                per_shard=False)
+    return export_response('hostel_workbook', {}, data_version(), build_hostel_workbook, 'hostel_workbook.xlsx',
+                           per_shard=False)
+
+@admin_bp.route('/students/top-debtors/export')
+@login_required
+@admin_required
+@read_replica
+def export_top_debtors():
+    """Top N students by pending fees in each hostel, ranked entirely in SQL"""
+    hostel_code = request.args.get('hostel_code', '')
+    limit = max(1, min(request.args.get('n', 10, type=int), 1000))
+
+    def build():
+        import pandas as pd
+
+        rank = func.row_number().over(
+            partition_by=Student.consultancy_id,
+            order_by=(Student.fees_pending.desc(), Student.id)
+        ).label('rank')
+        ranked = select(
+            Student.consultancy_id, Student.prn, Student.full_name, Student.branch,
+            Student.email, Student.phone, Student.total_fees, Student.fees_paid,
+            Student.fees_pending, rank
+        ).where(Student.fees_pending > 0)
+
+        if hostel_code:
+            ranked = ranked.where(Student.consultancy_id == select(Consultancy.id).where(
+                Consultancy.hostel_code == hostel_code
+            ).scalar_subquery())
+        ranked = ranked.subquery()
+
+        stmt = (
+            select(
+                Consultancy.hostel_code, Consultancy.name, ranked.c.rank, ranked.c.prn,
+                ranked.c.full_name, ranked.c.branch, ranked.c.email, ranked.c.phone,
+                ranked.c.total_fees, ranked.c.fees_paid, ranked.c.fees_pending
+            )
+            .join(Consultancy, Consultancy.id == ranked.c.consultancy_id)
+            .where(ranked.c.rank <= limit)
+            .order_by(Consultancy.hostel_code, ranked.c.rank)
+        )
+
+        shards = current_app.extensions.get('shards')
+        if shards is not None and not hostel_code:
+            # Each shard ranks its own hostel; run them all in parallel
+            def shard_rows(engine):
+                with engine.connect() as conn:
+                    return conn.execute(stmt).all()
+
+            rows = [row for result in shards.fan_out(shard_rows).values() for row in result]
+        else:
+            rows = db.session.execute(stmt).all()
+
+        df = pd.DataFrame(rows, columns=[
+            'Hostel_Code', 'Hostel', 'Rank', 'PRN', 'Name', 'Branch', 'Email', 'Phone',
+            'Total Fees', 'Fees Paid', 'Fees Pending'
+        ])
+
+        output = BytesIO()
+        with pd.ExcelWriter(output, engine='openpyxl') as writer:
+            df.to_excel(writer, index=False, sheet_name='Top Debtors')
+        output.seek(0)
+        return output
+
+    version, per_shard = _export_version(hostel_code)
+    return export_response('top_debtors', {'hostel_code': hostel_code, 'n': limit}, version, build, 'top_debtors.xlsx',
+                           per_shard=per_shard)
 
 @admin_bp.route('/announcements')
 @login_required
@@ -396,13 +536,14 @@ def delete_announcement(id):
 @admin_bp.route('/payment-history')
 @login_required
 @admin_required
+@read_replica
 def payment_history():
     search = request.args.get('search', '')
     
-    query = Transaction.query.join(Student)
+    query = select(Transaction).join(Student).options(contains_eager(Transaction.student))
     
     if search:
-        query = query.filter(
+        query = query.where(
             db.or_(
                 Transaction.transaction_id.contains(search),
                 Student.full_name.contains(search),
@@ -410,7 +551,13 @@ def payment_history():
             )
         )
     
-    transactions = query.order_by(Transaction.payment_date.desc()).all()
+    shards = current_app.extensions.get('shards')
+    if shards is not None and not request.args.get('hostel_code'):
+        # No hostel selected: every shard, newest first
+        transactions = sorted(shards.fan_out_scalars(query),
+                              key=lambda txn: txn.payment_date or datetime.min, reverse=True)
+    else:
+        transactions = db.session.scalars(query.order_by(Transaction.payment_date.desc())).all()
     
     return render_template('admin/payment_history.html', 
                          transactions=transactions,
@@ -419,40 +566,244 @@ def payment_history():
 @admin_bp.route('/payment-history/export')
 @login_required
 @admin_required
+@read_replica
 def export_payment_history():
-    transactions = Transaction.query.order_by(Transaction.payment_date.desc()).all()
-    df = export_transactions_to_excel(transactions)
+    def build():
+        import pandas as pd
+
+        shards = current_app.extensions.get('shards')
+        if shards is not None:
+            transactions = shards.fan_out_scalars(select(Transaction).options(joinedload(Transaction.student)))
+            transactions.sort(key=lambda txn: txn.payment_date, reverse=True)
+        else:
+            transactions = Transaction.query.options(joinedload(Transaction.student)).order_by(Transaction.payment_date.desc()).all()
+        df = export_transactions_to_excel(transactions)
+
+        output = BytesIO()
+        with pd.ExcelWriter(output, engine='openpyxl') as writer:
+            df.to_excel(writer, index=False, sheet_name='Transactions')
+        output.seek(0)
+        return output
+
+    # Reads every shard with sharding, and the whole table without
+    per_shard = not sharding_enabled()
+    if request.args.get('job'):
+        return start_export_job('payment_history', {}, data_version(), build, 'payment_history.xlsx',
+                                per_shard=per_shard)
+    return export_response('payment_history', {}, data_version(), build, 'payment_history.xlsx',
+                           per_shard=per_shard)
+
+@admin_bp.route('/exports')
+@login_required
+@admin_required
+def export_jobs():
+    jobs = current_app.extensions['export_jobs'].jobs()
+    jobs = sorted((job for job in jobs if job['user_id'] == current_user.id),
+                  key=lambda job: job['created_at'], reverse=True)
+    return jsonify({'success': True, 'jobs': [serialize_job(job) for job in jobs]})
+
+@admin_bp.route('/exports/<job_id>')
+@login_required
+@admin_required
+def export_job_status(job_id):
+    job = current_app.extensions['export_jobs'].get(job_id)
+    if job is None or job['user_id'] != current_user.id:
+        return jsonify({'success': False, 'message': 'Export job not found or expired'}), 404
+    return jsonify({'success': True, 'job': serialize_job(job)})
+
+@admin_bp.route('/exports/<job_id>/download')
+@login_required
+@admin_required
+def download_export_job(job_id):
+    jobs = current_app.extensions['export_jobs']
+    job = jobs.get(job_id)
+    if job is None or job['user_id'] != current_user.id:
+        return jsonify({'success': False, 'message': 'Export job not found or expired'}), 404
+    if job['status'] != 'done':
+        return jsonify({'success': False, 'message': f'Export is {job["status"]}', 'job': serialize_job(job)}), 409
+    try:
+        f = open(jobs.artifact_path(job_id), 'rb')
+    except FileNotFoundError:
+        return jsonify({'success': False, 'message': 'Export job not found or expired'}), 404
+    return send_file(f, download_name=job['download_name'], as_attachment=True, mimetype=job['mimetype'])
+
+
+
+@admin_bp.route('/reports/collections')
+@login_required
+@admin_required
+@read_replica
+def collections_report():
+    """Collected amounts per hostel by day, week or month (JSON or CSV)"""
+    period = request.args.get('period', 'month')
+    hostel_code = request.args.get('hostel_code', '')
+    output_format = request.args.get('format', 'json')
     
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Transactions')
-    output.seek(0)
+    try:
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d') if request.args.get('start') else None
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d') if request.args.get('end') else None
+        
+        consultancy_id = None
+        if hostel_code:
+            consultancy = Consultancy.query.filter_by(hostel_code=hostel_code).first()
+            if not consultancy:
+                return jsonify({'success': False, 'message': 'Hostel not found'}), 404
+            consultancy_id = consultancy.id
+        
+        report = collection_report(period, start, end, consultancy_id)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    if output_format == 'csv':
+        return send_file(BytesIO(report_to_csv(report).encode('utf-8')),
+                        download_name=f'collections_{period}.csv',
+                        as_attachment=True,
+                        mimetype='text/csv')
     
-    return send_file(output,
-                    download_name='payment_history.xlsx',
-                    as_attachment=True,
-                    mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    return jsonify({'success': True, **report})
+
+
+@admin_bp.route('/metrics')
+@login_required
+@admin_required
+def metrics():
+    """Request metrics of all workers in Prometheus text format"""
+    store = current_app.extensions.get('metrics')
+    if store is None:
+        return jsonify({'success': False, 'message': 'Metrics are disabled'}), 404
+    return Response(render_prometheus(store.collect()), mimetype='text/plain; version=0.0.4')
+
+
+@admin_bp.route('/slow-queries')
+@login_required
+@admin_required
+def slow_queries():
+    """Recent slow SQL statements of all workers with their query plans"""
+    log = current_app.extensions.get('slow_queries')
+    if log is None:
+        return jsonify({'success': False, 'message': 'Slow-query log is disabled'}), 404
+    
+    route = request.args.get('route', '')
+    min_ms = request.args.get('min_ms', 0, type=float)
+    limit = min(request.args.get('limit', 100, type=int), 1000)
+    
+    entries = [
+        entry for entry in log.collect()
+        if entry['duration_ms'] >= min_ms and (not route or entry['route'] == route)
+    ]
+    
+    return jsonify({
+        'success': True,
+        'threshold_ms': log.threshold * 1000,
+        'total': len(entries),
+        'queries': entries[:limit]
+    })
+
+def _merged_audit_logs(shards, conditions, page, per_page):
+    """
+    One page of change logs across every hostel shard, newest first.
+    Each shard returns its count and its first page * per_page entries;
+    the pages are merged here, so deep pages cost more than early ones.
+    """
+    table = ChangeLog.__table__
+
+    def shard_page(engine):
+        with engine.connect() as conn:
+            total = conn.execute(select(func.count()).select_from(table).where(*conditions)).scalar()
+            rows = conn.execute(
+                select(table).where(*conditions)
+                .order_by(table.c.timestamp.desc(), table.c.id.desc())
+                .limit(page * per_page)
+            ).all()
+            return total, rows
+
+    results = shards.fan_out(shard_page)
+    total = sum(count for count, _ in results.values())
+    entries = sorted(
+        ((row, code) for code, (_, rows) in results.items() for row in rows),
+        key=lambda item: (item[0].timestamp or datetime.min, item[0].id),
+        reverse=True
+    )[(page - 1) * per_page:page * per_page]
+
+    return {
+        'success': True,
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'pages': -(-total // per_page),
+        'logs': [{**serialize_change_log(row), 'hostel_code': code} for row, code in entries]
+    }
+
+@admin_bp.route('/audit-logs')
+@login_required
+@admin_required
+@read_replica
+def audit_logs():
+    """
+    Paginated ChangeLog browser, filterable by user, table, record and time range.
+    With sharding, ?hostel_code= browses one shard; without it every shard is merged.
+    """
+    try:
+        page = request.args.get('page', 1, type=int)
+        per_page = max(1, min(request.args.get('per_page', 50, type=int), 500))
+        user_id = request.args.get('user_id', type=int)
+        table = request.args.get('table', '')
+        record_id = request.args.get('record_id', type=int)
+        action = request.args.get('action', '')
+        since = request.args.get('since', '')
+        until = request.args.get('until', '')
+
+        conditions = []
+        if user_id:
+            conditions.append(ChangeLog.user_id == user_id)
+        if table:
+            conditions.append(ChangeLog.table_name == table)
+        if record_id:
+            conditions.append(ChangeLog.record_id == record_id)
+        if action:
+            conditions.append(ChangeLog.action == action)
+        if since:
+            conditions.append(ChangeLog.timestamp >= datetime.fromisoformat(since))
+        if until:
+            conditions.append(ChangeLog.timestamp < datetime.fromisoformat(until))
+
+        shards = current_app.extensions.get('shards')
+        hostel_code = request.args.get('hostel_code', '')
+        if shards is not None:
+            if not hostel_code:
+                return jsonify(_merged_audit_logs(shards, conditions, max(page, 1), per_page))
+            if not shards.resolve(hostel_code=hostel_code):
+                return jsonify({'success': False, 'message': f'Unknown hostel_code {hostel_code}'}), 400
+            use_shard(hostel_code)
+
+        query = ChangeLog.query.filter(*conditions)
+        pagination = query.order_by(ChangeLog.timestamp.desc(), ChangeLog.id.desc()).paginate(
+            page=page, per_page=per_page, error_out=False
+        )
+
+        return jsonify({
+            'success': True,
+            'page': pagination.page,
+            'per_page': pagination.per_page,
+            'total': pagination.total,
+            'pages': pagination.pages,
+            'logs': [serialize_change_log(entry) for entry in pagination.items]
+        })
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
 
 
 @admin_bp.route('/students/update/<int:id>', methods=['POST'])
 @login_required
 @admin_required
 def update_student(id):
+    _use_student_shard(id)
     student = Student.query.get_or_404(id)
     
     try:
         # Get data from request
         data = request.get_json()
-        
-        # Log the change
-        log_change(
-            user_id=current_user.id,
-            user_role='admin',
-            action='update',
-            table='students',
-            record_id=student.id,
-            changes=data
-        )
+        before = snapshot(student, STUDENT_AUDIT_FIELDS)
         
         # Update student fields
         if 'prn' in data:
@@ -473,9 +824,23 @@ def update_student(id):
         if 'total_fees' in data:
             student.total_fees = float(data['total_fees'])
         if 'consultancy_id' in data:
+            if sharding_enabled() and int(data['consultancy_id']) != student.consultancy_id:
+                raise ValueError('Moving students between hostels is not supported in sharding mode')
             student.consultancy_id = int(data['consultancy_id'])
             student.user.consultancy_id = int(data['consultancy_id'])
         
+        # Log only the fields that changed, in the same transaction
+        changes = diff(before, snapshot(student, STUDENT_AUDIT_FIELDS))
+        if changes:
+            log_change(
+                user_id=current_user.id,
+                user_role='admin',
+                action='update',
+                table='students',
+                record_id=student.id,
+                changes=changes
+            )
+        
         db.session.commit()
         
         return jsonify({
@@ -501,10 +866,40 @@ def update_student(id):
         db.session.rollback()
         return jsonify({'success': False, 'message': str(e)}), 400
     
+@admin_bp.route('/students/batch-update', methods=['POST'])
+@login_required
+@admin_required
+def batch_update():
+    """Apply many per-student patches in one transaction"""
+    try:
+        data = request.get_json() or {}
+        patches = data.get('updates', [])
+        if not isinstance(patches, list) or not patches:
+            return jsonify({'success': False, 'message': 'No updates provided'}), 400
+        
+        if sharding_enabled():
+            results = _batch_update_sharded(patches)
+        else:
+            results = batch_update_students(patches, current_user.id, 'admin')
+        db.session.commit()
+        
+        updated = sum(1 for r in results if r['success'])
+        return jsonify({
+            'success': True,
+            'message': f'Updated: {updated}, Failed: {len(results) - updated}',
+            'updated': updated,
+            'failed': len(results) - updated,
+            'results': results
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
 @admin_bp.route('/students/delete/<int:id>', methods=['POST'])
 @login_required
 @admin_required
 def delete_student(id):
+    _use_student_shard(id)
     student = Student.query.get_or_404(id)
     user = student.user
     
@@ -535,6 +930,204 @@ def delete_student(id):
         db.session.rollback()
         return jsonify({'success': False, 'message': str(e)}), 400
     
+def _student_shards(hostel_code=''):
+    """
+    Shards a bulk student operation has to visit: the hostel's own, or all
+    of them. None when hostel_code names no hostel.
+    """
+    shards = current_app.extensions.get('shards')
+    if shards is None:
+        return [None]
+    if not hostel_code:
+        return shards.hostel_codes()
+    # Checked first: engine() would create a shard file for any code
+    return [hostel_code] if shards.resolve(hostel_code=hostel_code) else None
+
+def _locate_students(ids):
+    """{hostel_code (None without sharding): [ids of the given students stored there]}"""
+    shards = current_app.extensions.get('shards')
+    if shards is None:
+        found = db.session.scalars(select(Student.id).where(Student.id.in_(ids))).all()
+        return {None: found} if found else {}
+
+    column = Student.__table__.c.id
+
+    def shard_ids(engine):
+        with engine.connect() as conn:
+            return conn.execute(select(column).where(column.in_(ids))).scalars().all()
+
+    return {code: found for code, found in shards.fan_out(shard_ids).items() if found}
+
+def _use_student_shard(student_id):
+    """Route to the shard holding this student, whichever hostel the admin is browsing"""
+    for code in _locate_students([student_id]):
+        use_shard(code)
+
+def _batch_update_sharded(patches):
+    """batch_update_students() once per shard holding students of the batch; results in request order"""
+    def patch_id(patch):
+        try:
+            return int(patch.get('id'))
+        except (TypeError, ValueError, AttributeError):
+            return None
+
+    ids = [i for i in (patch_id(patch) for patch in patches) if i is not None]
+    located = _locate_students(ids) if ids else {}
+    shard_of = {student_id: code for code, shard_ids in located.items() for student_id in shard_ids}
+
+    # Patches for unknown students run with the current shard and come back as not found
+    groups = {}
+    for index, patch in enumerate(patches):
+        groups.setdefault(shard_of.get(patch_id(patch), g.get('shard')), []).append((index, patch))
+
+    results = [None] * len(patches)
+    for code, items in groups.items():
+        use_shard(code)
+        shard_results = batch_update_students([patch for _, patch in items], current_user.id, 'admin')
+        for (index, _), result in zip(items, shard_results):
+            results[index] = result
+    return results
+
+@admin_bp.route('/students/bulk-delete', methods=['POST'])
+@login_required
+@admin_required
+def bulk_delete_students():
+    """
+    Delete many students (with their transactions and users) in one transaction.
+    With sharding, each student is deleted from whichever shard holds it.
+    Ids that match no student are returned as not_found.
+    """
+    try:
+        data = request.get_json() or {}
+        ids = list(dict.fromkeys(int(i) for i in data.get('ids', [])))
+        if not ids:
+            return jsonify({'success': False, 'message': 'No students selected'}), 400
+        
+        located = _locate_students(ids)
+        found = {student_id for shard_ids in located.values() for student_id in shard_ids}
+        not_found = [student_id for student_id in ids if student_id not in found]
+        if not found:
+            return jsonify({'success': False, 'message': 'No matching students found', 'deleted': 0, 'not_found': not_found}), 404
+        
+        deleted = 0
+        for code, shard_ids in located.items():
+            use_shard(code)
+            # One buffer per shard: audit entries are written to the shard they describe
+            with AuditBuffer(current_user.id, 'admin') as audit:
+                deleted += delete_students(Student.id.in_(shard_ids), audit=audit)
+        db.session.commit()
+        
+        message = f'{deleted} students deleted successfully'
+        if not_found:
+            message += f'; {len(not_found)} not found'
+        return jsonify({'success': True, 'message': message, 'deleted': deleted, 'not_found': not_found})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+@admin_bp.route('/students/bulk-fees', methods=['POST'])
+@login_required
+@admin_required
+def bulk_adjust_fees():
+    """
+    Raise, lower or set total fees for all students matching
+    hostel_code / branch / pending_filter / orphaned (students without a
+    hostel). Send preview=true to get counts only.
+    """
+    try:
+        data = request.get_json() or {}
+        condition = student_filter(
+            hostel_code=data.get('hostel_code', ''),
+            branch=data.get('branch', ''),
+            pending_filter=data.get('pending_filter', ''),
+            orphaned=bool(data.get('orphaned'))
+        )
+        if condition is None:
+            return jsonify({'success': False, 'message': 'Select at least one filter'}), 400
+        
+        mode = data.get('mode', 'increase')
+        amount = float(data.get('amount', 0))
+        if mode not in ('set', 'increase', 'decrease') or amount < 0:
+            return jsonify({'success': False, 'message': 'Invalid fee adjustment'}), 400
+        
+        # With sharding and no hostel filter, every shard is adjusted
+        codes = _student_shards(data.get('hostel_code', ''))
+        if codes is None:
+            return jsonify({'success': False, 'message': 'Unknown hostel_code'}), 400
+        preview = {'students': 0, 'total_fees': 0, 'fees_paid': 0}
+        for code in codes:
+            use_shard(code)
+            for key, value in preview_students(condition).items():
+                preview[key] += value
+        if data.get('preview'):
+            return jsonify({'success': True, 'preview': preview})
+        
+        updated = 0
+        for code in codes:
+            use_shard(code)
+            with AuditBuffer(current_user.id, 'admin') as audit:
+                updated += adjust_fees(condition, mode, amount, audit=audit)
+        db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'message': f'Fees updated for {updated} students',
+            'updated': updated,
+            'preview': preview
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+@admin_bp.route('/students/bulk-transfer', methods=['POST'])
+@login_required
+@admin_required
+def bulk_transfer_students():
+    """
+    Move all students matching hostel_code / consultancy_id / branch /
+    pending_filter / orphaned (and their users) to target_consultancy_id.
+    orphaned=true reassigns the students of a deleted hostel.
+    Send preview=true to get counts only.
+    """
+    try:
+        data = request.get_json() or {}
+        condition = student_filter(
+            hostel_code=data.get('hostel_code', ''),
+            branch=data.get('branch', ''),
+            pending_filter=data.get('pending_filter', ''),
+            consultancy_id=data.get('consultancy_id'),
+            orphaned=bool(data.get('orphaned'))
+        )
+        if condition is None:
+            return jsonify({'success': False, 'message': 'Select at least one filter'}), 400
+        
+        if sharding_enabled():
+            return jsonify({'success': False, 'message': 'Moving students between hostels is not supported in sharding mode'}), 400
+        
+        target = db.session.get(Consultancy, int(data.get('target_consultancy_id') or 0))
+        if not target:
+            return jsonify({'success': False, 'message': 'Target hostel not found'}), 400
+        if not target.is_active:
+            return jsonify({'success': False, 'message': 'Target hostel is deactivated'}), 400
+        
+        preview = preview_students(condition)
+        if data.get('preview'):
+            return jsonify({'success': True, 'preview': preview})
+        
+        with AuditBuffer(current_user.id, 'admin') as audit:
+            moved = transfer_students(condition, target.id, audit=audit)
+        db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'message': f'{moved} students moved to {target.name}',
+            'moved': moved,
+            'preview': preview
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
+
 @admin_bp.route('/students/add-single', methods=['POST'])
 @login_required
 @admin_required
@@ -549,11 +1142,6 @@ def add_single_student():
         total_fees = float(request.form.get('total_fees'))
         fees_paid = float(request.form.get('fees_paid', 0))
         
-        # Check if student already exists
-        existing_student = Student.query.filter_by(prn=prn).first()
-        if existing_student:
-            flash('Student with this PRN already exists!', 'error')
-            return redirect(url_for('admin.add_student_page'))
         # Check if consultancy exists
         consultancy = Consultancy.query.get(consultancy_id)
 
@@ -565,6 +1153,14 @@ def add_single_student():
             flash('Selected hostel is deactivated. Activate it before adding students.', 'error')
             return redirect(url_for('admin.add_student_page'))
 
+        use_shard(consultancy.hostel_code)
+
+        # Check if student already exists
+        existing_student = Student.query.filter_by(prn=prn).first()
+        if existing_student:
+            flash('Student with this PRN already exists!', 'error')
+            return redirect(url_for('admin.add_student_page'))
+
         
         # Create user (username = PRN, password = phone number)
         user = User(
@@ -732,38 +1328,22 @@ def deactivate_consultancy(id):
 def delete_consultancy_keep_students(id):
     """
     Delete hostel but preserve all students.
-    Students will have consultancy_id set to NULL or a default hostel.
+    The students keep pointing at the deleted hostel; find them with the
+    bulk operations' orphaned filter and move them with bulk-transfer.
     """
     consultancy = Consultancy.query.get_or_404(id)
     
+    if sharding_enabled():
+        # Kept students would be stranded in the deleted hostel's shard
+        flash('Keeping students of a deleted hostel is not supported in sharding mode', 'error')
+        return redirect(url_for('admin.manage_consultancies'))
+    
     try:
-        # Option 1: Set students' consultancy_id to NULL
-        students = Student.query.filter_by(consultancy_id=consultancy.id).all()
-        for student in students:
-            student.consultancy_id = None  # Or set to a default hostel ID
-            # student.consultancy_id = 1  # Example: Move to "Unassigned Hostel"
-        
-        # Option 2: Or create an "Unassigned" hostel first
-        # unassigned = Consultancy.query.filter_by(name='Unassigned').first()
-        # if not unassigned:
-        #     unassigned = Consultancy(name='Unassigned', ...)
-        #     db.session.add(unassigned)
-        #     db.session.flush()
-        # 
-        # for student in students:
-        #     student.consultancy_id = unassigned.id
-        #     student.user.consultancy_id = unassigned.id
-        
-        # Delete agent users
-        agents = User.query.filter_by(consultancy_id=consultancy.id, role='agent').all()
-        for agent in agents:
-            db.session.delete(agent)
-        
-        # Delete the consultancy
-        db.session.delete(consultancy)
+        with AuditBuffer(current_user.id, 'admin') as audit:
+            kept = delete_consultancy_keeping_students(consultancy, audit=audit)
         db.session.commit()
         
-        flash(f'Hostel deleted. {len(students)} students preserved and need reassignment.', 'success')
+        flash(f'Hostel deleted. {kept} students preserved and need reassignment.', 'success')
     except Exception as e:
         db.session.rollback()
         flash(f'Error deleting hostel: {str(e)}', 'error')
@@ -1,50 +1,36 @@
-from flask import Blueprint, render_template, request, send_file
+from flask import Blueprint, render_template, request
 from flask_login import login_required, current_user
-from utils.decorators import agent_required
+from utils.decorators import agent_required, read_replica, cached_page
 from utils.excel_handler import export_students_to_excel, export_transactions_to_excel
 from models.database import db
 from models.student import Student
 from models.transaction import Transaction, Announcement
 from sqlalchemy import func
+from sqlalchemy.orm import contains_eager, joinedload
 from io import BytesIO
-import pandas as pd
-import json
-from datetime import datetime
-from models.transaction import ChangeLog
+from utils.audit import log_change, snapshot, diff, STUDENT_AUDIT_FIELDS
+from utils.bulk_ops import batch_update_students
+from utils.analytics import collection_breakdown
+from utils.data_version import data_version, scope_versions, consultancy_scope, ANNOUNCEMENTS_SCOPE
+from utils.export_cache import export_response
 
 agent_bp = Blueprint('agent', __name__)
 
-def log_change(user_id, user_role, action, table, record_id, changes):
-    """Log changes to database"""
-    try:
-        log_entry = ChangeLog(
-            user_id=user_id,
-            user_role=user_role,
-            action=action,
-            table_name=table,
-            record_id=record_id,
-            changes=json.dumps(changes),
-            timestamp=datetime.utcnow()
-        )
-        db.session.add(log_entry)
-        db.session.commit()
-    except Exception as e:
-        print(f"Logging error: {str(e)}")
-        pass  
-
 @agent_bp.route('/dashboard')
 @login_required
 @agent_required
+@read_replica
+@cached_page(lambda: scope_versions(consultancy_scope(current_user.consultancy_id), ANNOUNCEMENTS_SCOPE))
 def dashboard():
     # Get consultancy statistics
     consultancy_id = current_user.consultancy_id
     
-    students = Student.query.filter_by(consultancy_id=consultancy_id).all()
-    total_students = len(students)
+    totals = collection_breakdown(consultancy_id)['totals']
+    total_students = totals['students']
     
-    total_fees = sum(s.total_fees for s in students)
-    fees_paid = sum(s.fees_paid for s in students)
-    fees_pending = total_fees - fees_paid
+    total_fees = totals['total_fees']
+    fees_paid = totals['fees_paid']
+    fees_pending = totals['fees_pending']
     
     # Get active announcements
     announcements = Announcement.query.filter_by(is_active=True).order_by(Announcement.created_at.desc()).all()
@@ -58,22 +44,43 @@ def dashboard():
     
     return render_template('agent/dashboard.html', stats=stats, announcements=announcements)
 
+@agent_bp.route('/analytics')
+@login_required
+@agent_required
+@read_replica
+def analytics():
+    """Collection totals and rates for this hostel, per branch"""
+    from flask import jsonify
+    
+    return jsonify({'success': True, **collection_breakdown(current_user.consultancy_id)})
+
 @agent_bp.route('/students')
 @login_required
 @agent_required
+@read_replica
+@cached_page(lambda: scope_versions(consultancy_scope(current_user.consultancy_id)))
 def students_data():
     consultancy_id = current_user.consultancy_id
     pending_filter = request.args.get('pending_filter', '')
     search = request.args.get('search', '')
+    min_pending = request.args.get('min_pending', type=float)
+    max_pending = request.args.get('max_pending', type=float)
+    sort = request.args.get('sort', '')
     
     # Base query
     query = Student.query.filter_by(consultancy_id=consultancy_id)
     
     # Apply pending fee filter
     if pending_filter == 'has_pending':
-        query = query.filter(Student.total_fees > Student.fees_paid)
+        query = query.filter(Student.fees_pending > 0)
     elif pending_filter == 'no_pending':
-        query = query.filter(Student.total_fees <= Student.fees_paid)
+        query = query.filter(Student.fees_pending <= 0)
+
+    # Pending amount range (served by the fees_pending index)
+    if min_pending is not None:
+        query = query.filter(Student.fees_pending >= min_pending)
+    if max_pending is not None:
+        query = query.filter(Student.fees_pending <= max_pending)
     
     # Apply search filter
     if search:
@@ -87,6 +94,14 @@ def students_data():
             )
         )
     
+    # Sorting
+    if sort == 'pending_desc':
+        query = query.order_by(Student.fees_pending.desc(), Student.id)
+    elif sort == 'pending_asc':
+        query = query.order_by(Student.fees_pending.asc(), Student.id)
+    elif sort == 'name':
+        query = query.order_by(Student.full_name, Student.id)
+    
     students = query.all()
     
     return render_template('agent/students_data.html', students=students)
@@ -94,30 +109,35 @@ def students_data():
 @agent_bp.route('/students/export')
 @login_required
 @agent_required
+@read_replica
 def export_students():
     consultancy_id = current_user.consultancy_id
-    students = Student.query.filter_by(consultancy_id=consultancy_id).all()
-    
-    df = export_students_to_excel(students)
-    
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Students')
-    output.seek(0)
-    
-    return send_file(output,
-                    download_name='students_data.xlsx',
-                    as_attachment=True,
-                    mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+    def build():
+        import pandas as pd
+
+        students = Student.query.filter_by(consultancy_id=consultancy_id).options(joinedload(Student.consultancy)).all()
+        df = export_students_to_excel(students)
+
+        output = BytesIO()
+        with pd.ExcelWriter(output, engine='openpyxl') as writer:
+            df.to_excel(writer, index=False, sheet_name='Students')
+        output.seek(0)
+        return output
+
+    # Rebuilt only when this hostel's data has changed since the last export
+    return export_response('agent_students', {'consultancy_id': consultancy_id},
+                           data_version(consultancy_id), build, 'students_data.xlsx')
 
 @agent_bp.route('/payment-history')
 @login_required
 @agent_required
+@read_replica
 def payment_history():
     consultancy_id = current_user.consultancy_id
     search = request.args.get('search', '')
     
-    query = Transaction.query.filter_by(consultancy_id=consultancy_id).join(Student)
+    query = Transaction.query.filter_by(consultancy_id=consultancy_id).join(Student).options(contains_eager(Transaction.student))
     
     if search:
         query = query.filter(
@@ -137,21 +157,24 @@ def payment_history():
 @agent_bp.route('/payment-history/export')
 @login_required
 @agent_required
+@read_replica
 def export_payment_history():
     consultancy_id = current_user.consultancy_id
-    transactions = Transaction.query.filter_by(consultancy_id=consultancy_id).all()
-    
-    df = export_transactions_to_excel(transactions)
-    
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Transactions')
-    output.seek(0)
-    
-    return send_file(output,
-                    download_name='payment_history.xlsx',
-                    as_attachment=True,
-                    mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+    def build():
+        import pandas as pd
+
+        transactions = Transaction.query.filter_by(consultancy_id=consultancy_id).options(joinedload(Transaction.student)).all()
+        df = export_transactions_to_excel(transactions)
+
+        output = BytesIO()
+        with pd.ExcelWriter(output, engine='openpyxl') as writer:
+            df.to_excel(writer, index=False, sheet_name='Transactions')
+        output.seek(0)
+        return output
+
+    return export_response('agent_payment_history', {'consultancy_id': consultancy_id},
+                           data_version(consultancy_id), build, 'payment_history.xlsx')
 
 @agent_bp.route('/students/update/<int:id>', methods=['POST'])
 @login_required
@@ -166,16 +189,7 @@ def update_student(id):
     try:
         # Get data from request
         data = request.get_json()
-        
-        # Log the change
-        log_change(
-            user_id=current_user.id,
-            user_role='agent',
-            action='update',
-            table='students',
-            record_id=student.id,
-            changes=data
-        )
+        before = snapshot(student, STUDENT_AUDIT_FIELDS)
         
         # Update student fields
         if 'prn' in data:
@@ -195,6 +209,18 @@ def update_student(id):
         if 'total_fees' in data:
             student.total_fees = float(data['total_fees'])
         
+        # Log only the fields that changed, in the same transaction
+        changes = diff(before, snapshot(student, STUDENT_AUDIT_FIELDS))
+        if changes:
+            log_change(
+                user_id=current_user.id,
+                user_role='agent',
+                action='update',
+                table='students',
+                record_id=student.id,
+                changes=changes
+            )
+        
         db.session.commit()
         
         return jsonify({
@@ -216,6 +242,37 @@ def update_student(id):
         db.session.rollback()
         return jsonify({'success': False, 'message': str(e)}), 400
 
+@agent_bp.route('/students/batch-update', methods=['POST'])
+@login_required
+@agent_required
+def batch_update():
+    """Apply many per-student patches for this hostel in one transaction"""
+    from flask import jsonify
+    
+    try:
+        data = request.get_json() or {}
+        patches = data.get('updates', [])
+        if not isinstance(patches, list) or not patches:
+            return jsonify({'success': False, 'message': 'No updates provided'}), 400
+        
+        results = batch_update_students(
+            patches, current_user.id, 'agent',
+            consultancy_id=current_user.consultancy_id
+        )
+        db.session.commit()
+        
+        updated = sum(1 for r in results if r['success'])
+        return jsonify({
+            'success': True,
+            'message': f'Updated: {updated}, Failed: {len(results) - updated}',
+            'updated': updated,
+            'failed': len(results) - updated,
+            'results': results
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
+
 @agent_bp.route('/students/delete/<int:id>', methods=['POST'])
 @login_required
 @agent_required
@@ -245,24 +302,3 @@ def delete_student(id):
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': str(e)}), 400
-
-def log_change(user_id, user_role, action, table, record_id, changes):
-    """Log changes to database"""
-    from models.transaction import ChangeLog
-    from datetime import datetime
-    import json
-    
-    try:
-        log_entry = ChangeLog(
-            user_id=user_id,
-            user_role=user_role,
-            action=action,
-            table_name=table,
-            record_id=record_id,
-            changes=json.dumps(changes),
-            timestamp=datetime.utcnow()
-        )
-        db.session.add(log_entry)
-        db.session.commit()
-    except:
-        pass  # Don't fail if logging fails
\ No newline at end of file
@@ -0,0 +1,219 @@
+from datetime import datetime, timedelta
+from flask import Blueprint, request, jsonify, abort, current_app
+from flask_login import current_user
+from werkzeug.exceptions import HTTPException
+from utils.decorators import api_login_required, read_replica
+from utils.api import Resource, list_response
+from models.database import db
+from models.consultancy import Consultancy
+from models.student import Student
+from models.transaction import Transaction
+
+api_bp = Blueprint('api', __name__)
+
+# Read-only API for other campus systems. Same roles and scoping as the
+# HTML views: admins see everything (every shard with sharding, unless
+# ?hostel_code= is given), agents their own hostel, students their own records.
+# See utils/api.py for fields, cursors and NDJSON streaming.
+
+STUDENTS = Resource(Student, {
+    'id': Student.id,
+    'prn': Student.prn,
+    'full_name': Student.full_name,
+    'branch': Student.branch,
+    'email': Student.email,
+    'phone': Student.phone,
+    'consultancy_id': Student.consultancy_id,
+    'hostel_code': Consultancy.hostel_code,
+    'total_fees': Student.total_fees,
+    'fees_paid': Student.fees_paid,
+    'fees_pending': Student.fees_pending,
+    'created_at': Student.created_at,
+}, {
+    'pending_desc': [('fees_pending', True)],
+    'pending_asc': [('fees_pending', False)],
+    'name': [('full_name', False)],
+})
+
+# Gateway keys and reset OTPs are never exposed
+CONSULTANCIES = Resource(Consultancy, {
+    'id': Consultancy.id,
+    'name': Consultancy.name,
+    'hostel_code': Consultancy.hostel_code,
+    'contact_person': Consultancy.contact_person,
+    'email': Consultancy.email,
+    'phone': Consultancy.phone,
+    'address': Consultancy.address,
+    'is_active': Consultancy.is_active,
+    'created_at': Consultancy.created_at,
+}, {
+    'hostel_code': [('hostel_code', False)],
+})
+
+# Transaction ids are allocated per shard; the hostel makes the key unique
+TRANSACTIONS = Resource(Transaction, {
+    'id': Transaction.id,
+    'transaction_id': Transaction.transaction_id,
+    'student_id': Transaction.student_id,
+    'prn': Student.prn,
+    'student_name': Student.full_name,
+    'consultancy_id': Transaction.consultancy_id,
+    'hostel_code': Consultancy.hostel_code,
+    'amount': Transaction.amount,
+    'payment_method': Transaction.payment_method,
+    'status': Transaction.status,
+    'payment_date': Transaction.payment_date,
+    'created_at': Transaction.created_at,
+}, {
+    'recent': [('payment_date', True)],
+}, unique=('id', 'consultancy_id'))
+
+
+@api_bp.errorhandler(HTTPException)
+def handle_error(e):
+    return jsonify({'success': False, 'message': e.description}), e.code
+
+
+def _admin_shards(hostel_code):
+    """The shard registry when an admin lists per-hostel rows without choosing a hostel"""
+    if current_user.role == 'admin' and not hostel_code:
+        return current_app.extensions.get('shards')
+    return None
+
+
+def _own_student():
+    return Student.query.filter_by(user_id=current_user.id).first_or_404()
+
+
+def _parse_date(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        abort(400, f'{name} must be YYYY-MM-DD')
+
+
+@api_bp.route('/students')
+@api_login_required
+@read_replica
+def list_students():
+    hostel_code = request.args.get('hostel_code', '')
+    pending_filter = request.args.get('pending_filter', '')
+    search = request.args.get('search', '')
+    min_pending = request.args.get('min_pending', type=float)
+    max_pending = request.args.get('max_pending', type=float)
+
+    query = STUDENTS.parse(request.args)
+    stmt = STUDENTS.select(query).join(Consultancy, Student.consultancy_id == Consultancy.id)
+
+    # Role scope
+    if current_user.role == 'agent':
+        stmt = stmt.where(Student.consultancy_id == current_user.consultancy_id)
+    elif current_user.role == 'student':
+        stmt = stmt.where(Student.user_id == current_user.id)
+    elif current_user.role != 'admin':
+        abort(403)
+
+    # Same filters as the filtered data page
+    if hostel_code:
+        stmt = stmt.where(Consultancy.hostel_code == hostel_code)
+
+    if pending_filter == 'has_pending':
+        stmt = stmt.where(Student.fees_pending > 0)
+    elif pending_filter == 'no_pending':
+        stmt = stmt.where(Student.fees_pending <= 0)
+
+    if min_pending is not None:
+        stmt = stmt.where(Student.fees_pending >= min_pending)
+    if max_pending is not None:
+        stmt = stmt.where(Student.fees_pending <= max_pending)
+
+    if search:
+        search_term = f"%{search}%"
+        stmt = stmt.where(
+            db.or_(
+                Student.prn.ilike(search_term),
+                Student.full_name.ilike(search_term),
+                Student.email.ilike(search_term),
+                Student.branch.ilike(search_term)
+            )
+        )
+
+    return list_response(STUDENTS, query, stmt, _admin_shards(hostel_code))
+
+
+@api_bp.route('/consultancies')
+@api_login_required
+@read_replica
+def list_consultancies():
+    hostel_code = request.args.get('hostel_code', '')
+    active = request.args.get('active', '')
+
+    query = CONSULTANCIES.parse(request.args)
+    stmt = CONSULTANCIES.select(query)
+
+    if current_user.role == 'agent':
+        stmt = stmt.where(Consultancy.id == current_user.consultancy_id)
+    elif current_user.role == 'student':
+        stmt = stmt.where(Consultancy.id == _own_student().consultancy_id)
+    elif current_user.role != 'admin':
+        abort(403)
+
+    if hostel_code:
+        stmt = stmt.where(Consultancy.hostel_code == hostel_code)
+    if active in ('true', 'false'):
+        stmt = stmt.where(Consultancy.is_active.is_(active == 'true'))
+
+    return list_response(CONSULTANCIES, query, stmt)
+
+
+@api_bp.route('/transactions')
+@api_login_required
+@read_replica
+def list_transactions():
+    hostel_code = request.args.get('hostel_code', '')
+    status = request.args.get('status', '')
+    student_id = request.args.get('student_id', type=int)
+    search = request.args.get('search', '')
+    date_from = _parse_date('from')
+    date_to = _parse_date('to')
+
+    query = TRANSACTIONS.parse(request.args)
+    stmt = (
+        TRANSACTIONS.select(query)
+        .join(Student, Transaction.student_id == Student.id)
+        .join(Consultancy, Transaction.consultancy_id == Consultancy.id)
+    )
+
+    if current_user.role == 'agent':
+        stmt = stmt.where(Transaction.consultancy_id == current_user.consultancy_id)
+    elif current_user.role == 'student':
+        stmt = stmt.where(Student.user_id == current_user.id)
+    elif current_user.role != 'admin':
+        abort(403)
+
+    if hostel_code:
+        stmt = stmt.where(Consultancy.hostel_code == hostel_code)
+    if status:
+        stmt = stmt.where(Transaction.status == status)
+    if student_id is not None:
+        stmt = stmt.where(Transaction.student_id == student_id)
+    if date_from:
+        stmt = stmt.where(Transaction.payment_date >= date_from)
+    if date_to:
+        # Inclusive of the whole end day
+        stmt = stmt.where(Transaction.payment_date < date_to + timedelta(days=1))
+
+    # Same search as the payment history page
+    if search:
+        stmt = stmt.where(
+            db.or_(
+                Transaction.transaction_id.contains(search),
+                Student.full_name.contains(search),
+                Student.prn.contains(search)
+            )
+        )
+
+    return list_response(TRANSACTIONS, query, stmt, _admin_shards(hostel_code))
@@ -54,7 +54,8 @@ def create_payment_order():
     # Initialize payment gateway with consultancy credentials
     pg = PaymentGateway(
         consultancy.payment_gateway_id or Config.RAZORPAY_KEY_ID,
-        consultancy.payment_gateway_key or Config.RAZORPAY_KEY_SECRET
+        consultancy.payment_gateway_key or Config.RAZORPAY_KEY_SECRET,
+        Config.RAZORPAY_BASE_URL
     )
     
     # Create order
@@ -83,7 +84,8 @@ def verify_payment():
     # Initialize payment gateway
     pg = PaymentGateway(
         consultancy.payment_gateway_id or Config.RAZORPAY_KEY_ID,
-        consultancy.payment_gateway_key or Config.RAZORPAY_KEY_SECRET
+        consultancy.payment_gateway_key or Config.RAZORPAY_KEY_SECRET,
+        Config.RAZORPAY_BASE_URL
     )
     
     # Verify payment
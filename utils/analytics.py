@@ -0,0 +1,226 @@
+import csv
+from datetime import datetime, timedelta
+from io import StringIO
+from flask import current_app
+from sqlalchemy import select, func
+from models.database import db
+from models.consultancy import Consultancy
+from models.student import Student
+from models.transaction import Transaction
+from utils.cache import VersionedCache
+from utils.data_version import data_version, scope_versions, CATALOG_SCOPE, LEDGER_SCOPE
+
+_cache = VersionedCache(max_entries=256)
+
+
+def _grouped_statement(consultancy_id=None):
+    """Students and fees grouped by hostel and branch - one round trip"""
+    stmt = (
+        select(
+            Consultancy.id, Consultancy.hostel_code, Consultancy.name, Student.branch,
+            func.count(Student.id),
+            func.coalesce(func.sum(Student.total_fees), 0),
+            func.coalesce(func.sum(Student.fees_paid), 0)
+        )
+        .join(Consultancy, Consultancy.id == Student.consultancy_id)
+        .group_by(Consultancy.id, Consultancy.hostel_code, Consultancy.name, Student.branch)
+    )
+    if consultancy_id is not None:
+        stmt = stmt.where(Student.consultancy_id == consultancy_id)
+    return stmt
+
+
+def _summary(students, total_fees, fees_paid):
+    return {
+        'students': students,
+        'total_fees': total_fees,
+        'fees_paid': fees_paid,
+        'fees_pending': total_fees - fees_paid,
+        'collection_rate': round(fees_paid / total_fees * 100, 2) if total_fees else 0.0
+    }
+
+
+def _roll_up(rows):
+    hostels = {}
+    branches = {}
+    totals = [0, 0.0, 0.0]
+
+    for consultancy_id, hostel_code, name, branch, students, total_fees, fees_paid in rows:
+        hostel = hostels.setdefault(hostel_code, {
+            'consultancy_id': consultancy_id, 'hostel_code': hostel_code, 'name': name, 'sums': [0, 0.0, 0.0]
+        })
+        branch_sums = branches.setdefault(branch, [0, 0.0, 0.0])
+        for sums in (hostel['sums'], branch_sums, totals):
+            sums[0] += students
+            sums[1] += total_fees
+            sums[2] += fees_paid
+
+    return {
+        'totals': _summary(*totals),
+        'by_hostel': [
+            {'consultancy_id': h['consultancy_id'], 'hostel_code': code, 'name': h['name'], **_summary(*h['sums'])}
+            for code, h in sorted(hostels.items())
+        ],
+        'by_branch': [
+            {'branch': branch, **_summary(*sums)}
+            for branch, sums in sorted(branches.items())
+        ]
+    }
+
+
+def _compute(consultancy_id=None):
+    stmt = _grouped_statement(consultancy_id)
+    shards = current_app.extensions.get('shards')
+
+    if shards is not None and consultancy_id is None:
+        # One GROUP BY per hostel shard, in parallel
+        def shard_rows(engine):
+            with engine.connect() as conn:
+                return conn.execute(stmt).all()
+
+        rows = [row for result in shards.fan_out(shard_rows).values() for row in result]
+    else:
+        rows = db.session.execute(stmt).all()
+
+    return _roll_up(rows)
+
+
+def collection_breakdown(consultancy_id=None):
+    """
+    Collection totals, pending totals, student counts and collection rates
+    overall, per hostel and per branch. Cached until a payment, roster
+    change or import bumps the relevant data version.
+    """
+    version = data_version(consultancy_id)
+    return _cache.get_or_set(('breakdown', consultancy_id), version, lambda: _compute(consultancy_id))
+
+
+# Collection report -------------------------------------------------------
+
+REPORT_PERIODS = ('day', 'week', 'month')
+
+# Default look-back when no start date is given
+DEFAULT_SPAN_DAYS = {'day': 30, 'week': 12 * 7, 'month': 365}
+
+REPORT_COLUMNS = ('period', 'hostel_code', 'consultancy_id', 'payments', 'amount')
+
+
+def period_start(value, period):
+    """Start of the day/week (Monday)/month containing `value`"""
+    day = datetime(value.year, value.month, value.day)
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _bucket_expression(period, dialect):
+    """SQL expression labelling each payment with the start date of its bucket"""
+    column = Transaction.payment_date
+    if dialect == 'sqlite':
+        if period == 'week':
+            return func.date(column, 'weekday 0', '-6 days')
+        if period == 'month':
+            return func.strftime('%Y-%m-01', column)
+        return func.date(column)
+    if dialect == 'postgresql':
+        return func.to_char(func.date_trunc(period, column), 'YYYY-MM-DD')
+    if dialect in ('mysql', 'mariadb'):
+        if period == 'week':
+            return func.date_format(func.subdate(column, func.weekday(column)), '%Y-%m-%d')
+        if period == 'month':
+            return func.date_format(column, '%Y-%m-01')
+        return func.date_format(column, '%Y-%m-%d')
+    raise ValueError(f'Collection report is not supported on {dialect}')
+
+
+def _collections(period, start, end, consultancy_id=None):
+    """Completed payments in [start, end) summed per bucket and hostel, in SQL"""
+    shards = current_app.extensions.get('shards')
+
+    def statement(dialect):
+        bucket = _bucket_expression(period, dialect).label('bucket')
+        stmt = (
+            select(
+                bucket, Consultancy.hostel_code, Consultancy.id,
+                func.count(Transaction.id),
+                func.coalesce(func.sum(Transaction.amount), 0)
+            )
+            .join(Consultancy, Consultancy.id == Transaction.consultancy_id)
+            .where(
+                Transaction.status == 'completed',
+                Transaction.payment_date >= start,
+                Transaction.payment_date < end
+            )
+            .group_by(bucket, Consultancy.hostel_code, Consultancy.id)
+        )
+        if consultancy_id is not None:
+            stmt = stmt.where(Transaction.consultancy_id == consultancy_id)
+        return stmt
+
+    if shards is not None and consultancy_id is None:
+        def shard_rows(engine):
+            with engine.connect() as conn:
+                return conn.execute(statement(engine.dialect.name)).all()
+
+        rows = [row for result in shards.fan_out(shard_rows).values() for row in result]
+    else:
+        dialect = db.session.connection(bind_arguments={'clause': select(Transaction)}).dialect.name
+        rows = db.session.execute(statement(dialect)).all()
+
+    return [
+        {'period': bucket, 'hostel_code': hostel_code, 'consultancy_id': cid, 'payments': payments, 'amount': amount}
+        for bucket, hostel_code, cid, payments, amount in rows
+    ]
+
+
+def collection_report(period='month', start=None, end=None, consultancy_id=None, now=None):
+    """
+    Collected amounts per hostel bucketed by day, week or month over the
+    dates [start, end] (inclusive). Closed periods never change unless a
+    payment is edited or deleted, so they are cached against the ledger
+    version and only the current period is queried on every call.
+    """
+    if period not in REPORT_PERIODS:
+        raise ValueError(f'Unknown period: {period}')
+
+    now = now or datetime.utcnow()
+    end = period_start(end or now, 'day') + timedelta(days=1)
+    start = period_start(start, 'day') if start else end - timedelta(days=DEFAULT_SPAN_DAYS[period])
+    if start >= end:
+        raise ValueError('Start date must not be after end date')
+
+    current = period_start(now, period)
+    rows = []
+
+    closed_end = min(end, current)
+    if start < closed_end:
+        key = ('collections', period, consultancy_id, start, closed_end)
+        version = scope_versions(LEDGER_SCOPE, CATALOG_SCOPE)
+        rows += _cache.get_or_set(key, version, lambda: _collections(period, start, closed_end, consultancy_id))
+
+    open_start = max(start, current)
+    if open_start < end:
+        rows += _collections(period, open_start, end, consultancy_id)
+
+    rows.sort(key=lambda row: (row['period'], row['hostel_code']))
+    return {
+        'period': period,
+        'start': start.strftime('%Y-%m-%d'),
+        'end': (end - timedelta(days=1)).strftime('%Y-%m-%d'),
+        'rows': rows,
+        'totals': {
+            'payments': sum(row['payments'] for row in rows),
+            'amount': sum(row['amount'] for row in rows)
+        }
+    }
+
+
+def report_to_csv(report):
+    """Collection report rows as CSV text"""
+    output = StringIO()
+    writer = csv.DictWriter(output, fieldnames=REPORT_COLUMNS)
+    writer.writeheader()
+    writer.writerows(report['rows'])
+    return output.getvalue()
@@ -0,0 +1,177 @@
+"""
+Helpers for the read-only JSON API (routes/api.py).
+
+Each Resource maps public field names to columns. List endpoints select
+only the requested columns (?fields=) and serialize rows straight from the
+result tuples, without building ORM objects. Pagination is keyset-based:
+the cursor encodes the sort key of the last row returned, so every page
+costs the same as the first and concurrent inserts never shift pages.
+With ?format=ndjson (or Accept: application/x-ndjson) the whole result is
+streamed one JSON object per line, fetched in keyset batches, so neither
+the server nor the client holds it all in memory.
+
+With sharding, admin requests without a hostel read every shard: each
+shard returns its own first `limit` rows after the cursor, and the merged
+first `limit` rows are the page. Resources whose ids are only unique per
+shard add another tie-breaker column so the keys stay unique.
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from flask import abort, current_app, request, stream_with_context
+from sqlalchemy import and_, or_, select
+from models.database import db
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 1000
+NDJSON = 'application/x-ndjson'
+
+
+class ListQuery:
+    def __init__(self, names, sort, after, limit, stream):
+        self.names = names
+        self.sort = sort
+        self.after = after
+        self.limit = limit
+        self.stream = stream
+
+
+class Resource:
+    """
+    fields: {public name: column}, in output order
+    sorts: {sort name: [(field name, descending)]}; the `unique` fields
+    (default 'id') are always the final tie-breakers so keys are unique
+    """
+
+    def __init__(self, base, fields, sorts, unique=('id',)):
+        self.base = base
+        self.fields = fields
+        self.sorts = {'id': [], **sorts}
+        self.unique = [(name, False) for name in unique]
+
+    def keys(self, sort):
+        return self.sorts[sort] + [key for key in self.unique if key not in self.sorts[sort]]
+
+    def parse(self, args, default_sort='id'):
+        """Read fields, sort, cursor, limit and format from the query string"""
+        names = [name.strip() for name in args.get('fields', '').split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            abort(400, f'Unknown fields: {", ".join(unknown)}. Available: {", ".join(self.fields)}')
+
+        sort = args.get('sort') or default_sort
+        if sort not in self.sorts:
+            abort(400, f'Unknown sort {sort}. Available: {", ".join(self.sorts)}')
+
+        stream = args.get('format') == 'ndjson' or (
+            'format' not in args and request.accept_mimetypes.best == NDJSON
+        )
+        limit = args.get('limit', type=int)
+        if limit is not None and limit < 1:
+            abort(400, 'limit must be positive')
+        if not stream:
+            limit = min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+
+        after = self.decode_cursor(sort, args['cursor']) if args.get('cursor') else None
+        return ListQuery(names or list(self.fields), sort, after, limit, stream)
+
+    def select(self, query):
+        """SELECT of the requested fields plus the sort key columns"""
+        names = query.names + [name for name, _ in self.keys(query.sort) if name not in query.names]
+        return select(*(self.fields[name].label(name) for name in names)).select_from(self.base)
+
+    def encode_cursor(self, sort, row):
+        values = [row._mapping[name] for name, _ in self.keys(sort)]
+        values = [value.isoformat() if isinstance(value, (date, datetime)) else value for value in values]
+        data = json.dumps({'s': sort, 'k': values}, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+    def decode_cursor(self, sort, value):
+        try:
+            data = json.loads(base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)))
+            keys = self.keys(sort)
+            if data['s'] != sort or len(data['k']) != len(keys):
+                raise ValueError
+            values = []
+            for (name, _), key in zip(keys, data['k']):
+                if key is not None and isinstance(self.fields[name].type, db.DateTime):
+                    key = datetime.fromisoformat(key)
+                values.append(key)
+            return values
+        except (binascii.Error, ValueError, KeyError, TypeError):
+            abort(400, 'Invalid cursor (cursors are only valid with the sort they came from)')
+
+    def after_condition(self, sort, values):
+        """Rows strictly after `values` in the sort order (expanded row-value comparison)"""
+        keys = self.keys(sort)
+        clauses = []
+        for i, ((name, descending), value) in enumerate(zip(keys, values)):
+            column = self.fields[name]
+            equal = [self.fields[n] == v for (n, _), v in zip(keys[:i], values[:i])]
+            clauses.append(and_(*equal, column < value if descending else column > value))
+        return or_(*clauses)
+
+    def page(self, query, stmt, after, limit, shards=None):
+        """Up to `limit` rows after `after`; from every shard when `shards` (the registry) is given"""
+        if after is not None:
+            stmt = stmt.where(self.after_condition(query.sort, after))
+        keys = self.keys(query.sort)
+        order = [self.fields[name].desc() if descending else self.fields[name] for name, descending in keys]
+        stmt = stmt.order_by(*order).limit(limit)
+        if shards is None:
+            return db.session.execute(stmt).all()
+
+        def shard_rows(engine):
+            with engine.connect() as conn:
+                return conn.execute(stmt).all()
+
+        rows = [row for result in shards.fan_out(shard_rows).values() for row in result]
+        # Stable sorts, least significant key first; NULLs sort low as in SQLite
+        for name, descending in reversed(keys):
+            rows.sort(key=lambda row: (row._mapping[name] is not None, row._mapping[name]), reverse=descending)
+        return rows[:limit]
+
+
+def serialize(names, row):
+    item = {}
+    for name in names:
+        value = row._mapping[name]
+        item[name] = value.isoformat() if isinstance(value, (date, datetime)) else value
+    return item
+
+
+def list_response(resource, query, stmt, shards=None):
+    """
+    JSON page with next_cursor, or an NDJSON stream of every matching row.
+    shards: the shard registry, to read every shard instead of the current one.
+    """
+    if not query.stream:
+        rows = resource.page(query, stmt, query.after, query.limit + 1, shards)
+        more = len(rows) > query.limit
+        rows = rows[:query.limit]
+        # json.dumps rather than jsonify: keeps the ?fields= order and skips key sorting
+        body = json.dumps({
+            'success': True,
+            'data': [serialize(query.names, row) for row in rows],
+            'next_cursor': resource.encode_cursor(query.sort, rows[-1]) if more else None
+        }, separators=(',', ':'))
+        return current_app.response_class(body, mimetype='application/json')
+
+    def generate():
+        after, remaining = query.after, query.limit
+        while remaining is None or remaining > 0:
+            batch = STREAM_BATCH_SIZE if remaining is None else min(STREAM_BATCH_SIZE, remaining)
+            rows = resource.page(query, stmt, after, batch, shards)
+            if not rows:
+                break
+            yield ''.join(json.dumps(serialize(query.names, row), separators=(',', ':')) + '\n' for row in rows)
+            if len(rows) < batch:
+                break
+            if remaining is not None:
+                remaining -= len(rows)
+            last = rows[-1]._mapping
+            after = [last[name] for name, _ in resource.keys(query.sort)]
+
+    return current_app.response_class(stream_with_context(generate()), mimetype=NDJSON)
@@ -0,0 +1,146 @@
+"""
+Build-free static asset pipeline.
+
+- url_for('static', filename=...) gets a ?v=<content hash> fingerprint
+  automatically, so templates need no changes.
+- Fingerprinted URLs are served with a one-year immutable Cache-Control;
+  anything else revalidates through its ETag.
+- Text assets are compressed once per worker (gzip, plus brotli when the
+  optional `brotli` package is installed) and served from memory.
+- Dynamic HTML/JSON/CSV responses larger than COMPRESS_MIN_SIZE are gzip
+  (or brotli) compressed on the fly.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from flask import abort, current_app, request, send_from_directory
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+DYNAMIC_TYPES = ('text/html', 'application/json', 'text/csv', 'text/plain')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+class Asset:
+    def __init__(self, path):
+        stat = os.stat(path)
+        self.stamp = (stat.st_mtime_ns, stat.st_size)
+        with open(path, 'rb') as f:
+            self.raw = f.read()
+        self.digest = hashlib.sha256(self.raw).hexdigest()[:12]
+        self.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.encoded = {}
+        if self.mimetype.startswith(COMPRESSIBLE_TYPES):
+            self.encoded['gzip'] = gzip.compress(self.raw, compresslevel=9, mtime=0)
+            if brotli is not None:
+                self.encoded['br'] = brotli.compress(self.raw, quality=11)
+
+
+class AssetRegistry:
+    """Fingerprints and compressed copies of static files, refreshed when a file changes"""
+
+    def __init__(self, static_folder, max_bytes):
+        self.static_folder = static_folder
+        self.max_bytes = max_bytes
+        self._assets = {}
+        self._lock = threading.Lock()
+
+    def get(self, filename):
+        path = safe_join(self.static_folder, filename)
+        if path is None or not os.path.isfile(path):
+            return None
+        stat = os.stat(path)
+        if stat.st_size > self.max_bytes:
+            return None
+        asset = self._assets.get(path)
+        if asset is None or asset.stamp != (stat.st_mtime_ns, stat.st_size):
+            asset = Asset(path)
+            with self._lock:
+                self._assets[path] = asset
+        return asset
+
+
+def _preferred_encoding(available):
+    accepted = request.accept_encodings
+    for encoding in ('br', 'gzip'):
+        if encoding in available and accepted[encoding]:
+            return encoding
+    return None
+
+
+def serve_static(filename):
+    """Replacement for Flask's static view"""
+    asset = current_app.extensions['assets'].get(filename)
+    if asset is None:
+        # Missing, or too large to keep in memory
+        return send_from_directory(current_app.static_folder, filename)
+
+    encoding = _preferred_encoding(asset.encoded)
+    response = current_app.response_class(asset.encoded[encoding] if encoding else asset.raw,
+                                          mimetype=asset.mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if asset.encoded:
+        response.vary.add('Accept-Encoding')
+    response.set_etag(f'{asset.digest}-{encoding or "identity"}')
+    if request.args.get('v') == asset.digest:
+        response.headers['Cache-Control'] = IMMUTABLE
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
+def compress_response(response):
+    """after_request hook: compress large dynamic text responses"""
+    config = current_app.config
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or 'Content-Encoding' in response.headers
+        or not response.mimetype.startswith(DYNAMIC_TYPES)
+        or (response.content_length or 0) < config['COMPRESS_MIN_SIZE']
+    ):
+        return response
+
+    encoding = _preferred_encoding(('br', 'gzip') if brotli is not None else ('gzip',))
+    response.vary.add('Accept-Encoding')
+    if encoding is None:
+        return response
+
+    data = response.get_data()
+    if encoding == 'br':
+        data = brotli.compress(data, quality=config['COMPRESS_BROTLI_QUALITY'])
+    else:
+        data = gzip.compress(data, compresslevel=config['COMPRESS_LEVEL'], mtime=0)
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    if response.get_etag()[0]:
+        # A different representation needs a different validator
+        tag, weak = response.get_etag()
+        response.set_etag(f'{tag}-{encoding}', weak)
+    return response
+
+
+def init_assets(app):
+    if not app.config.get('ASSET_PIPELINE_ENABLED'):
+        return
+    registry = AssetRegistry(app.static_folder, app.config['ASSET_MAX_BYTES'])
+    app.extensions['assets'] = registry
+    app.view_functions['static'] = serve_static
+
+    @app.url_defaults
+    def fingerprint_static(endpoint, values):
+        if endpoint == 'static' and 'filename' in values and 'v' not in values:
+            asset = registry.get(values['filename'])
+            if asset is not None:
+                values['v'] = asset.digest
+
+    app.after_request(compress_response)
@@ -0,0 +1,180 @@
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, select
+from models.database import db
+from models.transaction import ChangeLog
+
+# Student columns tracked in the audit trail (passwords are never logged)
+STUDENT_AUDIT_FIELDS = ('prn', 'full_name', 'branch', 'email', 'phone', 'total_fees', 'consultancy_id')
+
+
+def _dumps(changes):
+    """Compact JSON encoding for ChangeLog.changes"""
+    return json.dumps(changes, separators=(',', ':'), default=str)
+
+
+def snapshot(obj, fields):
+    """Capture the current values of `fields` on a model instance"""
+    return {field: getattr(obj, field) for field in fields}
+
+
+def diff(before, after):
+    """Return only the fields that changed as {field: [old, new]}"""
+    return {
+        field: [before.get(field), value]
+        for field, value in after.items()
+        if before.get(field) != value
+    }
+
+
+def log_change(user_id, user_role, action, table, record_id, changes):
+    """
+    Add an audit entry to the current session.
+    Nothing is committed here - the entry is written in the same
+    transaction as the change it describes.
+    """
+    db.session.add(ChangeLog(
+        user_id=user_id,
+        user_role=user_role,
+        action=action,
+        table_name=table,
+        record_id=record_id,
+        changes=_dumps(changes),
+        timestamp=datetime.utcnow()
+    ))
+
+
+class AuditBuffer:
+    """
+    Buffered audit writer for bulk operations (imports, cascades).
+    Entries are written with multi-row INSERTs every `batch_size` entries
+    and on flush(); they still share the caller's transaction.
+
+        with AuditBuffer(current_user.id, 'admin') as audit:
+            audit.add('delete', 'students', student_id, {...})
+        db.session.commit()
+    """
+
+    def __init__(self, user_id, user_role, batch_size=500):
+        self.user_id = user_id
+        self.user_role = user_role
+        self.batch_size = batch_size
+        self.pending = []
+        self.written = 0
+
+    def add(self, action, table, record_id, changes):
+        self.pending.append({
+            'user_id': self.user_id,
+            'user_role': self.user_role,
+            'action': action,
+            'table_name': table,
+            'record_id': record_id,
+            'changes': _dumps(changes),
+            'timestamp': datetime.utcnow()
+        })
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        db.session.execute(ChangeLog.__table__.insert(), self.pending)
+        self.written += len(self.pending)
+        self.pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        else:
+            self.pending = []
+        return False
+
+
+def serialize_change_log(entry):
+    """ChangeLog row as a JSON-friendly dict"""
+    return {
+        'id': entry.id,
+        'user_id': entry.user_id,
+        'user_role': entry.user_role,
+        'action': entry.action,
+        'table_name': entry.table_name,
+        'record_id': entry.record_id,
+        'changes': json.loads(entry.changes) if entry.changes else None,
+        'timestamp': entry.timestamp.strftime('%Y-%m-%d %H:%M:%S') if entry.timestamp else None
+    }
+
+
+def _change_log_databases():
+    """(hostel code, engine) of every database with a change_logs table; None is the primary/catalog"""
+    databases = [(None, db.engine)]
+    shards = current_app.extensions.get('shards')
+    if shards is not None:
+        databases.extend((code, shards.engine(code)) for code in shards.hostel_codes())
+    return databases
+
+
+def _append_gzip_member(path, lines):
+    """Append `lines` to `path` as one complete gzip member and sync it to disk"""
+    with open(path, 'ab') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb') as member:
+            member.write(''.join(lines).encode('utf-8'))
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+def archive_change_logs(archive_folder, older_than_days=180, batch_size=5000):
+    """
+    Move ChangeLog entries older than `older_than_days` into a gzipped
+    JSON-lines file in `archive_folder`, then delete them from the table.
+    With sharding every hostel shard is archived too, and its entries
+    carry a hostel_code (ids are only unique within one database).
+    Each batch is appended as its own gzip member and synced before its
+    rows are deleted. An interrupted run leaves every earlier batch
+    readable, and the rows of the unfinished batch are still in the table.
+    Returns (archived_count, archive_path).
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    os.makedirs(archive_folder, exist_ok=True)
+    archive_path = os.path.join(
+        archive_folder,
+        f"change_logs_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.jsonl.gz"
+    )
+
+    table = ChangeLog.__table__
+    archived = 0
+    for hostel_code, engine in _change_log_databases():
+        last_id = 0
+        while True:
+            with engine.connect() as conn:
+                entries = conn.execute(
+                    select(table)
+                    .where(table.c.timestamp < cutoff, table.c.id > last_id)
+                    .order_by(table.c.id)
+                    .limit(batch_size)
+                ).all()
+            if not entries:
+                break
+
+            lines = []
+            for entry in entries:
+                record = serialize_change_log(entry)
+                if hostel_code is not None:
+                    record['hostel_code'] = hostel_code
+                lines.append(_dumps(record) + '\n')
+            _append_gzip_member(archive_path, lines)
+
+            ids = [entry.id for entry in entries]
+            last_id = ids[-1]
+            with engine.begin() as conn:
+                conn.execute(delete(table).where(table.c.id.in_(ids)))
+            archived += len(ids)
+
+    if not archived:
+        return 0, None
+    return archived, archive_path
@@ -0,0 +1,374 @@
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import select, delete, update, and_, case, func
+from sqlalchemy.orm import selectinload
+from werkzeug.security import generate_password_hash
+from models.database import db
+from models.user import User
+from models.consultancy import Consultancy
+from models.student import Student
+from models.transaction import Transaction
+from models.sharding import sharding_enabled
+from utils.audit import AuditBuffer, snapshot, diff, STUDENT_AUDIT_FIELDS
+from utils.data_version import (
+    bump_consultancies, bump_versions, CATALOG_SCOPE, LEDGER_SCOPE, ROSTER_SCOPE, HOSTELS_REMOVED_SCOPE
+)
+
+# Keeps IN (...) lists well under SQLite's bound-parameter limit
+CHUNK_SIZE = 900
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def delete_students(condition, audit=None):
+    """
+    Set-based delete of every student matching `condition` (a SQL expression
+    on Student), together with their transactions and login users.
+    Deletion entries are written through `audit` (an AuditBuffer) if given.
+    Returns the number of students deleted.
+    """
+    rows = db.session.execute(
+        select(Student.id, Student.user_id, Student.consultancy_id, Student.prn, Student.full_name).where(condition)
+    ).all()
+    if not rows:
+        return 0
+
+    # Bulk statements bypass the ORM flush, so invalidate caches explicitly
+    bump_consultancies({row.consultancy_id for row in rows})
+    bump_versions([LEDGER_SCOPE, ROSTER_SCOPE])
+
+    student_ids = select(Student.id).where(condition)
+    user_ids = [row.user_id for row in rows]
+
+    db.session.execute(
+        delete(Transaction).where(Transaction.student_id.in_(student_ids)),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.execute(
+        delete(Student).where(condition),
+        execution_options={'synchronize_session': False}
+    )
+    for chunk in _chunks(user_ids):
+        db.session.execute(
+            delete(User).where(User.id.in_(chunk)),
+            execution_options={'synchronize_session': False}
+        )
+
+    if audit is not None:
+        for row in rows:
+            audit.add('delete', 'students', row.id, {'student_name': row.full_name, 'prn': row.prn})
+
+    return len(rows)
+
+
+def delete_consultancy_cascade(consultancy, audit=None):
+    """
+    Delete a hostel with all of its students, their transactions and users,
+    and its agents using a handful of set-based statements.
+    Returns the number of students deleted.
+    """
+    consultancy_id = consultancy.id
+
+    deleted = delete_students(Student.consultancy_id == consultancy_id, audit=audit)
+
+    db.session.execute(
+        delete(User).where(User.consultancy_id == consultancy_id, User.role == 'agent'),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.execute(
+        delete(Consultancy).where(Consultancy.id == consultancy_id),
+        execution_options={'synchronize_session': False}
+    )
+
+    bump_versions([CATALOG_SCOPE, HOSTELS_REMOVED_SCOPE])
+    bump_consultancies([consultancy_id])
+
+    if audit is not None:
+        audit.add('delete', 'consultancies', consultancy_id, {
+            'hostel_code': consultancy.hostel_code,
+            'name': consultancy.name,
+            'students_deleted': deleted
+        })
+
+    return deleted
+
+
+def delete_consultancy_keeping_students(consultancy, audit=None):
+    """
+    Delete a hostel and its agents but leave its students, their users and
+    transactions untouched, still pointing at the deleted hostel
+    (student_filter(orphaned=True) finds them for reassignment).
+    Set-based, so the ORM does not try to null the students' hostel.
+    Returns the number of students kept.
+    """
+    consultancy_id = consultancy.id
+    kept = db.session.scalar(select(func.count(Student.id)).where(Student.consultancy_id == consultancy_id))
+
+    db.session.execute(
+        delete(User).where(User.consultancy_id == consultancy_id, User.role == 'agent'),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.execute(
+        delete(Consultancy).where(Consultancy.id == consultancy_id),
+        execution_options={'synchronize_session': False}
+    )
+
+    bump_versions([CATALOG_SCOPE, ROSTER_SCOPE, HOSTELS_REMOVED_SCOPE])
+    bump_consultancies([consultancy_id])
+
+    if audit is not None:
+        audit.add('delete', 'consultancies', consultancy_id, {
+            'hostel_code': consultancy.hostel_code,
+            'name': consultancy.name,
+            'students_kept': kept
+        })
+
+    return kept
+
+
+def _student_result(student):
+    return {
+        'id': student.id,
+        'prn': student.prn,
+        'full_name': student.full_name,
+        'branch': student.branch,
+        'email': student.email,
+        'phone': student.phone,
+        'consultancy_id': student.consultancy_id,
+        'total_fees': student.total_fees,
+        'fees_paid': student.fees_paid,
+        # fees_pending is generated by the database; compute it for unflushed edits
+        'fees_pending': (student.total_fees or 0) - (student.fees_paid or 0)
+    }
+
+
+def batch_update_students(patches, user_id, user_role, consultancy_id=None, hash_workers=4):
+    """
+    Apply a list of per-student patches ({'id': 1, 'full_name': ..., ...})
+    using one bulk fetch. Agents pass their consultancy_id: only their own
+    students can be edited and students cannot be moved to another hostel.
+    New phone-passwords are hashed in parallel and only when the phone changed.
+    Nothing is committed - the caller commits once for the whole batch.
+    Returns a list of per-item results in request order.
+    """
+    ids = []
+    for patch in patches:
+        try:
+            ids.append(int(patch.get('id')))
+        except (TypeError, ValueError, AttributeError):
+            pass
+
+    query = Student.query.options(selectinload(Student.user)).filter(Student.id.in_(ids))
+    if consultancy_id is not None:
+        query = query.filter(Student.consultancy_id == consultancy_id)
+    students = {student.id: student for student in query.all()}
+
+    # PRNs and hostels referenced by the batch, checked with one query each
+    new_prns = {str(p['prn']).strip() for p in patches if isinstance(p, dict) and p.get('prn')}
+    prn_owners = dict(db.session.execute(
+        select(Student.prn, Student.id).where(Student.prn.in_(new_prns))
+    ).all()) if new_prns else {}
+    target_ids = set()
+    if consultancy_id is None:
+        for p in patches:
+            if isinstance(p, dict) and p.get('consultancy_id') not in (None, ''):
+                try:
+                    target_ids.add(int(p['consultancy_id']))
+                except (TypeError, ValueError):
+                    pass
+    valid_consultancies = set(db.session.scalars(
+        select(Consultancy.id).where(Consultancy.id.in_(target_ids))
+    ).all()) if target_ids else set()
+
+    results = []
+    to_hash = {}
+
+    with AuditBuffer(user_id, user_role) as audit:
+        for patch in patches:
+            try:
+                student_id = int(patch.get('id'))
+            except (TypeError, ValueError, AttributeError):
+                results.append({'id': None, 'success': False, 'message': 'Missing or invalid student id'})
+                continue
+
+            student = students.get(student_id)
+            if not student:
+                results.append({'id': student_id, 'success': False, 'message': 'Student not found'})
+                continue
+
+            try:
+                values = {}
+                if 'prn' in patch:
+                    prn = str(patch['prn']).strip()
+                    if not prn:
+                        raise ValueError('PRN cannot be empty')
+                    owner = prn_owners.get(prn)
+                    if owner is not None and owner != student.id:
+                        raise ValueError(f'PRN {prn} already exists')
+                    values['prn'] = prn
+                for field in ('full_name', 'branch', 'email', 'phone'):
+                    if field in patch:
+                        values[field] = str(patch[field]).strip()
+                if 'total_fees' in patch:
+                    values['total_fees'] = float(patch['total_fees'])
+                if 'consultancy_id' in patch:
+                    if consultancy_id is not None:
+                        raise ValueError('Agents cannot move students to another hostel')
+                    target = int(patch['consultancy_id'])
+                    if target not in valid_consultancies:
+                        raise ValueError('Selected hostel not found')
+                    if sharding_enabled() and target != student.consultancy_id:
+                        raise ValueError('Moving students between hostels is not supported in sharding mode')
+                    values['consultancy_id'] = target
+            except (TypeError, ValueError) as e:
+                results.append({'id': student_id, 'success': False, 'message': str(e)})
+                continue
+
+            before = snapshot(student, STUDENT_AUDIT_FIELDS)
+            for field, value in values.items():
+                setattr(student, field, value)
+
+            # Keep the login user in sync
+            if 'prn' in values:
+                prn_owners.pop(before['prn'], None)
+                prn_owners[values['prn']] = student.id
+                student.user.username = values['prn']
+            if 'email' in values:
+                student.user.email = values['email']
+            if 'consultancy_id' in values:
+                student.user.consultancy_id = values['consultancy_id']
+            if 'phone' in values and values['phone'] != before['phone']:
+                to_hash[student.id] = values['phone']
+
+            changes = diff(before, snapshot(student, STUDENT_AUDIT_FIELDS))
+            if changes:
+                audit.add('update', 'students', student.id, changes)
+
+            results.append({
+                'id': student.id,
+                'success': True,
+                'message': 'Student updated successfully' if changes else 'No changes',
+                'student': _student_result(student)
+            })
+
+        # Password hashing dominates the cost of phone edits; run it in parallel
+        if to_hash:
+            with ThreadPoolExecutor(max_workers=hash_workers) as pool:
+                hashes = pool.map(generate_password_hash, to_hash.values())
+                for student_id, hashed in zip(to_hash.keys(), hashes):
+                    students[student_id].user.password = hashed
+
+    return results
+
+
+def student_filter(hostel_code='', branch='', pending_filter='', consultancy_id=None, orphaned=False):
+    """
+    SQL condition on Student for the filters used by the bulk operations
+    (the same hostel/pending options as the filtered data page).
+    orphaned selects students whose hostel no longer exists, i.e. those
+    left behind by deleting a hostel but keeping its students.
+    Returns None when no filter was given.
+    """
+    conditions = []
+    if orphaned:
+        conditions.append(~Student.consultancy_id.in_(select(Consultancy.id)))
+    if consultancy_id:
+        conditions.append(Student.consultancy_id == int(consultancy_id))
+    if hostel_code:
+        conditions.append(Student.consultancy_id == select(Consultancy.id).where(
+            Consultancy.hostel_code == hostel_code
+        ).scalar_subquery())
+    if branch:
+        conditions.append(Student.branch == branch)
+    if pending_filter == 'has_pending':
+        conditions.append(Student.fees_pending > 0)
+    elif pending_filter == 'no_pending':
+        conditions.append(Student.fees_pending <= 0)
+    return and_(*conditions) if conditions else None
+
+
+def preview_students(condition):
+    """Count and fee totals of the students a bulk operation would touch"""
+    row = db.session.execute(
+        select(
+            func.count(Student.id),
+            func.coalesce(func.sum(Student.total_fees), 0),
+            func.coalesce(func.sum(Student.fees_paid), 0)
+        ).where(condition)
+    ).one()
+    return {'students': row[0], 'total_fees': row[1], 'fees_paid': row[2]}
+
+
+def adjust_fees(condition, mode, amount, audit=None):
+    """
+    Change total_fees for every matching student with one UPDATE.
+    mode: 'set' (fees = amount), 'increase' or 'decrease' (never below
+    what the student has already paid).
+    Returns the number of students updated.
+    """
+    if mode == 'set':
+        new_fees = amount
+    elif mode == 'increase':
+        new_fees = Student.total_fees + amount
+    elif mode == 'decrease':
+        new_fees = case(
+            (Student.total_fees - amount < Student.fees_paid, Student.fees_paid),
+            else_=Student.total_fees - amount
+        )
+    else:
+        raise ValueError(f'Unknown fee adjustment mode: {mode}')
+
+    if audit is not None:
+        for student_id, old_fees, paid in db.session.execute(
+            select(Student.id, Student.total_fees, Student.fees_paid).where(condition)
+        ).all():
+            if mode == 'set':
+                fees = amount
+            elif mode == 'increase':
+                fees = old_fees + amount
+            else:
+                fees = max(old_fees - amount, paid)
+            if fees != old_fees:
+                audit.add('update', 'students', student_id, {'total_fees': [old_fees, fees]})
+
+    bump_consultancies(db.session.scalars(select(Student.consultancy_id).where(condition).distinct()).all())
+
+    result = db.session.execute(
+        update(Student).where(condition).values(total_fees=new_fees),
+        execution_options={'synchronize_session': False}
+    )
+    return result.rowcount
+
+
+def transfer_students(condition, target_consultancy_id, audit=None):
+    """
+    Move every matching student, and their login user, to another hostel.
+    Users are updated first because the student filter may depend on the
+    current hostel. Returns the number of students moved.
+    """
+    if audit is not None:
+        for student_id, old_id in db.session.execute(
+            select(Student.id, Student.consultancy_id).where(condition)
+        ).all():
+            if old_id != target_consultancy_id:
+                audit.add('update', 'students', student_id, {'consultancy_id': [old_id, target_consultancy_id]})
+
+    bump_consultancies(
+        set(db.session.scalars(select(Student.consultancy_id).where(condition).distinct()).all())
+        | {target_consultancy_id}
+    )
+    bump_versions([ROSTER_SCOPE])
+
+    db.session.execute(
+        update(User)
+        .where(User.id.in_(select(Student.user_id).where(condition)))
+        .values(consultancy_id=target_consultancy_id),
+        execution_options={'synchronize_session': False}
+    )
+    result = db.session.execute(
+        update(Student).where(condition).values(consultancy_id=target_consultancy_id),
+        execution_options={'synchronize_session': False}
+    )
+    return result.rowcount
@@ -0,0 +1,208 @@
+"""
+Per-consultancy data version counters.
+
+Every flush that touches students, transactions or consultancies bumps
+the counter of each affected consultancy in the same transaction. Set-based
+bulk statements (utils/bulk_ops.py) bump explicitly. Caches compare these
+counters instead of timestamps, which works across gunicorn workers.
+
+In sharding mode each counter lives next to the data it versions. The
+consultancy:<id> counters and the ledger counter are kept in the hostel's
+shard, so a hostel write stays within its own database. Only the catalog,
+announcements, roster and removed-hostels counters are kept in the catalog.
+The ledger version is the sum of the ledger counters of every shard.
+
+The global version sums the counters of the hostels that exist now. When a
+hostel's shard drops out that sum can go down and repeat an earlier
+value, so the removed-hostels counter, bumped on every hostel deletion, is
+part of the global version too.
+"""
+from itertools import chain
+from flask import current_app, g, has_app_context
+from sqlalchemy import case, event, inspect, select, func, update, insert
+from sqlalchemy.dialects import sqlite, postgresql
+from models.database import db, RoutingSession
+from models.data_version import DataVersion
+from models.consultancy import Consultancy
+from models.student import Student
+from models.transaction import Transaction, Announcement
+from models.user import User
+
+# Bumped when hostels are added, edited or removed
+CATALOG_SCOPE = 'catalog'
+# Bumped when announcements are added, edited or removed
+ANNOUNCEMENTS_SCOPE = 'announcements'
+# Bumped when student logins are added, removed or moved to another hostel.
+# These writes already touch the catalog (users), so it lives there and
+# pages that only show per-hostel student counts need no shard reads
+ROSTER_SCOPE = 'roster'
+# Bumped when recorded payments are edited or deleted (new payments don't
+# touch it), so reports over past periods stay valid while payments come in
+LEDGER_SCOPE = 'ledger'
+# Bumped when a hostel is deleted: its shard's counters leave the global sum
+HOSTELS_REMOVED_SCOPE = 'hostels_removed'
+
+
+def consultancy_scope(consultancy_id):
+    return f'consultancy:{consultancy_id}'
+
+
+def _shards():
+    return current_app.extensions.get('shards') if has_app_context() else None
+
+
+def _scope_shard(shards, scope, shard=None):
+    """Hostel code of the shard holding `scope`, or None for the catalog"""
+    if scope == LEDGER_SCOPE:
+        return shard or g.get('shard')
+    if scope.startswith('consultancy:'):
+        row = shards.resolve(consultancy_id=int(scope.split(':', 1)[1]))
+        # A hostel deleted in this transaction has no shard to bump
+        return row['hostel_code'] if row else None
+    return None
+
+
+def _group_by_shard(scopes, shard=None):
+    """{hostel code or None: [scopes]}; everything is in the catalog without sharding"""
+    shards = _shards()
+    if shards is None:
+        return {None: list(scopes)}
+    groups = {}
+    for scope in scopes:
+        groups.setdefault(_scope_shard(shards, scope, shard), []).append(scope)
+    return groups
+
+
+def bump_versions(scopes, session=None, shard=None):
+    """
+    Increment the counters for `scopes` inside the current transaction.
+    `shard` is the hostel shard the ledger counter is bumped in (default:
+    g.shard); it is ignored without sharding.
+    """
+    scopes = sorted(set(scopes))
+    if not scopes:
+        return
+    session = session or db.session
+    table = DataVersion.__table__
+    for code, group in _group_by_shard(scopes, shard).items():
+        if code is None:
+            conn = session.connection(bind_arguments={'clause': table.update()})
+        else:
+            conn = session.connection(bind_arguments={'bind': _shards().engine(code)})
+        _increment(conn, group)
+
+
+def _increment(conn, scopes):
+    table = DataVersion.__table__
+    dialects = {'sqlite': sqlite, 'postgresql': postgresql}
+    dialect = dialects.get(conn.dialect.name)
+    if dialect is not None:
+        stmt = dialect.insert(table).values([{'scope': s, 'version': 1} for s in scopes])
+        conn.execute(stmt.on_conflict_do_update(
+            index_elements=[table.c.scope],
+            set_={'version': table.c.version + 1}
+        ))
+        return
+
+    result = conn.execute(update(table).where(table.c.scope.in_(scopes)).values(version=table.c.version + 1))
+    if result.rowcount < len(scopes):
+        existing = set(conn.execute(select(table.c.scope).where(table.c.scope.in_(scopes))).scalars())
+        conn.execute(insert(table), [{'scope': s, 'version': 1} for s in scopes if s not in existing])
+
+
+def bump_consultancies(consultancy_ids, session=None):
+    bump_versions([consultancy_scope(i) for i in consultancy_ids if i is not None], session=session)
+
+
+def data_version(consultancy_id=None):
+    """
+    Current version of one consultancy's data (plus the catalog), or of
+    everything when consultancy_id is None. Costs one small query per
+    database involved (every shard for the global version).
+    """
+    if consultancy_id is not None:
+        return scope_versions(consultancy_scope(consultancy_id), CATALOG_SCOPE)
+
+    removed = case((DataVersion.scope == HOSTELS_REMOVED_SCOPE, DataVersion.version), else_=0)
+    stmt = select(
+        func.coalesce(func.sum(DataVersion.version), 0),
+        func.count(DataVersion.scope),
+        func.coalesce(func.max(removed), 0)
+    )
+    total, count, generation = db.session.execute(stmt).one()
+    shards = _shards()
+    if shards is not None:
+        def shard_totals(engine):
+            with engine.connect() as conn:
+                return conn.execute(stmt).one()
+
+        for shard_total, shard_count, _ in shards.fan_out(shard_totals).values():
+            total += shard_total
+            count += shard_count
+    # Between hostel deletions the sum only grows; the generation tells eras apart
+    return total, count, generation
+
+
+def _read_versions(scopes, code):
+    stmt = select(DataVersion.scope, DataVersion.version).where(DataVersion.scope.in_(scopes))
+    if code is None:
+        return dict(db.session.execute(stmt).all())
+    return dict(db.session.execute(stmt, bind_arguments={'bind': _shards().engine(code)}).all())
+
+
+def scope_versions(*scopes):
+    """Current versions of the given scopes, as a tuple in the same order"""
+    shards = _shards()
+    versions = {}
+    for code, group in _group_by_shard([s for s in scopes if s != LEDGER_SCOPE or shards is None]).items():
+        versions.update(_read_versions(group, code))
+    if shards is not None and LEDGER_SCOPE in scopes:
+        def ledger(engine):
+            with engine.connect() as conn:
+                return conn.execute(
+                    select(DataVersion.version).where(DataVersion.scope == LEDGER_SCOPE)
+                ).scalar() or 0
+
+        versions[LEDGER_SCOPE] = (
+            _read_versions([LEDGER_SCOPE], None).get(LEDGER_SCOPE, 0)
+            + sum(shards.fan_out(ledger).values())
+        )
+    return tuple(versions.get(scope, 0) for scope in scopes)
+
+
+@event.listens_for(RoutingSession, 'before_flush')
+def _bump_on_flush(session, flush_context, instances):
+    shards = _shards()
+    scopes = set()
+    ledger_shards = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Consultancy):
+            scopes.add(CATALOG_SCOPE)
+            if obj in session.deleted:
+                scopes.add(HOSTELS_REMOVED_SCOPE)
+            if obj.id is not None:
+                scopes.add(consultancy_scope(obj.id))
+        elif isinstance(obj, Announcement):
+            scopes.add(ANNOUNCEMENTS_SCOPE)
+        elif isinstance(obj, User) and obj.role == 'agent':
+            # Hostel listings show each hostel's agent
+            scopes.add(CATALOG_SCOPE)
+        elif isinstance(obj, User) and obj.role == 'student':
+            if obj in session.dirty and not inspect(obj).attrs.consultancy_id.history.has_changes():
+                continue
+            scopes.add(ROSTER_SCOPE)
+        elif isinstance(obj, (Student, Transaction)):
+            if obj in session.dirty and not session.is_modified(obj):
+                continue
+            if (obj in session.deleted and isinstance(obj, Student)) or (
+                isinstance(obj, Transaction) and obj not in session.new
+            ):
+                ledger_shards.add(shards.shard_for(obj) if shards is not None else None)
+            history = inspect(obj).attrs.consultancy_id.history
+            for consultancy_id in chain([obj.consultancy_id], history.deleted or ()):
+                if consultancy_id is not None:
+                    scopes.add(consultancy_scope(consultancy_id))
+    if scopes:
+        bump_versions(scopes, session=session)
+    for shard in ledger_shards:
+        bump_versions([LEDGER_SCOPE], session=session, shard=shard)
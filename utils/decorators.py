@@ -1,6 +1,7 @@
 from functools import wraps
-from flask import abort
+from flask import abort, g, current_app, request, session
 from flask_login import current_user
+from utils.cache import VersionedCache
 
 def admin_required(f):
     @wraps(f)
@@ -24,4 +25,61 @@ def student_required(f):
         if not current_user.is_authenticated or current_user.role != 'student':
             abort(403)
         return f(*args, **kwargs)
-    return decorated_function
\ No newline at end of file
+    return decorated_function
+
+def api_login_required(f):
+    """Like login_required, but answers 401 instead of redirecting to the login page"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_user.is_authenticated:
+            abort(401, 'Login required')
+        return f(*args, **kwargs)
+    return decorated_function
+
+def read_replica(f):
+    """Serve this view's queries from the read replica; writes still go to the primary"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g.db_read_only = True
+        return f(*args, **kwargs)
+    return decorated_function
+
+def cached_page(versions):
+    """
+    Serve the view's rendered HTML from an in-process cache until the data
+    versions returned by `versions()` change (see utils/data_version.py).
+    Entries are per user and query string; requests with pending flash
+    messages always render fresh. The cache holds at most PAGE_CACHE_SIZE
+    pages and PAGE_CACHE_MAX_BYTES of HTML per worker.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not current_app.config.get('PAGE_CACHE_ENABLED') or session.get('_flashes'):
+                return f(*args, **kwargs)
+
+            cache = current_app.extensions.get('page_cache')
+            if cache is None:
+                cache = current_app.extensions.setdefault('page_cache', VersionedCache(
+                    current_app.config.get('PAGE_CACHE_SIZE', 512),
+                    max_bytes=current_app.config.get('PAGE_CACHE_MAX_BYTES'),
+                    sizeof=lambda entry: len(entry[0])
+                ))
+            key = (request.endpoint, current_user.get_id(), request.query_string)
+            version = versions()
+
+            entry = cache.get(key, version)
+            if entry is None:
+                response = current_app.make_response(f(*args, **kwargs))
+                if response.status_code != 200 or response.direct_passthrough:
+                    return response
+                entry = (response.get_data(), response.mimetype)
+                cache.set(key, version, entry)
+                response.headers['X-Page-Cache'] = 'MISS'
+                return response
+
+            response = current_app.response_class(entry[0], mimetype=entry[1])
+            response.headers['X-Page-Cache'] = 'HIT'
+            return response
+        return decorated_function
+    return decorator
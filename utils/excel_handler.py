@@ -1,4 +1,3 @@
-import pandas as pd
 from werkzeug.security import generate_password_hash
 from models.database import db
 from models.user import User
@@ -7,6 +6,7 @@ from models.consultancy import Consultancy
 import random
 import string
 from utils.hostels import HOSTELS
+from models.sharding import use_shard
 
 def generate_password(length=8):
     """Generate a random password"""
@@ -20,6 +20,8 @@ def import_students_from_excel(file_path):
     Import students from Excel file
     Expected columns: PRN, Name, Branch, Email, Phone, Hostel_Code, Total_Fees, Fees_Paid, Pending_Fee
     """
+    import pandas as pd
+
     try:
         df = pd.read_excel(file_path)
         
@@ -71,6 +73,8 @@ def import_students_from_excel(file_path):
                     db.session.add(consultancy)
                     db.session.flush()  # REQUIRED to get consultancy.id
 
+                # Per-hostel shard (no-op unless sharding is enabled)
+                use_shard(hostel_code)
                 
                 # Check if student already exists
                 existing_student = Student.query.filter_by(prn=str(row['PRN']).strip()).first()
@@ -154,6 +158,8 @@ def import_students_from_excel(file_path):
     
 def export_students_to_excel(students):
     """Export students data to Excel"""
+    import pandas as pd
+
     data = []
     for student in students:
         data.append({
@@ -173,6 +179,8 @@ def export_students_to_excel(students):
 
 def export_transactions_to_excel(transactions):
     """Export transactions to Excel"""
+    import pandas as pd
+
     data = []
     for txn in transactions:
         data.append({
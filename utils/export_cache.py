@@ -0,0 +1,122 @@
+"""
+Disk cache for generated export workbooks.
+
+Files live in EXPORT_CACHE_FOLDER and are named after a hash of
+(export type, filters, data version, shard). Exports of one hostel pass
+that hostel's data_version(consultancy_id), so writes to other hostels
+leave their files valid. When nothing has changed since the last build
+the version is the same, and the file is served as-is. Any relevant
+write bumps the version, so the next click builds a new file and the old
+one simply stops being used.
+
+The folder is shared by all workers. Files are written atomically and
+their mtime is touched on every hit, so eviction (oldest mtime first,
+until the folder fits EXPORT_CACHE_MAX_BYTES) is least-recently-used.
+"""
+import hashlib
+import json
+import os
+import threading
+from io import BytesIO
+from flask import current_app, g, send_file
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def export_key(kind, filters, version, shard=None):
+    """File name stem for an export; `shard` is the hostel shard it was read from, if any"""
+    raw = json.dumps([kind, filters, version, shard], sort_keys=True, default=str)
+    return f'{kind}-{hashlib.sha256(raw.encode()).hexdigest()[:32]}'
+
+
+class ExportCache:
+    def __init__(self, folder, max_bytes):
+        self.folder = os.path.abspath(folder)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, key):
+        return os.path.join(self.folder, f'{key}.bin')
+
+    def open(self, key):
+        """Open file for `key`, or None. An open handle survives eviction by another worker."""
+        path = self.path(key)
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return f
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        os.makedirs(self.folder, exist_ok=True)
+        path = self.path(key)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self.evict()
+
+    def evict(self):
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.folder):
+                if not name.endswith('.bin'):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.folder, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.folder, name))
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+
+def export_response(kind, filters, version, build, download_name, mimetype=XLSX_MIMETYPE, per_shard=True):
+    """
+    Serve the export for (kind, filters, version) from the cache, or call
+    build() (returning a BytesIO) and cache the result.
+    per_shard: the export reads the current shard (g.shard), which is then
+    part of the key; pass False for exports that read every shard.
+    """
+    cache = current_app.extensions.get('export_cache')
+    if cache is None:
+        return send_file(build(), download_name=download_name, as_attachment=True, mimetype=mimetype)
+
+    key = export_key(kind, filters, version, g.get('shard') if per_shard else None)
+    f = cache.open(key)
+    if f is not None:
+        response = send_file(f, download_name=download_name, as_attachment=True, mimetype=mimetype)
+        response.headers['X-Export-Cache'] = 'HIT'
+        return response
+
+    data = build().getvalue()
+    cache.put(key, data)
+    response = send_file(BytesIO(data), download_name=download_name, as_attachment=True, mimetype=mimetype)
+    response.headers['X-Export-Cache'] = 'MISS'
+    return response
+
+
+def init_export_cache(app):
+    if not app.config.get('EXPORT_CACHE_ENABLED'):
+        return
+    app.extensions['export_cache'] = ExportCache(
+        app.config['EXPORT_CACHE_FOLDER'],
+        app.config['EXPORT_CACHE_MAX_BYTES']
+    )
@@ -0,0 +1,223 @@
+"""
+Background export jobs.
+
+Large exports can outlive the worker timeout, so with ?job=1 the export
+routes queue the build instead of running it in the request, and answer
+202 with a status URL. The build runs on a small per-worker thread pool
+(EXPORT_JOB_WORKERS) inside an app context with the requester's shard.
+At most EXPORT_JOB_MAX_ACTIVE jobs may be queued or running across all
+workers; beyond that new jobs are refused with 429, so exports cannot
+starve interactive traffic. Submissions hold an exclusive lock on
+EXPORT_JOB_FOLDER/.lock while they count and register jobs, so two
+workers cannot both take the last slot.
+
+Job state lives in EXPORT_JOB_FOLDER/<job id>.json, next to the finished
+file, so any worker can answer the status and download requests. Files
+are deleted EXPORT_JOB_TTL_SECONDS after they were built; expired jobs
+are purged whenever jobs are listed, looked up or submitted. A job whose
+worker died (e.g. recycled by gunicorn) is reported as failed.
+"""
+import json
+import os
+import re
+import secrets
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from flask import current_app, g, jsonify, url_for
+from flask_login import current_user
+from models.database import db
+from utils.export_cache import XLSX_MIMETYPE, export_key
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; the limit is then per worker only
+    fcntl = None
+
+ACTIVE = ('queued', 'running')
+JOB_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+class ExportJobLimit(Exception):
+    """Too many export jobs are queued or running"""
+
+
+def _now():
+    return datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class ExportJobs:
+    def __init__(self, app):
+        self.app = app
+        self.folder = os.path.abspath(app.config['EXPORT_JOB_FOLDER'])
+        self.max_active = app.config['EXPORT_JOB_MAX_ACTIVE']
+        self.ttl = app.config['EXPORT_JOB_TTL_SECONDS']
+        self.workers = app.config['EXPORT_JOB_WORKERS']
+        self._executor = None
+        self._executor_pid = None
+        self._thread_lock = threading.Lock()
+
+    def _pool(self):
+        # One pool per process: gunicorn forks workers after the app is created
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='export-job')
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    def _meta_path(self, job_id):
+        return os.path.join(self.folder, f'{job_id}.json')
+
+    def artifact_path(self, job_id):
+        return os.path.join(self.folder, f'{job_id}.bin')
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive across threads and, with fcntl, across worker processes"""
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.folder, '.lock'), 'w') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                yield
+
+    def _remove(self, job_id):
+        for path in (self.artifact_path(job_id), self._meta_path(job_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _save(self, job):
+        tmp = f'{self._meta_path(job["id"])}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(job, f)
+        os.replace(tmp, self._meta_path(job['id']))
+
+    def get(self, job_id):
+        if not JOB_ID.match(job_id or ''):
+            return None
+        try:
+            with open(self._meta_path(job_id)) as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if job.get('expires_at') and job['expires_at'] < time.time():
+            self._remove(job_id)
+            return None
+        if job['status'] in ACTIVE and not _pid_alive(job['pid']):
+            job.update(status='failed', error='The worker running this export exited', finished_at=_now(),
+                       expires_at=time.time() + self.ttl)
+            self._save(job)
+        return job
+
+    def jobs(self):
+        """Every unexpired job; looking them up purges the expired ones"""
+        if not os.path.isdir(self.folder):
+            return []
+        ids = [name[:-5] for name in os.listdir(self.folder) if name.endswith('.json')]
+        return [job for job in (self.get(job_id) for job_id in ids) if job is not None]
+
+    def purge_expired(self):
+        self.jobs()
+
+    def submit(self, user_id, kind, filters, version, build, download_name, mimetype=XLSX_MIMETYPE, per_shard=True):
+        """
+        Queue build() (returning a BytesIO) for this user, or return their
+        existing job for the same export and data version.
+        per_shard is as for export_response().
+        """
+        os.makedirs(self.folder, exist_ok=True)
+
+        shard = g.get('shard')
+        key = export_key(kind, filters, version, shard if per_shard else None)
+        # Count and register under the lock: the check and the new job file are one step
+        with self._locked():
+            jobs = self.jobs()
+            for job in jobs:
+                if job['user_id'] == user_id and job['key'] == key and job['status'] != 'failed':
+                    return job
+            if sum(1 for job in jobs if job['status'] in ACTIVE) >= self.max_active:
+                raise ExportJobLimit(f'{self.max_active} export jobs are already running; try again shortly')
+
+            job = {
+                'id': secrets.token_hex(16), 'user_id': user_id, 'kind': kind, 'filters': filters,
+                'key': key, 'download_name': download_name, 'mimetype': mimetype,
+                'status': 'queued', 'error': None, 'size': None, 'pid': os.getpid(),
+                'created_at': _now(), 'started_at': None, 'finished_at': None, 'expires_at': None
+            }
+            self._save(job)
+        self._pool().submit(self._run, job, key, build, shard)
+        return job
+
+    def _run(self, job, key, build, shard):
+        with self.app.app_context():
+            g.shard = shard
+            g.db_read_only = True
+            job.update(status='running', started_at=_now())
+            self._save(job)
+            try:
+                cache = self.app.extensions.get('export_cache')
+                cached = cache.open(key) if cache is not None else None
+                tmp = f'{self.artifact_path(job["id"])}.tmp'
+                if cached is not None:
+                    with cached, open(tmp, 'wb') as f:
+                        shutil.copyfileobj(cached, f)
+                else:
+                    data = build().getvalue()
+                    if cache is not None:
+                        cache.put(key, data)
+                    with open(tmp, 'wb') as f:
+                        f.write(data)
+                os.replace(tmp, self.artifact_path(job['id']))
+                job.update(status='done', size=os.path.getsize(self.artifact_path(job['id'])))
+            except Exception as e:
+                self.app.logger.exception('Export job %s failed', job['id'])
+                job.update(status='failed', error=str(e))
+            finally:
+                db.session.remove()
+            job.update(finished_at=_now(), expires_at=time.time() + self.ttl)
+            self._save(job)
+
+
+def start_export_job(kind, filters, version, build, download_name, per_shard=True):
+    """Queue an export for the current user and answer 202 with its status URL"""
+    try:
+        job = current_app.extensions['export_jobs'].submit(
+            current_user.id, kind, filters, version, build, download_name, per_shard=per_shard
+        )
+    except ExportJobLimit as e:
+        return jsonify({'success': False, 'message': str(e)}), 429
+    return jsonify({
+        'success': True,
+        'message': 'Export queued',
+        'job': serialize_job(job),
+        'status_url': url_for('admin.export_job_status', job_id=job['id'])
+    }), 202
+
+
+def serialize_job(job):
+    data = {key: job[key] for key in ('id', 'kind', 'filters', 'status', 'error', 'size',
+                                      'download_name', 'created_at', 'started_at', 'finished_at')}
+    if job.get('expires_at'):
+        data['expires_at'] = datetime.utcfromtimestamp(job['expires_at']).strftime('%Y-%m-%d %H:%M:%S')
+    if job['status'] == 'done':
+        data['download_url'] = url_for('admin.download_export_job', job_id=job['id'])
+    return data
+
+
+def init_export_jobs(app):
+    app.extensions['export_jobs'] = ExportJobs(app)
@@ -0,0 +1,247 @@
+"""
+Per-endpoint request metrics.
+
+Every request records its latency (histogram), number of SQL statements,
+time spent in SQL and response size, keyed by Flask endpoint and method.
+Each gunicorn worker keeps its counters in memory and writes a snapshot
+to METRICS_FOLDER/worker-<pid>-<token>.json every METRICS_FLUSH_SECONDS
+(the random token keeps a reused PID from overwriting an old file). The
+admin metrics endpoint merges all snapshots into Prometheus text format.
+Snapshots of workers that have exited are folded into retired.json and
+removed (at startup and on every collect), so totals never go down and
+the folder does not grow with every worker restart.
+"""
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; snapshots are then never retired
+    fcntl = None
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+WORKER_FILE = re.compile(r'^worker-(\d+)(?:-[0-9a-f]+)?\.json$')
+RETIRED_FILE = 'retired.json'
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _load(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _merge(merged, series):
+    """Add one snapshot's counters into `merged` (per endpoint and method)"""
+    for key, entry in series.items():
+        total = merged.get(key)
+        if total is None:
+            merged[key] = entry
+            continue
+        for field in ('count', 'seconds', 'sql_count', 'sql_seconds', 'bytes'):
+            total[field] += entry[field]
+        total['buckets'] = [a + b for a, b in zip(total['buckets'], entry['buckets'])]
+        for status_class, n in entry['status'].items():
+            total['status'][status_class] = total['status'].get(status_class, 0) + n
+    return merged
+
+
+class MetricsStore:
+    """Counters of one worker process"""
+
+    def __init__(self, folder, flush_seconds):
+        self.folder = os.path.abspath(folder)
+        self.flush_seconds = flush_seconds
+        self.series = {}
+        self.lock = threading.Lock()
+        self.last_flush = time.monotonic()
+        self._pid = None
+        self._token = None
+
+    @property
+    def path(self):
+        # New token per process: gunicorn forks workers after the app is created
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._token = secrets.token_hex(4)
+        return os.path.join(self.folder, f'worker-{self._pid}-{self._token}.json')
+
+    def record(self, endpoint, method, status, seconds, sql_count, sql_seconds, size):
+        key = f'{endpoint} {method}'
+        with self.lock:
+            entry = self.series.get(key)
+            if entry is None:
+                entry = self.series[key] = {
+                    'endpoint': endpoint, 'method': method, 'count': 0, 'seconds': 0.0,
+                    'buckets': [0] * len(LATENCY_BUCKETS), 'sql_count': 0, 'sql_seconds': 0.0,
+                    'bytes': 0, 'status': {}
+                }
+            entry['count'] += 1
+            entry['seconds'] += seconds
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    entry['buckets'][i] += 1
+                    break
+            entry['sql_count'] += sql_count
+            entry['sql_seconds'] += sql_seconds
+            entry['bytes'] += size
+            status_class = f'{status // 100}xx'
+            entry['status'][status_class] = entry['status'].get(status_class, 0) + 1
+
+        if time.monotonic() - self.last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        """Write this worker's counters atomically"""
+        with self.lock:
+            data = json.dumps(self.series)
+            self.last_flush = time.monotonic()
+        os.makedirs(self.folder, exist_ok=True)
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w') as f:
+            f.write(data)
+        os.replace(tmp, self.path)
+
+    def retire_dead_workers(self):
+        """Fold the snapshots of exited workers into retired.json and delete them"""
+        if fcntl is None or not os.path.isdir(self.folder):
+            return
+        with open(os.path.join(self.folder, '.lock'), 'w') as lock:
+            # Serializes retiring across workers; collect() readers never see a half-merged state
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            dead = []
+            for name in os.listdir(self.folder):
+                match = WORKER_FILE.match(name)
+                if match and not _pid_alive(int(match.group(1))):
+                    dead.append(os.path.join(self.folder, name))
+            if not dead:
+                return
+            retired_path = os.path.join(self.folder, RETIRED_FILE)
+            retired = _load(retired_path) or {}
+            for path in dead:
+                _merge(retired, _load(path) or {})
+            tmp = f'{retired_path}.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(retired, f)
+            os.replace(tmp, retired_path)
+            for path in dead:
+                os.remove(path)
+
+    def collect(self):
+        """Counters of every worker, live and retired, merged per endpoint and method"""
+        self.flush()
+        self.retire_dead_workers()
+        merged = {}
+        lock = open(os.path.join(self.folder, '.lock'), 'w') if fcntl is not None else None
+        try:
+            if lock is not None:
+                fcntl.flock(lock, fcntl.LOCK_SH)
+            for name in os.listdir(self.folder):
+                if name == RETIRED_FILE or WORKER_FILE.match(name):
+                    _merge(merged, _load(os.path.join(self.folder, name)) or {})
+        finally:
+            if lock is not None:
+                lock.close()
+        return merged
+
+
+def render_prometheus(series):
+    """Prometheus text exposition (version 0.0.4) of merged counters"""
+    lines = [
+        '# HELP app_request_duration_seconds Request latency by endpoint.',
+        '# TYPE app_request_duration_seconds histogram',
+    ]
+    entries = sorted(series.values(), key=lambda e: (e['endpoint'], e['method']))
+    for e in entries:
+        labels = f'endpoint="{e["endpoint"]}",method="{e["method"]}"'
+        cumulative = 0
+        for bound, n in zip(LATENCY_BUCKETS, e['buckets']):
+            cumulative += n
+            lines.append(f'app_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'app_request_duration_seconds_bucket{{{labels},le="+Inf"}} {e["count"]}')
+        lines.append(f'app_request_duration_seconds_sum{{{labels}}} {e["seconds"]:.6f}')
+        lines.append(f'app_request_duration_seconds_count{{{labels}}} {e["count"]}')
+
+    counters = (
+        ('app_requests_total', 'Requests by endpoint and status class.', None),
+        ('app_sql_statements_total', 'SQL statements executed while handling requests.', 'sql_count'),
+        ('app_sql_seconds_total', 'Time spent executing SQL while handling requests.', 'sql_seconds'),
+        ('app_response_bytes_total', 'Response body bytes sent.', 'bytes'),
+    )
+    for name, help_text, field in counters:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for e in entries:
+            labels = f'endpoint="{e["endpoint"]}",method="{e["method"]}"'
+            if field is None:
+                for status_class, n in sorted(e['status'].items()):
+                    lines.append(f'{name}{{{labels},status="{status_class}"}} {n}')
+            elif field == 'sql_seconds':
+                lines.append(f'{name}{{{labels}}} {e[field]:.6f}')
+            else:
+                lines.append(f'{name}{{{labels}}} {e[field]}')
+    return '\n'.join(lines) + '\n'
+
+
+# Start times live on the statement's execution context, so a statement
+# that raises leaves nothing behind on the connection
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_metrics_started', None)
+    if started is not None and has_request_context():
+        g._metrics_sql_count = g.get('_metrics_sql_count', 0) + 1
+        g._metrics_sql_seconds = g.get('_metrics_sql_seconds', 0.0) + time.perf_counter() - started
+
+
+def _start_timer():
+    g._metrics_started = time.perf_counter()
+
+
+def init_metrics(app):
+    if not app.config.get('METRICS_ENABLED'):
+        return
+    store = MetricsStore(app.config['METRICS_FOLDER'], app.config.get('METRICS_FLUSH_SECONDS', 10))
+    store.retire_dead_workers()
+    app.extensions['metrics'] = store
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    app.before_request(_start_timer)
+
+    @app.after_request
+    def record_request(response):
+        started = g.get('_metrics_started')
+        if started is not None:
+            endpoint = request.url_rule.endpoint if request.url_rule else 'unmatched'
+            store.record(
+                endpoint, request.method, response.status_code, time.perf_counter() - started,
+                g.get('_metrics_sql_count', 0), g.get('_metrics_sql_seconds', 0.0),
+                response.content_length or 0
+            )
+        return response
@@ -0,0 +1,86 @@
+"""
+N+1 lazy-load detector for development and tests.
+
+Counts lazy relationship loads (e.g. student.consultancy inside a template
+loop) per request. When one relationship is lazily loaded more than
+NPLUSONE_THRESHOLD times in a request, the detector warns in the app log
+("warn") or raises NPlusOneError ("raise", which fails the test that made
+the request). The message names the template line or the route code that
+triggered the load.
+
+NPLUSONE_MODE defaults to "raise" when TESTING is on, "warn" in debug mode
+and "off" otherwise.
+"""
+import os
+import sys
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from models.database import RoutingSession
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class NPlusOneError(Exception):
+    """A relationship was lazily loaded too many times in one request"""
+
+
+def detection_mode(app):
+    mode = app.config.get('NPLUSONE_MODE')
+    if mode:
+        return mode
+    if app.testing:
+        return 'raise'
+    return 'warn' if app.debug else 'off'
+
+
+def _caller_location():
+    """Template line, or else the innermost project source line, that triggered the load"""
+    frame = sys._getframe(2)
+    fallback = None
+    while frame is not None:
+        template = frame.f_globals.get('__jinja_template__')
+        if template is not None:
+            name = template.name or template.filename
+            return f'template {name}, line {template.get_corresponding_lineno(frame.f_lineno)}'
+        filename = frame.f_code.co_filename
+        if fallback is None and filename.startswith(_PROJECT_ROOT) and not filename.startswith(
+            (os.path.join(_PROJECT_ROOT, 'utils', 'nplusone.py'), os.path.join(_PROJECT_ROOT, 'models'))
+        ):
+            fallback = f'{os.path.relpath(filename, _PROJECT_ROOT)}, line {frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return fallback or 'unknown location'
+
+
+def _count_lazy_loads(orm_execute_state):
+    if (
+        not orm_execute_state.is_relationship_load
+        or orm_execute_state.lazy_loaded_from is None
+        or not has_request_context()
+    ):
+        return
+
+    mode = detection_mode(current_app)
+    if mode == 'off':
+        return
+
+    prop = orm_execute_state.loader_strategy_path[-1]
+    key = f'{prop.parent.class_.__name__}.{prop.key}'
+    counts = g.setdefault('_lazy_loads', {})
+    counts[key] = counts.get(key, 0) + 1
+
+    threshold = current_app.config.get('NPLUSONE_THRESHOLD', 5)
+    if counts[key] == threshold + 1:
+        message = (
+            f'N+1 query: {key} lazily loaded more than {threshold} times in '
+            f'{request.method} {request.path} (endpoint {request.endpoint}); '
+            f'triggered from {_caller_location()}. Eager-load it in the query '
+            f'(joinedload/selectinload) or select the columns the view needs.'
+        )
+        if mode == 'raise':
+            raise NPlusOneError(message)
+        current_app.logger.warning(message)
+
+
+def init_nplusone_detector(app):
+    if not event.contains(RoutingSession, 'do_orm_execute', _count_lazy_loads):
+        event.listen(RoutingSession, 'do_orm_execute', _count_lazy_loads)
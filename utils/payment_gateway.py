@@ -1,10 +1,14 @@
-import razorpay
 from datetime import datetime
 import uuid
 
 class PaymentGateway:
-    def __init__(self, key_id, key_secret):
-        self.client = razorpay.Client(auth=(key_id, key_secret))
+    def __init__(self, key_id, key_secret, base_url=None):
+        # razorpay pulls in requests; only load it when a payment is made
+        import razorpay
+        
+        # base_url points the client at another API host (e.g. loadtest/fake_gateway.py)
+        options = {'base_url': base_url} if base_url else {}
+        self.client = razorpay.Client(auth=(key_id, key_secret), **options)
     
     def create_order(self, amount, currency='INR', receipt=None):
         """Create a payment order"""
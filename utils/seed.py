@@ -0,0 +1,173 @@
+import random
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, select
+from werkzeug.security import generate_password_hash
+from models.database import db
+from models.user import User
+from models.consultancy import Consultancy
+from models.student import Student
+from models.transaction import Transaction, Announcement
+from models.sharding import sharding_enabled
+from utils.hostels import HOSTELS
+from utils.data_version import bump_versions, consultancy_scope, CATALOG_SCOPE, LEDGER_SCOPE, ROSTER_SCOPE
+
+FIRST_NAMES = ('Aarav', 'Aditi', 'Arjun', 'Diya', 'Ishaan', 'Kavya', 'Meera', 'Neha',
+               'Omkar', 'Pooja', 'Rahul', 'Riya', 'Rohan', 'Sakshi', 'Tanvi', 'Vivek')
+LAST_NAMES = ('Deshmukh', 'Gupta', 'Iyer', 'Joshi', 'Kulkarni', 'Mehta', 'Nair',
+              'Patil', 'Rao', 'Shah', 'Sharma', 'Singh')
+BRANCHES = ('CSE', 'IT', 'ENTC', 'MECH', 'CIVIL', 'ELEC')
+FEE_LEVELS = (80000.0, 90000.0, 100000.0, 120000.0)
+
+# Seeded students log in with their phone number, which is this value
+DEFAULT_STUDENT_PASSWORD = '9999999999'
+DEFAULT_AGENT_PASSWORD = 'agent123'
+
+# Payment dates end here unless told otherwise, so a seed is reproducible on any day
+DEFAULT_UNTIL = datetime(2025, 1, 1)
+
+
+def hostel_codes(count):
+    """Codes from HOSTELS first, then synthetic H001, H002, ..."""
+    codes = sorted(HOSTELS)[:count]
+    codes += [f'H{i:03d}' for i in range(1, count - len(codes) + 1)]
+    return codes
+
+
+def _next_id(model):
+    return (db.session.scalar(select(func.max(model.id))) or 0) + 1
+
+
+def _seed_consultancies(codes, agent_hash):
+    """Create the hostels (and one agent each) that don't exist yet; returns {code: id}"""
+    existing = dict(db.session.execute(
+        select(Consultancy.hostel_code, Consultancy.id).where(Consultancy.hostel_code.in_(codes))
+    ).all())
+    missing = [code for code in codes if code not in existing]
+    if not missing:
+        return existing
+
+    consultancy_id = _next_id(Consultancy)
+    user_id = _next_id(User)
+    rows, agents = [], []
+    for code in missing:
+        existing[code] = consultancy_id
+        rows.append({
+            'id': consultancy_id, 'name': HOSTELS.get(code, f'Hostel {code}'), 'hostel_code': code,
+            'contact_person': f'Warden {code}', 'email': f'{code.lower()}@seed.example.com',
+            'phone': f'90000{consultancy_id:05d}'
+        })
+        agents.append({
+            'id': user_id, 'username': f'agent_{code.lower()}', 'password': agent_hash,
+            'email': f'agent_{code.lower()}@seed.example.com', 'role': 'agent',
+            'consultancy_id': consultancy_id
+        })
+        consultancy_id += 1
+        user_id += 1
+    db.session.execute(insert(Consultancy.__table__), rows)
+    db.session.execute(insert(User.__table__), agents)
+    db.session.commit()
+    return existing
+
+
+def _write_hostel_rows(code, students, payments):
+    """Students and payments go to the hostel's shard in sharding mode"""
+    if sharding_enabled():
+        from flask import current_app
+        registry = current_app.extensions['shards']
+        registry.resolve(hostel_code=code)
+        with registry.engine(code).begin() as conn:
+            conn.execute(insert(Student.__table__), students)
+            if payments:
+                conn.execute(insert(Transaction.__table__), payments)
+    else:
+        db.session.execute(insert(Student.__table__), students)
+        if payments:
+            db.session.execute(insert(Transaction.__table__), payments)
+
+
+def seed_database(hostels=4, students=1000, payments=2, announcements=5, seed=42,
+                  student_password=DEFAULT_STUDENT_PASSWORD, agent_password=DEFAULT_AGENT_PASSWORD,
+                  chunk_size=10000, until=None, progress=None):
+    """
+    Generate hostels, agents, students with their login users, completed
+    payments and announcements with multi-row INSERTs, committing every
+    `chunk_size` students. Password hashes are computed once and shared,
+    so the cost is dominated by the inserts themselves. The same `seed`
+    on an empty database always produces the same data; payment dates
+    are spread over the year before `until` (default DEFAULT_UNTIL).
+    Must run inside an app context. Returns counts of the created rows.
+    """
+    rng = random.Random(seed)
+    until = until or DEFAULT_UNTIL
+    student_hash = generate_password_hash(student_password)
+    agent_hash = generate_password_hash(agent_password)
+
+    codes = hostel_codes(hostels)
+    consultancy_ids = _seed_consultancies(codes, agent_hash)
+
+    user_id = _next_id(User)
+    student_id = _next_id(Student) if not sharding_enabled() else None
+    created = {'students': 0, 'payments': 0}
+
+    for start in range(0, students, chunk_size):
+        users = []
+        per_hostel = {code: ([], []) for code in codes}
+        for _ in range(min(chunk_size, students - start)):
+            code = codes[rng.randrange(len(codes))]
+            consultancy_id = consultancy_ids[code]
+            prn = f'SD{user_id:08d}'
+            email = f'{prn.lower()}@seed.example.com'
+            total = rng.choice(FEE_LEVELS)
+
+            paid = 0.0
+            rows, txns = per_hostel[code]
+            # Students share the catalog user id in sharding mode
+            sid = user_id if student_id is None else student_id
+            for k in range(rng.randint(0, payments)):
+                amount = float(rng.randrange(5000, 30001, 5000))
+                if paid + amount > total:
+                    break
+                paid += amount
+                txns.append({
+                    'transaction_id': f'SEED{user_id:09d}{k:02d}', 'student_id': sid,
+                    'consultancy_id': consultancy_id, 'amount': amount, 'payment_method': 'razorpay',
+                    'status': 'completed',
+                    'payment_date': until - timedelta(days=rng.randrange(365), seconds=rng.randrange(86400))
+                })
+
+            users.append({
+                'id': user_id, 'username': prn, 'password': student_hash, 'email': email,
+                'role': 'student', 'consultancy_id': consultancy_id
+            })
+            rows.append({
+                'id': sid, 'user_id': user_id, 'consultancy_id': consultancy_id, 'prn': prn,
+                'full_name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+                'branch': rng.choice(BRANCHES), 'email': email, 'phone': student_password,
+                'total_fees': total, 'fees_paid': paid
+            })
+            user_id += 1
+            if student_id is not None:
+                student_id += 1
+
+        db.session.execute(insert(User.__table__), users)
+        for code, (rows, txns) in per_hostel.items():
+            if rows:
+                _write_hostel_rows(code, rows, txns)
+                created['payments'] += len(txns)
+        db.session.commit()
+        created['students'] += len(users)
+        if progress:
+            progress(created['students'])
+
+    admin_id = db.session.scalar(select(User.id).where(User.role == 'admin').order_by(User.id).limit(1))
+    if announcements:
+        db.session.execute(insert(Announcement.__table__), [{
+            'message': f'Notice {i + 1}: fee payment window for {rng.choice(codes)} closes soon.',
+            'created_by': admin_id, 'is_active': True
+        } for i in range(announcements)])
+
+    bump_versions([CATALOG_SCOPE, LEDGER_SCOPE, ROSTER_SCOPE] + [consultancy_scope(i) for i in consultancy_ids.values()])
+    db.session.commit()
+
+    created.update({'hostels': len(codes), 'announcements': announcements})
+    return created
@@ -0,0 +1,245 @@
+"""
+Slow-query log.
+
+Statements slower than SLOW_QUERY_THRESHOLD_MS are recorded with their
+SQL, the shape of their parameters (types only, never values), the route
+and path (without the query string) that ran them and the database's
+query plan (EXPLAIN QUERY PLAN on SQLite, EXPLAIN on PostgreSQL) in a
+bounded ring buffer per worker. Buffers are written to
+SLOW_QUERY_FOLDER/worker-<pid>-<token>.json every SLOW_QUERY_FLUSH_SECONDS
+and merged when admins browse them. As for the metrics snapshots, files of
+exited workers are folded into retired.json (keeping the newest
+SLOW_QUERY_BUFFER_SIZE entries) and removed at startup and on every
+collect, so the folder does not grow with worker restarts.
+"""
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from flask import current_app, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; files of exited workers are then kept
+    fcntl = None
+
+EXPLAIN_PREFIX = {'sqlite': 'EXPLAIN QUERY PLAN ', 'postgresql': 'EXPLAIN '}
+
+WORKER_FILE = re.compile(r'^worker-(\d+)(?:-[0-9a-f]+)?\.json$')
+RETIRED_FILE = 'retired.json'
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _load(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def parameter_shape(parameters, executemany=False):
+    """Types of the bound parameters, e.g. ['int', 'str'] or {'id': 'int'}"""
+    if executemany:
+        rows = list(parameters or [])
+        return {'rows': len(rows), 'each': parameter_shape(rows[0]) if rows else None}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    return [type(value).__name__ for value in parameters or ()]
+
+
+def explain(cursor, dialect, statement, parameters):
+    """
+    Query plan rows for a SELECT, run on a separate cursor of the same connection.
+    On PostgreSQL the EXPLAIN runs inside a savepoint: a failing statement
+    would otherwise abort the caller's transaction.
+    """
+    prefix = EXPLAIN_PREFIX.get(dialect)
+    if prefix is None or not statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return None
+    savepoint = dialect == 'postgresql' and not getattr(cursor.connection, 'autocommit', False)
+    plan_cursor = cursor.connection.cursor()
+    try:
+        if savepoint:
+            plan_cursor.execute('SAVEPOINT slow_query_explain')
+        try:
+            plan_cursor.execute(prefix + statement, parameters)
+            plan = [' '.join(str(col) for col in row) for row in plan_cursor.fetchall()]
+        except Exception as e:
+            if savepoint:
+                plan_cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+            return [f'EXPLAIN failed: {e}']
+        if savepoint:
+            plan_cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+        return plan
+    except Exception as e:
+        return [f'EXPLAIN failed: {e}']
+    finally:
+        plan_cursor.close()
+
+
+def _can_explain(conn, context, executemany):
+    """False for batches and for connections whose transaction is already failed or closed"""
+    if executemany or context is None or conn.invalidated:
+        return False
+    transaction = conn.get_transaction()
+    return transaction is None or transaction.is_active
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms, size, folder, flush_seconds):
+        self.threshold = threshold_ms / 1000.0
+        self.entries = deque(maxlen=size)
+        self.folder = os.path.abspath(folder)
+        self.flush_seconds = flush_seconds
+        self.lock = threading.Lock()
+        self.last_flush = time.monotonic()
+        self.dirty = False
+        self._pid = None
+        self._token = None
+
+    @property
+    def path(self):
+        # New token per process: gunicorn forks workers after the app is created
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._token = secrets.token_hex(4)
+        return os.path.join(self.folder, f'worker-{self._pid}-{self._token}.json')
+
+    def add(self, entry):
+        with self.lock:
+            self.entries.append(entry)
+            self.dirty = True
+        if time.monotonic() - self.last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            data = json.dumps(list(self.entries))
+            self.dirty = False
+            self.last_flush = time.monotonic()
+        os.makedirs(self.folder, exist_ok=True)
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w') as f:
+            f.write(data)
+        os.replace(tmp, self.path)
+
+    def retire_dead_workers(self):
+        """Fold the entries of exited workers into retired.json (newest first, bounded) and delete their files"""
+        if fcntl is None or not os.path.isdir(self.folder):
+            return
+        with open(os.path.join(self.folder, '.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            dead = []
+            for name in os.listdir(self.folder):
+                match = WORKER_FILE.match(name)
+                if match and not _pid_alive(int(match.group(1))):
+                    dead.append(os.path.join(self.folder, name))
+            if not dead:
+                return
+            retired_path = os.path.join(self.folder, RETIRED_FILE)
+            retired = _load(retired_path) or []
+            for path in dead:
+                retired.extend(_load(path) or [])
+            retired.sort(key=lambda e: e['timestamp'], reverse=True)
+            tmp = f'{retired_path}.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(retired[:self.entries.maxlen], f)
+            os.replace(tmp, retired_path)
+            for path in dead:
+                os.remove(path)
+
+    def collect(self):
+        """Entries of every worker, live and retired, newest first"""
+        self.flush()
+        self.retire_dead_workers()
+        entries = []
+        if not os.path.isdir(self.folder):
+            return entries
+        lock = open(os.path.join(self.folder, '.lock'), 'w') if fcntl is not None else None
+        try:
+            if lock is not None:
+                fcntl.flock(lock, fcntl.LOCK_SH)
+            for name in os.listdir(self.folder):
+                if name == RETIRED_FILE or WORKER_FILE.match(name):
+                    entries.extend(_load(os.path.join(self.folder, name)) or [])
+        finally:
+            if lock is not None:
+                lock.close()
+        entries.sort(key=lambda e: e['timestamp'], reverse=True)
+        return entries
+
+
+def _active_log():
+    if has_app_context():
+        return current_app.extensions.get('slow_queries')
+    return None
+
+
+# The start time is kept on the statement's execution context, so a
+# statement that raises leaves nothing behind on the connection
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._slow_query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_slow_query_started', None)
+    log = _active_log()
+    if started is None or log is None:
+        return
+    elapsed = time.perf_counter() - started
+    if elapsed < log.threshold:
+        return
+
+    if has_request_context():
+        route = request.url_rule.endpoint if request.url_rule else 'unmatched'
+        # Not full_path: query strings carry search terms and PRNs
+        path = request.path
+    else:
+        route, path = 'cli', None
+
+    log.add({
+        'timestamp': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
+        'duration_ms': round(elapsed * 1000, 2),
+        'route': route,
+        'path': path,
+        'database': conn.engine.url.database,
+        'statement': statement,
+        'parameters': parameter_shape(parameters, executemany),
+        'plan': explain(cursor, conn.dialect.name, statement, parameters) if _can_explain(conn, context, executemany) else None,
+        'pid': os.getpid()
+    })
+
+
+def init_slow_query_log(app):
+    if not app.config.get('SLOW_QUERY_LOG_ENABLED'):
+        return
+    log = SlowQueryLog(
+        app.config['SLOW_QUERY_THRESHOLD_MS'],
+        app.config['SLOW_QUERY_BUFFER_SIZE'],
+        app.config['SLOW_QUERY_FOLDER'],
+        app.config.get('SLOW_QUERY_FLUSH_SECONDS', 30)
+    )
+    log.retire_dead_workers()
+    app.extensions['slow_queries'] = log
+    if not event.contains(Engine, 'after_cursor_execute', _after_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
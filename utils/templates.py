@@ -0,0 +1,28 @@
+"""
+Persistent Jinja bytecode cache.
+
+Compiled templates are stored in TEMPLATE_CACHE_FOLDER on local disk and
+shared by every worker, so a new or recycled worker loads bytecode instead
+of compiling each template on first use. Entries are keyed by template
+name and source checksum, so edited templates are recompiled and never
+served stale. `flask precompile-templates` fills the cache at deploy time.
+"""
+import os
+from jinja2 import FileSystemBytecodeCache
+
+
+def init_template_cache(app):
+    if not app.config.get('TEMPLATE_CACHE_ENABLED'):
+        return
+    folder = os.path.abspath(app.config['TEMPLATE_CACHE_FOLDER'])
+    os.makedirs(folder, exist_ok=True)
+    # jinja_env is created on first use, so this must run before any rendering
+    app.jinja_options = {**app.jinja_options, 'bytecode_cache': FileSystemBytecodeCache(folder)}
+
+
+def precompile_templates(app):
+    """Compile every template the app can render; returns their names"""
+    names = sorted(app.jinja_env.list_templates(filter_func=lambda name: name.endswith('.html')))
+    for name in names:
+        app.jinja_env.get_template(name)
+    return names
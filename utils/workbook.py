@@ -0,0 +1,228 @@
+"""
+Multi-sheet hostel workbook: a summary sheet plus one sheet per hostel.
+
+With WORKBOOK_PROCESSES > 1, each hostel sheet is built in its own
+process (spawned, so nothing is shared with the web worker). The process
+opens its own engine on the database that holds the hostel's students:
+the hostel shard, the read replica or the primary. It reads the rows and
+renders the sheet XML. Rendering the rows is the expensive part of an
+export, so wall-clock time can scale with the process count on a
+multi-core machine; benchmarks/workbook.py measures it. The default, 1,
+builds the sheets in-process, since so far spawning has only been
+measured to cost time. The parent zips the sheets into a single .xlsx.
+Hostel sheets have the same columns as the regular student export.
+
+Spawning re-imports the main module in each child. When the entry point
+cannot be re-imported safely (a script without an
+`if __name__ == '__main__':` guard), multiprocessing raises RuntimeError;
+the sheets are then built one after another in this process instead.
+WORKBOOK_PROCESSES=1 always builds in-process.
+
+Sheets use inline strings rather than a shared-strings table, so sheets
+built independently can be combined without rewriting them.
+"""
+import multiprocessing
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from xml.sax.saxutils import escape
+from flask import current_app
+from sqlalchemy import create_engine, select
+from sqlalchemy.pool import NullPool
+from models.database import db, READ_REPLICA_BIND
+from models.consultancy import Consultancy
+from models.student import Student
+from utils.hostels import HOSTELS
+
+SUMMARY_COLUMNS = ('Hostel_Code', 'Hostel', 'Students', 'Total Fees', 'Fees Paid', 'Fees Pending', 'Collection Rate %')
+STUDENT_COLUMNS = ('PRN', 'Name', 'Branch', 'Email', 'Phone', 'Hostel_Code', 'Total Fees', 'Fees Paid', 'Fees Pending')
+
+# Characters XML 1.0 does not allow, even escaped
+_ILLEGAL_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_SHEET_NAME = re.compile(r'[\[\]:*?/\\]')
+
+_HEAD = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+         '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+_TAIL = '</sheetData></worksheet>'
+
+
+def _column_letter(index):
+    letters = ''
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _cell(ref, value, style=''):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"{style}><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}"{style}><v>{value!r}</v></c>'
+    text = escape(_ILLEGAL_XML.sub('', str(value)))
+    return f'<c r="{ref}" t="inlineStr"{style}><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def sheet_xml(columns, rows):
+    """Worksheet XML with a bold header row"""
+    letters = [_column_letter(i) for i in range(len(columns))]
+    parts = [_HEAD, '<row r="1">']
+    parts.extend(_cell(f'{letter}1', name, ' s="1"') for letter, name in zip(letters, columns))
+    parts.append('</row>')
+    for number, row in enumerate(rows, start=2):
+        parts.append(f'<row r="{number}">')
+        parts.extend(_cell(f'{letter}{number}', value) for letter, value in zip(letters, row))
+        parts.append('</row>')
+    parts.append(_TAIL)
+    return ''.join(parts).encode('utf-8')
+
+
+def assemble_workbook(sheets):
+    """.xlsx bytes from [(sheet name, worksheet XML bytes)]"""
+    names = []
+    for name, _ in sheets:
+        name = _SHEET_NAME.sub('_', name)[:31] or 'Sheet'
+        while name.lower() in (n.lower() for n in names):
+            name = f'{name[:28]}_{len(names)}'
+        names.append(name)
+
+    ns = 'http://schemas.openxmlformats.org/'
+    content_types = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<Types xmlns="{ns}package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        + ''.join(
+            f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for i in range(1, len(sheets) + 1)
+        ) + '</Types>'
+    )
+    root_rels = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<Relationships xmlns="{ns}package/2006/relationships">'
+        f'<Relationship Id="rId1" Type="{ns}officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    )
+    workbook = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<workbook xmlns="{ns}spreadsheetml/2006/main" xmlns:r="{ns}officeDocument/2006/relationships"><sheets>'
+        + ''.join(f'<sheet name="{escape(name, {chr(34): "&quot;"})}" sheetId="{i}" r:id="rId{i}"/>'
+                  for i, name in enumerate(names, start=1))
+        + '</sheets></workbook>'
+    )
+    workbook_rels = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<Relationships xmlns="{ns}package/2006/relationships">'
+        + ''.join(f'<Relationship Id="rId{i}" Type="{ns}officeDocument/2006/relationships/worksheet" '
+                  f'Target="worksheets/sheet{i}.xml"/>' for i in range(1, len(sheets) + 1))
+        + f'<Relationship Id="rId{len(sheets) + 1}" Type="{ns}officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    )
+    styles = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<styleSheet xmlns="{ns}spreadsheetml/2006/main">'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    )
+
+    output = BytesIO()
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', content_types)
+        archive.writestr('_rels/.rels', root_rels)
+        archive.writestr('xl/workbook.xml', workbook)
+        archive.writestr('xl/_rels/workbook.xml.rels', workbook_rels)
+        archive.writestr('xl/styles.xml', styles)
+        for i, (_, xml) in enumerate(sheets, start=1):
+            archive.writestr(f'xl/worksheets/sheet{i}.xml', xml)
+    output.seek(0)
+    return output
+
+
+def hostel_sheet(database_url, consultancy_id, hostel_label):
+    """Child process: read one hostel's students on a private engine and render its sheet"""
+    # Table columns, not mapped attributes: no need to configure every mapper here
+    students = Student.__table__.c
+    engine = create_engine(database_url, poolclass=NullPool)
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(
+                select(
+                    students.prn, students.full_name, students.branch, students.email, students.phone,
+                    students.total_fees, students.fees_paid, students.fees_pending
+                )
+                .where(students.consultancy_id == consultancy_id)
+                .order_by(students.id)
+            )
+            return sheet_xml(STUDENT_COLUMNS, (
+                (prn, name, branch, email, phone, hostel_label, total, paid, pending)
+                for prn, name, branch, email, phone, total, paid, pending in rows
+            ))
+    finally:
+        engine.dispose()
+
+
+def _database_url(hostel_code):
+    shards = current_app.extensions.get('shards')
+    if shards is not None:
+        engine = shards.engine(hostel_code)
+    else:
+        engine = db.engines.get(READ_REPLICA_BIND) or db.engine
+    return engine.url.render_as_string(hide_password=False)
+
+
+def _build_sheets(consultancies, processes):
+    jobs = [(_database_url(c.hostel_code), c.id, f"{c.hostel_code} - {c.name}") for c in consultancies]
+    if processes > 1 and len(jobs) > 1:
+        try:
+            # spawn, not fork: the web worker has open connections and threads
+            with ProcessPoolExecutor(max_workers=min(processes, len(jobs)),
+                                     mp_context=multiprocessing.get_context('spawn')) as pool:
+                return list(pool.map(hostel_sheet, *zip(*jobs)))
+        except RuntimeError:
+            current_app.logger.warning('Could not start workbook processes; building the sheets in-process',
+                                       exc_info=True)
+    return [hostel_sheet(*job) for job in jobs]
+
+
+def build_hostel_workbook():
+    """Summary sheet (SQL aggregates) plus one sheet per hostel, built in parallel"""
+    from utils.analytics import collection_breakdown
+
+    consultancies = Consultancy.query.order_by(Consultancy.hostel_code).all()
+    breakdown = collection_breakdown()
+    by_hostel = {row['hostel_code']: row for row in breakdown['by_hostel']}
+
+    summary_rows = []
+    for c in consultancies:
+        row = by_hostel.get(c.hostel_code, {})
+        summary_rows.append((
+            c.hostel_code, c.hostel_name if c.hostel_code in HOSTELS else c.name, row.get('students', 0), row.get('total_fees', 0.0),
+            row.get('fees_paid', 0.0), row.get('fees_pending', 0.0), row.get('collection_rate', 0.0)
+        ))
+    totals = breakdown['totals']
+    summary_rows.append((
+        'Total', '', totals['students'], totals['total_fees'], totals['fees_paid'],
+        totals['fees_pending'], totals['collection_rate']
+    ))
+    sheets = [('Summary', sheet_xml(SUMMARY_COLUMNS, summary_rows))]
+
+    if consultancies:
+        processes = current_app.config.get('WORKBOOK_PROCESSES', 1) or os.cpu_count() or 1
+        sheets.extend(zip((c.hostel_code for c in consultancies), _build_sheets(consultancies, processes)))
+
+    return assemble_workbook(sheets)